@@ -1,30 +1,65 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import os
 import json
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Any, Literal, Optional
 
 import httpx
-import mlflow
-import torch
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.responses import FileResponse, PlainTextResponse
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from service_common.circuit_breaker import CLOSED, CircuitBreaker
+from service_common.profiling import (
+    PROFILE_HEADER,
+    ProfileRecord,
+    ProfileStore,
+    ProfilingConfig,
+    ProfilingMiddleware,
+    token_allowed,
+)
+from service_common.single_flight import AsyncSingleFlight
 
-from ensemble import LogisticBlender
-from preprocess import clean_text
-from detectors.cross_perplexity import compute_feature_vector
-from detectors.tocsin import tocsin_score
+import feature_pool
+from coherence import arequest_score, arequest_scores, build_request
+from detectors.ngram_lm import NgramModel, default_path, load_model
+from ensemble import AGGREGATES, aggregate
+from metrics import (
+    BREAKER_METRICS,
+    COALESCED_CALLS,
+    COHERENCE_FALLBACKS,
+    STAGE_SECONDS,
+    RequestMetricsMiddleware,
+    render_metrics,
+    stage_timer,
+)
+from model_registry import LANGUAGE_MODEL_KEY, LoadedModel, ModelHandle, ModelRegistry
+from preprocess import PreprocessedText, chunk_text, clean_text
+from runtime import InferenceBackend, load_backend
 
 OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://ollama:11434")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "20"))
 MLFLOW_TRACKING_URI = os.getenv("MLFLOW_TRACKING_URI", "file:./mlruns")
 ENABLE_MLFLOW = os.getenv("ENABLE_MLFLOW", "1") == "1"
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "1") == "1"
+MODEL_DIR = Path(os.getenv("MODEL_DIR", Path(__file__).resolve().parent / "models"))
+MODEL_RELOAD_SECONDS = float(os.getenv("MODEL_RELOAD_SECONDS", "2"))
+PROFILING = ProfilingConfig.from_env()
+# Chunked scoring: long answers are scored as overlapping windows instead of only their first window.
+CHUNKED_SCORING = os.getenv("CHUNKED_SCORING", "0") == "1"
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "900"))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", "150"))
+CHUNK_MAX = int(os.getenv("CHUNK_MAX", "8"))
+CHUNK_AGGREGATE = os.getenv("CHUNK_AGGREGATE", "max")
+ANALYZE_BATCH_MAX = int(os.getenv("ANALYZE_BATCH_MAX", "256"))
+if CHUNK_AGGREGATE not in AGGREGATES:
+    raise ValueError(f"CHUNK_AGGREGATE must be one of {', '.join(AGGREGATES)}, not {CHUNK_AGGREGATE!r}")
 CONTRACT_FILE = Path(__file__).resolve().parents[1] / "documentation" / "api-contracts" / "ai-pipeline.yaml"
 
-if ENABLE_MLFLOW:
-    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
-
 app = FastAPI(
     title="AI Detection Pipeline",
     swagger_ui_parameters={
@@ -34,13 +69,70 @@ app = FastAPI(
         ]
     },
 )
-BLENDER = LogisticBlender.load()
+app.add_middleware(ProfilingMiddleware, config=PROFILING)
+app.add_middleware(RequestMetricsMiddleware)
+OLLAMA_BREAKER = CircuitBreaker.from_env("ollama", BREAKER_METRICS)
+REGISTRY = ModelRegistry(MODEL_DIR)
+FEATURE_FLIGHTS: AsyncSingleFlight[tuple[Any, dict[str, float]]] = AsyncSingleFlight("features", COALESCED_CALLS)
+
+
+# torch, the detectors, the blender and mlflow take seconds to import, so they are loaded
+# on first use; the startup hook below does that before the worker takes traffic.
+@functools.lru_cache(maxsize=None)
+def _backend() -> InferenceBackend:
+    return load_backend()
+
+
+@functools.lru_cache(maxsize=None)
+def _model() -> ModelHandle:
+    # Each version is served with the n-gram LM it was trained with (see model_registry.py).
+    return ModelHandle(
+        REGISTRY, _backend().blender_cls.from_dict, check_seconds=MODEL_RELOAD_SECONDS, load_language_model=load_model
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _mlflow():
+    import mlflow
+
+    mlflow.set_tracking_uri(MLFLOW_TRACKING_URI)
+    return mlflow
+
+
+def warm_up() -> dict[str, float]:
+    steps = {
+        "backend": _backend,
+        "blender": lambda: _model().get(),
+        "feature_workers": feature_pool.warm_up,
+    }
+    if ENABLE_MLFLOW:
+        steps["mlflow"] = _mlflow
+    timings = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        step()
+        timings[name] = time.perf_counter() - started
+    return timings
+
+
+@app.on_event("startup")
+def _startup() -> None:
+    if WARMUP_ON_STARTUP:
+        warm_up()
+
+
+@app.on_event("shutdown")
+def _shutdown() -> None:
+    feature_pool.shutdown_executor()
 
 
 class AnalyzePayload(BaseModel):
     answer: str
     topic: Optional[str] = "general"
     course_name: Optional[str] = None
+    # Per-request overrides of CHUNKED_SCORING and CHUNK_AGGREGATE.
+    chunked: Optional[bool] = None
+    aggregate: Optional[Literal["max", "mean", "weighted"]] = None
 
 
 class TrainingSample(BaseModel):
@@ -52,94 +144,272 @@ class TrainPayload(BaseModel):
     samples: list[TrainingSample]
 
 
+class AnalyzeBatchPayload(BaseModel):
+    answers: list[AnalyzePayload] = Field(max_length=ANALYZE_BATCH_MAX)
+
+
 async def _ollama_coherence_score(prompt: str) -> float:
+    if not OLLAMA_BREAKER.allow():
+        COHERENCE_FALLBACKS.labels(reason="breaker_open").inc()
+        return 0.5
     try:
-        async with httpx.AsyncClient(timeout=20) as client:
-            response = await client.post(
-                f"{OLLAMA_HOST}/api/generate",
-                json={
-                    "model": os.getenv("OLLAMA_MODEL", "llama3"),
-                    "prompt": f"Evaluate coherence (0-1 float) for: {prompt[:800]}",
-                    "stream": False,
-                },
-            )
-            response.raise_for_status()
-            data = response.json()
-            text = data.get("response", "0.5")
-            for token in text.split():
-                try:
-                    score = float(token.strip().strip("%"))
-                    if 0 <= score <= 1:
-                        return score
-                    if 0 <= score <= 100:
-                        return score / 100
-                except ValueError:
-                    continue
+        with stage_timer("ollama"):
+            async with httpx.AsyncClient(timeout=OLLAMA_TIMEOUT) as client:
+                score = await arequest_score(
+                    client, OLLAMA_HOST, build_request(os.getenv("OLLAMA_MODEL", "llama3"), prompt)
+                )
     except Exception:
+        OLLAMA_BREAKER.record_failure()
+        COHERENCE_FALLBACKS.labels(reason="error").inc()
+        return 0.5
+    OLLAMA_BREAKER.record_success()
+    if score is None:
+        COHERENCE_FALLBACKS.labels(reason="unparsable").inc()
         return 0.5
-    return 0.5
+    return score
+
+
+async def _ollama_coherence_scores(prompts: list[str]) -> list[float]:
+    """Coherence for several answers, packed into shared generations (see coherence.py)."""
+    if not OLLAMA_BREAKER.allow():
+        COHERENCE_FALLBACKS.labels(reason="breaker_open").inc(len(prompts))
+        return [0.5] * len(prompts)
+    try:
+        with stage_timer("ollama_batch"):
+            async with httpx.AsyncClient(timeout=OLLAMA_TIMEOUT) as client:
+                scores = await arequest_scores(client, OLLAMA_HOST, os.getenv("OLLAMA_MODEL", "llama3"), prompts)
+    except Exception:
+        OLLAMA_BREAKER.record_failure()
+        COHERENCE_FALLBACKS.labels(reason="error").inc(len(prompts))
+        return [0.5] * len(prompts)
+    OLLAMA_BREAKER.record_success()
+    unparsable = sum(score is None for score in scores)
+    if unparsable:
+        COHERENCE_FALLBACKS.labels(reason="unparsable").inc(unparsable)
+    return [0.5 if score is None else score for score in scores]
+
+
+def _clean(answer: str) -> tuple[PreprocessedText, str]:
+    """The cleaned answer and its hash; every feature is computed from the cleaned text alone."""
+    with stage_timer("clean_text"):
+        processed = clean_text(answer)
+    return processed, hashlib.sha256(processed.cleaned.encode("utf-8")).hexdigest()
+
 
+async def _text_features(processed: PreprocessedText, language_model: NgramModel | None) -> dict[str, float]:
+    details, timings = await feature_pool.features(processed, _backend(), language_model)
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    return details
 
-async def _build_features(answer: str) -> tuple[torch.Tensor, dict[str, float]]:
-    processed = clean_text(answer)
-    tokens = processed.cleaned.split(" ")
-    cross_vec = compute_feature_vector(tokens)
-    tocsin = tocsin_score(tokens)
-    coherence = await _ollama_coherence_score(processed.cleaned)
-    features = torch.tensor(
+
+def _with_coherence(coherence: float, text_details: dict[str, float]) -> tuple[Any, dict[str, float]]:
+    details = {"coherence": coherence, **text_details}
+    features = _backend().as_features(
         [
             coherence,
-            cross_vec[0].item(),
-            tocsin,
-            processed.token_count / 1000.0,
-        ],
-        dtype=torch.float32,
+            details["cross_perplexity"],
+            details["tocsin"],
+            details["length_norm"],
+            details["lm_perplexity"],
+        ]
     )
-    details = {
-        "coherence": coherence,
-        "cross_perplexity": cross_vec[0].item(),
-        "tocsin": tocsin,
-        "length_norm": processed.token_count / 1000.0,
-    }
     return features, details
 
 
-@app.post("/analyze")
-async def analyze(payload: AnalyzePayload) -> dict[str, float]:
-    features, metrics = await _build_features(payload.answer)
-    probability = BLENDER.predict(features)
+async def _build_features(answer: str, model: LoadedModel) -> tuple[Any, dict[str, float]]:
+    """Features of one answer for ``model``; concurrent requests for the same cleaned text share one computation."""
+    processed, key = _clean(answer)
+
+    async def compute() -> tuple[Any, dict[str, float]]:
+        # The detectors run in a worker process while Ollama scores coherence.
+        details, coherence = await asyncio.gather(
+            _text_features(processed, model.language_model), _ollama_coherence_score(processed.cleaned)
+        )
+        return _with_coherence(coherence, details)
+
+    return await FEATURE_FLIGHTS.do(f"{model.version}:{key}", compute)
+
+
+async def _build_features_many(
+    answers: list[str], language_model: NgramModel | None
+) -> list[tuple[Any, dict[str, float]]]:
+    if not answers:
+        return []
+    cleaned = [_clean(answer) for answer in answers]
+    unique = {key: processed for processed, key in cleaned}
+    prepared, coherences = await asyncio.gather(
+        asyncio.gather(*(_text_features(processed, language_model) for processed in unique.values())),
+        _ollama_coherence_scores([processed.cleaned for processed in unique.values()]),
+    )
+    built = {key: _with_coherence(coherence, details) for key, coherence, details in zip(unique, coherences, prepared)}
+    return [built[key] for _, key in cleaned]
+
+
+def _result(payload: AnalyzePayload, features: Any, metrics: dict[str, float], model: LoadedModel) -> dict[str, Any]:
+    with stage_timer("blender"):
+        probability = model.model.predict(features)
+    return _respond(payload, probability, metrics, model)
+
+
+def _respond(
+    payload: AnalyzePayload, probability: float, metrics: dict[str, float], model: LoadedModel
+) -> dict[str, Any]:
     if ENABLE_MLFLOW:
-        with mlflow.start_run(run_name="inference", nested=True):
+        mlflow = _mlflow()
+        with stage_timer("mlflow"), mlflow.start_run(run_name="inference", nested=True):
             mlflow.log_params(
                 {
                     "topic": payload.topic or "general",
                     "course": payload.course_name or "unknown",
+                    "model_version": model.version,
                 }
             )
             mlflow.log_metrics({"ai_probability": probability, **metrics})
-    return {"ai_probability": probability, "flagged": probability >= 0.6, **metrics}
+    return {"ai_probability": probability, "flagged": probability >= 0.6, "model_version": model.version, **metrics}
+
+
+def _chunked(payload: AnalyzePayload) -> bool:
+    return CHUNKED_SCORING if payload.chunked is None else payload.chunked
+
+
+async def _chunked_results(payloads: list[AnalyzePayload], model: LoadedModel) -> list[dict[str, Any]]:
+    """Score each answer as up to ``CHUNK_MAX`` overlapping windows and aggregate them.
+
+    The windows of every answer are scored together: their detector features in parallel,
+    their coherence in shared Ollama prompts and their probabilities in one blender call.
+    The document's feature values are the token-weighted means of its windows'.
+    """
+    chunked = [chunk_text(payload.answer, CHUNK_TOKENS, CHUNK_OVERLAP, CHUNK_MAX) for payload in payloads]
+    windows = [chunk for chunks in chunked for chunk in chunks]
+    built = await _build_features_many([chunk.text.cleaned for chunk in windows], model.language_model)
+    with stage_timer("blender"):
+        probabilities = iter(model.model.predict_many([features for features, _ in built]))
+    details = iter(metrics for _, metrics in built)
+    results = []
+    for payload, chunks in zip(payloads, chunked):
+        scored = [(chunk, next(probabilities), next(details)) for chunk in chunks]
+        weights = [chunk.text.token_count for chunk in chunks]
+        method = payload.aggregate or CHUNK_AGGREGATE
+        probability = aggregate([p for _, p, _ in scored], weights, method)
+        metrics = {
+            name: aggregate([window[name] for *_, window in scored], weights, "weighted") for name in scored[0][2]
+        }
+        result = _respond(payload, probability, metrics, model)
+        result["aggregate"] = method
+        result["total_tokens"] = clean_text(payload.answer).total_tokens
+        result["chunks"] = [
+            {"start": chunk.start, "end": chunk.end, "ai_probability": p, **window} for chunk, p, window in scored
+        ]
+        results.append(result)
+    return results
+
+
+@app.post("/analyze")
+async def analyze(payload: AnalyzePayload) -> dict[str, Any]:
+    model = _model().get()
+    if _chunked(payload):
+        return (await _chunked_results([payload], model))[0]
+    features, metrics = await _build_features(payload.answer, model)
+    return _result(payload, features, metrics, model)
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(payload: AnalyzeBatchPayload) -> dict[str, Any]:
+    """``/analyze`` for several answers, sharing Ollama generations between them."""
+    if not payload.answers:
+        raise HTTPException(status_code=400, detail="No answers provided")
+    model = _model().get()
+    whole = [item for item in payload.answers if not _chunked(item)]
+    built = await _build_features_many([item.answer for item in whole], model.language_model)
+    results = {id(item): _result(item, *features, model) for item, features in zip(whole, built)}
+    chunked = [item for item in payload.answers if _chunked(item)]
+    if chunked:
+        results.update(zip(map(id, chunked), await _chunked_results(chunked, model)))
+    return {"results": [results[id(item)] for item in payload.answers]}
+
+
+def _pin_language_model() -> tuple[str | None, NgramModel | None]:
+    """The most recently built LM, copied into the registry so every worker scores the new version with it."""
+    path = default_path(MODEL_DIR)
+    if not path.exists():
+        return None, None
+    digest = REGISTRY.add_language_model(path)
+    return digest, load_model(REGISTRY.language_model_path(digest))
 
 
 @app.post("/train")
 async def train(payload: TrainPayload) -> dict[str, str]:
     if not payload.samples:
         raise HTTPException(status_code=400, detail="No training samples provided")
-    rows: list[tuple[torch.Tensor, float]] = []
-    for sample in payload.samples:
-        features, _ = await _build_features(sample.answer)
-        rows.append((features, torch.tensor(sample.label, dtype=torch.float32)))
-    BLENDER.fit(rows)
-    BLENDER.save()
+    digest, language_model = await asyncio.get_running_loop().run_in_executor(None, _pin_language_model)
+    built = await _build_features_many([sample.answer for sample in payload.samples], language_model)
+    rows = [(features, sample.label) for (features, _), sample in zip(built, payload.samples)]
+    handle = _model()
+    base = handle.get()
+    # Train a copy: the served model is immutable and other workers pick up the new version from the registry.
+    blender = _backend().blender_cls.from_dict(base.model.to_dict())
+    blender.fit(rows)
+    version = REGISTRY.publish(
+        {**blender.to_dict(), "parent": base.version, "samples": len(rows), LANGUAGE_MODEL_KEY: digest}
+    )
+    handle.refresh()
     if ENABLE_MLFLOW:
+        mlflow = _mlflow()
         with mlflow.start_run(run_name="training"):
             mlflow.log_metric("samples", len(rows))
-            mlflow.log_params({"trainer": "logistic_blender"})
-    return {"status": "model updated"}
+            mlflow.log_params({"trainer": "logistic_blender", "backend": _backend().name, "model_version": version})
+    return {"status": "model updated", "model_version": version}
+
+
+@app.get("/models")
+def list_models() -> dict[str, Any]:
+    return {"current": REGISTRY.current_version(), "versions": REGISTRY.versions()}
+
+
+@app.post("/models/{version}/activate")
+def activate_model(version: str) -> dict[str, str]:
+    try:
+        REGISTRY.activate(version)
+    except ValueError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    _model().refresh()
+    return {"status": "activated", "model_version": version}
 
 
 @app.get("/healthz")
-def health() -> dict[str, str]:
-    return {"status": "ok"}
+def health() -> dict[str, object]:
+    breaker = OLLAMA_BREAKER.snapshot()
+    return {"status": "ok" if breaker["state"] == CLOSED else "degraded", "breakers": {"ollama": breaker}}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
+
+
+def _profile_store(token: Optional[str]) -> ProfileStore:
+    if not token_allowed(PROFILING, token):
+        raise HTTPException(status_code=404, detail="Not found")
+    return ProfileStore(PROFILING.directory, PROFILING.keep)
+
+
+@app.get("/debug/profiles", response_model=list[ProfileRecord], include_in_schema=False)
+def list_profiles(x_profile: Optional[str] = Header(default=None, alias=PROFILE_HEADER)) -> list[ProfileRecord]:
+    return _profile_store(x_profile).list()
+
+
+@app.get("/debug/profiles/{profile_id}/{kind}", include_in_schema=False)
+def download_profile(
+    profile_id: str,
+    kind: str,
+    x_profile: Optional[str] = Header(default=None, alias=PROFILE_HEADER),
+) -> FileResponse:
+    path = _profile_store(x_profile).path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=path.name)
 
 
 @app.get("/contracts/ai-pipeline.yaml", include_in_schema=False)
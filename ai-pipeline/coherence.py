@@ -0,0 +1,268 @@
+"""Coherence scoring with Ollama's ``/api/generate``.
+
+Only the first number in the reply is used, so by default the reply is streamed
+(NDJSON, one chunk per token) and the connection is closed as soon as a complete score
+has arrived; closing it stops Ollama generating the rest of the explanation.
+``OLLAMA_NUM_PREDICT`` caps the tokens generated either way, and ``OLLAMA_FORMAT=json``
+constrains the reply to ``{"coherence": <0-1>}``.
+
+Bulk callers (imports, ``/train``) score several answers per generation instead: up
+to ``OLLAMA_BATCH_SIZE`` answers, within ``OLLAMA_BATCH_TOKENS`` of prompt, are packed
+into one numbered prompt that asks for ``{"scores": [...]}``. Answers whose score is
+missing or invalid are re-scored one at a time. At most ``OLLAMA_BATCH_CONCURRENCY``
+batches are in flight per call.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import re
+from typing import Any
+
+import httpx
+
+OLLAMA_STREAM = os.getenv("OLLAMA_STREAM", "1") == "1"
+OLLAMA_NUM_PREDICT = int(os.getenv("OLLAMA_NUM_PREDICT", "32"))
+OLLAMA_FORMAT = os.getenv("OLLAMA_FORMAT", "")
+FORMATS = ("", "json")
+# Ollama accepts a JSON schema as ``format`` and constrains decoding to it.
+COHERENCE_SCHEMA = {
+    "type": "object",
+    "properties": {"coherence": {"type": "number", "minimum": 0, "maximum": 1}},
+    "required": ["coherence"],
+}
+PROMPT_CHARS = 800
+OLLAMA_BATCH_SIZE = int(os.getenv("OLLAMA_BATCH_SIZE", "8"))
+OLLAMA_BATCH_TOKENS = int(os.getenv("OLLAMA_BATCH_TOKENS", "2048"))
+OLLAMA_BATCH_CONCURRENCY = int(os.getenv("OLLAMA_BATCH_CONCURRENCY", "4"))
+# Rough size of a prompt in tokens; only used to pack batches, so it need not be exact.
+CHARS_PER_TOKEN = 4
+BATCH_PROMPT = (
+    "Rate the coherence of each numbered answer from 0 to 1. Reply as JSON "
+    '{{"scores": [...]}} with exactly {count} numbers, in answer order.\n\n{answers}'
+)
+
+# A number standing on its own: not part of "0-1", a version, a word or the "10" of
+# "8/10". "N/M" and "N out of M" are read as a ratio. Without a terminating character
+# it may still be growing ("0." before "73"), so it only counts once something follows
+# it or the reply has ended.
+_SCORE = re.compile(
+    r"(?<![\w.\-/])(\d+(?:\.\d+)?)"
+    r"(?:(%)|(?:\s*(?:/|(?i:out\s+of))\s*(\d+(?:\.\d+)?))?(?=[\s,;:)}\]\"']|\.(?!\d).))"
+)
+# What may follow a number that is about to become a ratio: "7 ", "7 out o", "8 / 1".
+_PENDING_RATIO = re.compile(r"\s*(?:/\s*[\d.]*|o(?:u(?:t(?:\s+(?:o(?:f(?:\s+[\d.]*)?)?)?)?)?)?)?$", re.IGNORECASE)
+
+
+def build_request(
+    model: str,
+    text: str,
+    stream: bool = OLLAMA_STREAM,
+    num_predict: int = OLLAMA_NUM_PREDICT,
+    output_format: str = OLLAMA_FORMAT,
+) -> dict[str, Any]:
+    if output_format not in FORMATS:
+        raise ValueError(f"Unknown Ollama output format {output_format!r}; expected '' or 'json'")
+    payload: dict[str, Any] = {"model": model, "stream": stream}
+    if output_format == "json":
+        payload["prompt"] = (
+            'Rate the coherence of this answer from 0 to 1 and reply as {"coherence": <float>}: '
+            f"{text[:PROMPT_CHARS]}"
+        )
+        payload["format"] = COHERENCE_SCHEMA
+    else:
+        payload["prompt"] = f"Evaluate coherence (0-1 float) for: {text[:PROMPT_CHARS]}"
+    if num_predict > 0:
+        payload["options"] = {"num_predict": num_predict}
+    return payload
+
+
+def parse_score(text: str, final: bool = True) -> float | None:
+    """First score in ``text``: a 0-1 float, a ratio, or a 0-100 value read as a percentage."""
+    for match in _SCORE.finditer(text + " " if final else text):
+        value = float(match.group(1))
+        if match.group(3) is not None:
+            scale = float(match.group(3))
+            if 0 < scale and value <= scale:
+                return value / scale
+            continue
+        if not final and _PENDING_RATIO.match(text, match.end()):
+            return None
+        if 0 <= value <= 1:
+            return value
+        if 0 <= value <= 100:
+            return value / 100
+    return None
+
+
+class ScoreStream:
+    """Accumulates NDJSON ``/api/generate`` chunks until they contain a complete score."""
+
+    def __init__(self) -> None:
+        self.text = ""
+        self.done = False
+        self.chunks = 0
+
+    def feed(self, line: str) -> float | None:
+        if not line.strip():
+            return None
+        chunk = json.loads(line)
+        if "error" in chunk:
+            raise RuntimeError(f"Ollama error: {chunk['error']}")
+        self.chunks += 1
+        self.text += chunk.get("response", "")
+        self.done = bool(chunk.get("done"))
+        return parse_score(self.text, final=self.done)
+
+
+def request_score(client: httpx.Client, host: str, payload: dict[str, Any]) -> float | None:
+    """Ask Ollama for a coherence score; None when the reply holds no usable number."""
+    url = f"{host.rstrip('/')}/api/generate"
+    if not payload.get("stream"):
+        response = client.post(url, json=payload)
+        response.raise_for_status()
+        return parse_score(str(response.json().get("response", "")))
+    stream = ScoreStream()
+    with client.stream("POST", url, json=payload) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            score = stream.feed(line)
+            if score is not None or stream.done:
+                return score  # leaving the block closes the connection and stops generation
+    return parse_score(stream.text)
+
+
+async def arequest_score(client: httpx.AsyncClient, host: str, payload: dict[str, Any]) -> float | None:
+    """``request_score`` for an async client."""
+    url = f"{host.rstrip('/')}/api/generate"
+    if not payload.get("stream"):
+        response = await client.post(url, json=payload)
+        response.raise_for_status()
+        return parse_score(str(response.json().get("response", "")))
+    stream = ScoreStream()
+    async with client.stream("POST", url, json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            score = stream.feed(line)
+            if score is not None or stream.done:
+                return score
+    return parse_score(stream.text)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text[:PROMPT_CHARS]) // CHARS_PER_TOKEN + 8  # + the "Answer n:" label and separators
+
+
+def pack_batches(
+    texts: list[str], max_items: int = OLLAMA_BATCH_SIZE, max_tokens: int = OLLAMA_BATCH_TOKENS
+) -> list[list[int]]:
+    """Group the indexes of ``texts`` into prompts of at most ``max_items`` answers and ``max_tokens``."""
+    batches: list[list[int]] = []
+    current: list[int] = []
+    used = estimate_tokens(BATCH_PROMPT)
+    for index, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if current and (len(current) >= max_items or used + cost > max_tokens):
+            batches.append(current)
+            current, used = [], estimate_tokens(BATCH_PROMPT)
+        current.append(index)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+
+def build_batch_request(model: str, texts: list[str]) -> dict[str, Any]:
+    answers = "\n\n".join(f"Answer {number}: {text[:PROMPT_CHARS]}" for number, text in enumerate(texts, start=1))
+    scores = {"type": "number", "minimum": 0, "maximum": 1}
+    return {
+        "model": model,
+        "prompt": BATCH_PROMPT.format(count=len(texts), answers=answers),
+        "stream": False,
+        "format": {
+            "type": "object",
+            "properties": {
+                "scores": {"type": "array", "items": scores, "minItems": len(texts), "maxItems": len(texts)}
+            },
+            "required": ["scores"],
+        },
+        # About six tokens per number plus the surrounding object.
+        "options": {"num_predict": 6 * len(texts) + 16},
+    }
+
+
+def parse_batch_scores(text: str, count: int) -> list[float | None]:
+    """Scores from a batch reply, aligned with the answers; None for each one that is unusable.
+
+    A reply of the wrong length cannot be aligned with the answers, so none of it is used.
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return [None] * count
+    values = data.get("scores") if isinstance(data, dict) else data
+    if not isinstance(values, list) or len(values) != count:
+        return [None] * count
+    return [
+        parse_score(str(value)) if isinstance(value, (int, float, str)) and not isinstance(value, bool) else None
+        for value in values
+    ]
+
+
+def request_scores(client: httpx.Client, host: str, model: str, texts: list[str]) -> list[float | None]:
+    """Coherence scores for ``texts`` with one generation per batch; see ``pack_batches``.
+
+    Answers a batch reply leaves unscored, or whose batch request failed, are scored one
+    at a time, so only a failing single-answer request raises.
+    """
+    url = f"{host.rstrip('/')}/api/generate"
+    scores: list[float | None] = [None] * len(texts)
+    for batch in pack_batches(texts):
+        if len(batch) > 1:
+            try:
+                response = client.post(url, json=build_batch_request(model, [texts[index] for index in batch]))
+                response.raise_for_status()
+                parsed = parse_batch_scores(str(response.json().get("response", "")), len(batch))
+            except (httpx.HTTPError, ValueError):
+                # A failed batch falls back to single-answer requests instead of failing every answer.
+                parsed = [None] * len(batch)
+            for index, score in zip(batch, parsed):
+                scores[index] = score
+        for index in batch:
+            if scores[index] is None:
+                scores[index] = request_score(client, host, build_request(model, texts[index]))
+    return scores
+
+
+async def arequest_scores(
+    client: httpx.AsyncClient,
+    host: str,
+    model: str,
+    texts: list[str],
+    concurrency: int = OLLAMA_BATCH_CONCURRENCY,
+) -> list[float | None]:
+    """``request_scores`` for an async client; up to ``concurrency`` batches are sent at once."""
+    url = f"{host.rstrip('/')}/api/generate"
+    scores: list[float | None] = [None] * len(texts)
+    slots = asyncio.Semaphore(max(concurrency, 1))
+
+    async def score_batch(batch: list[int]) -> None:
+        async with slots:
+            if len(batch) > 1:
+                try:
+                    request = build_batch_request(model, [texts[index] for index in batch])
+                    response = await client.post(url, json=request)
+                    response.raise_for_status()
+                    parsed = parse_batch_scores(str(response.json().get("response", "")), len(batch))
+                except (httpx.HTTPError, ValueError):
+                    parsed = [None] * len(batch)
+                for index, score in zip(batch, parsed):
+                    scores[index] = score
+            for index in batch:
+                if scores[index] is None:
+                    scores[index] = await arequest_score(client, host, build_request(model, texts[index]))
+
+    await asyncio.gather(*(score_batch(batch) for batch in pack_batches(texts)))
+    return scores
@@ -4,8 +4,6 @@ import math
 from collections import Counter
 from typing import Sequence
 
-import torch
-
 
 def cross_perplexity_score(tokens: Sequence[str]) -> float:
     if not tokens:
@@ -18,8 +16,14 @@ def cross_perplexity_score(tokens: Sequence[str]) -> float:
     return float(normalized)
 
 
-def compute_feature_vector(tokens: Sequence[str]) -> torch.Tensor:
+def feature_values(tokens: Sequence[str]) -> list[float]:
     vocab = len(set(tokens))
     cross_perp = cross_perplexity_score(tokens)
     avg_len = sum(len(t) for t in tokens) / max(len(tokens), 1)
-    return torch.tensor([cross_perp, vocab / 500.0, avg_len / 10.0], dtype=torch.float32)
+    return [cross_perp, vocab / 500.0, avg_len / 10.0]
+
+
+def compute_feature_vector(tokens: Sequence[str]) -> "torch.Tensor":
+    import torch  # only the torch backend needs it
+
+    return torch.tensor(feature_values(tokens), dtype=torch.float32)
@@ -0,0 +1,213 @@
+"""Hashed n-gram language model of human answers, scored from memory-mapped count tables.
+
+``build`` counts the 1..``order``-grams of a corpus into one fixed-size table of uint32
+counters per order, indexed by a hash of the n-gram (collisions are accepted, as in a
+count-min sketch with one row). The file is a small header followed by the tables, so
+``NgramModel.load`` maps it read-only and indexes it in place: loading is instant and
+every process that maps the same file shares one copy in the page cache.
+
+``perplexity_feature`` is the per-token negative log-likelihood under an interpolated
+(Jelinek-Mercer) model with an add-one unigram floor, scaled to [0, 1] by its maximum.
+
+    python -m detectors.ngram_lm build answers.txt --output models/ngram-lm.bin
+    python -m detectors.ngram_lm score models/ngram-lm.bin "some answer text"
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass, field
+from pathlib import Path
+
+MAGIC = b"NGLM"
+FORMAT_VERSION = 1
+# magic, format version, order, log2(buckets), tokens counted, answers counted
+_HEADER = struct.Struct("<4sIIIQQ")
+DEFAULT_ORDER = 3
+DEFAULT_BUCKET_BITS = 20  # 1M counters per order: 4 MB each
+# Interpolation weights for the unigram, bigram and trigram estimates (higher orders share the last).
+LAMBDAS = (0.1, 0.3, 0.6)
+# Feature value when no model has been built.
+NEUTRAL = 0.5
+MODEL_FILE = "ngram-lm.bin"
+_MASK32 = 0xFFFFFFFF
+_MAX_COUNT = _MASK32
+
+
+def _token_hashes(tokens: Sequence[str]) -> list[int]:
+    # crc32 rather than hash(): it must not change between processes or runs.
+    return [zlib.crc32(token.encode("utf-8")) for token in tokens]
+
+
+def _slots(hashes: Sequence[int], order: int, shift: int) -> list[list[int]]:
+    """``slots[n - 1][i]``: table index of the n-gram ending at token ``i`` (-1 before the text starts)."""
+    slots = []
+    gram = list(hashes)
+    for n in range(1, order + 1):
+        if n > 1:
+            # Extend each (n-1)-gram hash with the token before it.
+            gram = [-1] * (n - 1) + [
+                ((gram[i] * 0x01000193) ^ hashes[i - n + 1]) & _MASK32 for i in range(n - 1, len(hashes))
+            ]
+        salt = n * 0x85EBCA6B
+        slots.append([-1 if value < 0 else (((value ^ salt) * 0x9E3779B1) & _MASK32) >> shift for value in gram])
+    return slots
+
+
+def _weights(order: int) -> list[float]:
+    weights = [LAMBDAS[min(n, len(LAMBDAS) - 1)] for n in range(order)]
+    total = math.fsum(weights)
+    return [weight / total for weight in weights]
+
+
+@dataclass
+class NgramModel:
+    order: int
+    bucket_bits: int
+    tokens: int
+    answers: int
+    tables: list[Sequence[int]]  # one per order; memoryviews of the mapped file when loaded
+    path: Path | None = field(default=None, compare=False)  # the file the tables were loaded from or written to
+
+    @classmethod
+    def load(cls, path: Path) -> NgramModel:
+        with open(path, "rb") as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, order, bucket_bits, tokens, answers = _HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} n-gram model")
+        if sys.byteorder != "little":  # pragma: no cover - the tables are stored little-endian
+            raise ValueError("n-gram models can only be mapped on little-endian machines")
+        size = 4 << bucket_bits
+        view = memoryview(mapped)
+        tables = [
+            view[_HEADER.size + n * size : _HEADER.size + (n + 1) * size].cast("I") for n in range(order)
+        ]
+        return cls(order, bucket_bits, tokens, answers, tables, path)
+
+    def mean_nll(self, tokens: Sequence[str]) -> float:
+        """Average negative log-likelihood (nats) per token."""
+        if not tokens:
+            return 0.0
+        slots = _slots(_token_hashes(tokens), self.order, 32 - self.bucket_bits)
+        counts = [[table[slot] if slot >= 0 else 0 for slot in row] for table, row in zip(self.tables, slots)]
+        weights = _weights(self.order)
+        floor = self.tokens + (1 << self.bucket_bits)
+        probabilities = [weights[0] * (count + 1) / floor for count in counts[0]]
+        for n in range(1, self.order):
+            # P(token | the n tokens before it) = count(n+1-gram) / count(n-gram ending one token earlier)
+            weight, contexts = weights[n], [0, *counts[n - 1][:-1]]
+            probabilities = [
+                probability + weight * min(count / context, 1.0) if context else probability
+                for probability, count, context in zip(probabilities, counts[n], contexts)
+            ]
+        return -math.fsum(map(math.log, probabilities)) / len(tokens)
+
+    def max_nll(self) -> float:
+        """The NLL of a token never seen in any context."""
+        return math.log((self.tokens + (1 << self.bucket_bits)) / _weights(self.order)[0])
+
+    def perplexity(self, tokens: Sequence[str]) -> float:
+        return math.exp(self.mean_nll(tokens))
+
+    def perplexity_feature(self, tokens: Sequence[str]) -> float:
+        return min(self.mean_nll(tokens) / self.max_nll(), 1.0)
+
+
+def default_path(model_dir: Path | None = None) -> Path:
+    """``NGRAM_MODEL_PATH``, else ``ngram-lm.bin`` beside the blender registry in ``model_dir`` / ``MODEL_DIR``."""
+    if os.getenv("NGRAM_MODEL_PATH"):
+        return Path(os.environ["NGRAM_MODEL_PATH"])
+    model_dir = model_dir or Path(os.getenv("MODEL_DIR", Path(__file__).resolve().parents[1] / "models"))
+    return model_dir / MODEL_FILE
+
+
+def load_model(path: Path | None = None) -> NgramModel | None:
+    """The model at ``path`` (default: ``default_path()``), or None when none has been built."""
+    path = path or default_path()
+    return NgramModel.load(path) if path.exists() else None
+
+
+def perplexity_feature(model: NgramModel | None, tokens: Sequence[str]) -> float:
+    return NEUTRAL if model is None else model.perplexity_feature(tokens)
+
+
+def build(
+    texts: Iterable[str], output: Path, order: int = DEFAULT_ORDER, bucket_bits: int = DEFAULT_BUCKET_BITS
+) -> NgramModel:
+    """Count the n-grams of ``texts``, cleaned like the answers that will be scored, into ``output``."""
+    from preprocess import clean_text
+
+    shift = 32 - bucket_bits
+    tables = [array("I", bytes(4 << bucket_bits)) for _ in range(order)]
+    tokens = answers = 0
+    for text in texts:
+        # The same normalization as the answers being scored, without the 900-token cut.
+        words = clean_text(text, max_tokens=sys.maxsize).cleaned.split()
+        if not words:
+            continue
+        answers += 1
+        tokens += len(words)
+        for table, slots in zip(tables, _slots(_token_hashes(words), order, shift)):
+            for slot in slots:
+                if slot >= 0 and table[slot] < _MAX_COUNT:
+                    table[slot] += 1
+    output.parent.mkdir(parents=True, exist_ok=True)
+    # Written beside the target and renamed over it: processes that mapped the old file keep reading it.
+    fd, tmp = tempfile.mkstemp(dir=output.parent, prefix=f".{output.name}.")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            handle.write(_HEADER.pack(MAGIC, FORMAT_VERSION, order, bucket_bits, tokens, answers))
+            for table in tables:
+                if sys.byteorder != "little":  # pragma: no cover
+                    table.byteswap()
+                table.tofile(handle)
+        os.replace(tmp, output)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return NgramModel(order, bucket_bits, tokens, answers, tables, output)
+
+
+def _read_lines(paths: list[str]) -> Iterable[str]:
+    for path in paths:
+        with (sys.stdin if path == "-" else open(path, encoding="utf-8")) as handle:
+            yield from (line for line in handle if line.strip())
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m detectors.ngram_lm", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="count answers (one per line) into a model file")
+    build_parser.add_argument("inputs", nargs="+", help="text files with one answer per line, or - for stdin")
+    build_parser.add_argument("--output", type=Path, required=True)
+    build_parser.add_argument("--order", type=int, default=DEFAULT_ORDER)
+    build_parser.add_argument("--bucket-bits", type=int, default=DEFAULT_BUCKET_BITS)
+    score_parser = commands.add_parser("score", help="print the perplexity of a text")
+    score_parser.add_argument("model", type=Path)
+    score_parser.add_argument("text")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        model = build(_read_lines(args.inputs), args.output, args.order, args.bucket_bits)
+        print(f"{args.output}: {model.answers} answers, {model.tokens} tokens, {args.output.stat().st_size} bytes")
+        return 0
+    from preprocess import clean_text
+
+    model = NgramModel.load(args.model)
+    tokens = clean_text(args.text).cleaned.split()
+    print(f"perplexity {model.perplexity(tokens):.1f}, feature {model.perplexity_feature(tokens):.4f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
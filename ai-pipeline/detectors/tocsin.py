@@ -1,35 +1,74 @@
 from __future__ import annotations
 
+import math
 import random
+import zlib
 from typing import Sequence
 
-import torch
+BUCKETS = 128
+
+
+def _bucket(token: str) -> int:
+    # ``hash`` of a str differs between processes (PYTHONHASHSEED); CRC-32 does not.
+    return zlib.crc32(token.encode("utf-8")) % BUCKETS
 
 
 def random_perturb(tokens: Sequence[str], drop_ratio: float = 0.1) -> list[str]:
+    """Drop ``drop_ratio`` of the tokens; the same tokens always lose the same positions."""
     if not tokens:
         return []
     count = max(1, int(len(tokens) * drop_ratio))
-    indices = set(random.sample(range(len(tokens)), min(count, len(tokens))))
+    # Seeded from the text (a str seed is hashed with SHA-512, not ``hash``) so every
+    # process, feature worker or not, perturbs an answer the same way.
+    rng = random.Random(" ".join(tokens))
+    indices = set(rng.sample(range(len(tokens)), min(count, len(tokens))))
     return [tok for idx, tok in enumerate(tokens) if idx not in indices]
 
 
 def semantic_distance(original: Sequence[str], perturbed: Sequence[str]) -> float:
+    import torch  # only the torch backend needs it
+
     if not original:
         return 0.0
-    original_vec = torch.zeros(128)
-    perturbed_vec = torch.zeros(128)
+    original_vec = torch.zeros(BUCKETS)
+    perturbed_vec = torch.zeros(BUCKETS)
     for token in original:
-        original_vec[hash(token) % 128] += 1
+        original_vec[_bucket(token)] += 1
     for token in perturbed:
-        perturbed_vec[hash(token) % 128] += 1
+        perturbed_vec[_bucket(token)] += 1
     original_norm = torch.nn.functional.normalize(original_vec.unsqueeze(0), dim=1)
     perturbed_norm = torch.nn.functional.normalize(perturbed_vec.unsqueeze(0), dim=1)
     cosine = torch.nn.functional.cosine_similarity(original_norm, perturbed_norm).item()
     return 1 - cosine
 
 
+def _bucket_counts(tokens: Sequence[str]) -> list[float]:
+    counts = [0.0] * BUCKETS
+    for token in tokens:
+        counts[_bucket(token)] += 1
+    return counts
+
+
+def semantic_distance_python(original: Sequence[str], perturbed: Sequence[str]) -> float:
+    """``semantic_distance`` without torch: cosine distance between hashed bag-of-words counts."""
+    if not original:
+        return 0.0
+    original_vec = _bucket_counts(original)
+    perturbed_vec = _bucket_counts(perturbed)
+    # Matches torch's normalize (norm clamped at 1e-12) followed by cosine_similarity.
+    original_norm = max(math.sqrt(math.fsum(v * v for v in original_vec)), 1e-12)
+    perturbed_norm = max(math.sqrt(math.fsum(v * v for v in perturbed_vec)), 1e-12)
+    dot = math.fsum(a * b for a, b in zip(original_vec, perturbed_vec))
+    return 1 - dot / (original_norm * perturbed_norm)
+
+
 def tocsin_score(tokens: Sequence[str]) -> float:
     perturbed = random_perturb(tokens)
     distance = semantic_distance(tokens, perturbed)
     return max(0.0, min(distance, 1.0))
+
+
+def tocsin_score_python(tokens: Sequence[str]) -> float:
+    perturbed = random_perturb(tokens)
+    distance = semantic_distance_python(tokens, perturbed)
+    return max(0.0, min(distance, 1.0))
@@ -1,41 +1,127 @@
 from __future__ import annotations
 
 import json
+import math
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable
-
-import torch
+from typing import Iterable, Sequence
 
 
 MODEL_PATH = Path("models/logit_blender.json")
+# coherence, cross_perplexity, tocsin, length_norm, lm_perplexity. The n-gram LM feature
+# starts at weight 0 so scores only change once a model trained on it is published.
+DEFAULT_WEIGHTS = [0.4, 0.4, 0.4, 0.4, 0.0]
+FEATURE_COUNT = len(DEFAULT_WEIGHTS)
+DEFAULT_BIAS = -0.4
+AGGREGATES = ("max", "mean", "weighted")
 
 
+# torch is imported inside the methods so the torch-free backend can import this module.
 @dataclass
 class LogisticBlender:
-    weights: torch.Tensor
-    bias: torch.Tensor
+    weights: "torch.Tensor"
+    bias: "torch.Tensor"
+
+    def predict(self, features: "torch.Tensor") -> float:
+        import torch
 
-    def predict(self, features: torch.Tensor) -> float:
         logits = torch.matmul(features, self.weights) + self.bias
         return torch.sigmoid(logits).item()
 
+    def predict_many(self, features: Sequence["torch.Tensor"]) -> list[float]:
+        import torch
+
+        logits = torch.matmul(torch.stack(list(features)), self.weights) + self.bias
+        return torch.sigmoid(logits).tolist()
+
+    def to_dict(self) -> dict:
+        return {"weights": self.weights.tolist(), "bias": float(self.bias.item())}
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "LogisticBlender":
+        import torch
+
+        weights = torch.tensor(_padded(payload["weights"]), dtype=torch.float32)
+        return cls(weights=weights, bias=torch.tensor(payload["bias"]))
+
     def save(self, path: Path = MODEL_PATH) -> None:
         path.parent.mkdir(parents=True, exist_ok=True)
-        payload = {"weights": self.weights.tolist(), "bias": float(self.bias.item())}
-        path.write_text(json.dumps(payload))
+        path.write_text(json.dumps(self.to_dict()))
 
     @classmethod
     def load(cls, path: Path = MODEL_PATH) -> "LogisticBlender":
         if path.exists():
-            payload = json.loads(path.read_text())
-            return cls(weights=torch.tensor(payload["weights"], dtype=torch.float32), bias=torch.tensor(payload["bias"]))
-        return cls(weights=torch.ones(4, dtype=torch.float32) * 0.4, bias=torch.tensor(-0.4))
+            return cls.from_dict(json.loads(path.read_text()))
+        return cls.from_dict({"weights": DEFAULT_WEIGHTS, "bias": DEFAULT_BIAS})
+
+    def fit(self, rows: Iterable[tuple["torch.Tensor", float]], lr: float = 0.1, epochs: int = 100) -> None:
+        import torch
 
-    def fit(self, rows: Iterable[tuple[torch.Tensor, float]], lr: float = 0.1, epochs: int = 100) -> None:
         for _ in range(epochs):
             for features, label in rows:
                 pred = torch.sigmoid(torch.matmul(features, self.weights) + self.bias)
                 error = pred - label
                 self.weights = self.weights - lr * error * features
                 self.bias = self.bias - lr * error
+
+
+def _padded(weights: Sequence[float]) -> list[float]:
+    """Weights saved before a feature was added give it weight 0, so they score as they did."""
+    return list(weights) + [0.0] * (FEATURE_COUNT - len(weights))
+
+
+def aggregate(probabilities: Sequence[float], weights: Sequence[float], method: str = "max") -> float:
+    """One document probability from per-chunk ones; ``weighted`` averages by ``weights`` (token counts)."""
+    if method == "max":
+        return max(probabilities)
+    if method == "mean":
+        return math.fsum(probabilities) / len(probabilities)
+    if method == "weighted":
+        return math.fsum(p * w for p, w in zip(probabilities, weights)) / math.fsum(weights)
+    raise ValueError(f"Unknown chunk aggregate {method!r}; expected one of {', '.join(AGGREGATES)}")
+
+
+def _sigmoid(value: float) -> float:
+    if value >= 0:
+        return 1.0 / (1.0 + math.exp(-value))
+    exp = math.exp(value)
+    return exp / (1.0 + exp)
+
+
+@dataclass
+class PythonBlender:
+    """``LogisticBlender`` on plain floats: same model file, same predictions, no torch."""
+
+    weights: list[float]
+    bias: float
+
+    def predict(self, features: Sequence[float]) -> float:
+        return _sigmoid(math.fsum(w * x for w, x in zip(self.weights, features)) + self.bias)
+
+    def predict_many(self, features: Sequence[Sequence[float]]) -> list[float]:
+        return [self.predict(row) for row in features]
+
+    def to_dict(self) -> dict:
+        return {"weights": list(self.weights), "bias": float(self.bias)}
+
+    @classmethod
+    def from_dict(cls, payload: dict) -> "PythonBlender":
+        return cls(weights=[float(w) for w in _padded(payload["weights"])], bias=float(payload["bias"]))
+
+    def save(self, path: Path = MODEL_PATH) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict()))
+
+    @classmethod
+    def load(cls, path: Path = MODEL_PATH) -> "PythonBlender":
+        if path.exists():
+            return cls.from_dict(json.loads(path.read_text()))
+        return cls.from_dict({"weights": DEFAULT_WEIGHTS, "bias": DEFAULT_BIAS})
+
+    def fit(self, rows: Iterable[tuple[Sequence[float], float]], lr: float = 0.1, epochs: int = 100) -> None:
+        rows = list(rows)
+        for _ in range(epochs):
+            for features, label in rows:
+                error = self.predict(features) - float(label)
+                self.weights = [w - lr * error * x for w, x in zip(self.weights, features)]
+                self.bias -= lr * error
@@ -0,0 +1,135 @@
+"""Detector features computed in worker processes.
+
+The cross-perplexity and TOCSIN detectors are pure CPU work. Run on the event loop they
+block every other request in the process and use a single core, so they run
+in a pool of ``FEATURE_WORKERS`` processes instead, each of which imports the inference
+backend once when it starts. ``FEATURE_WORKERS=0`` computes them inline. Each call names
+the n-gram LM of the model it is scored for, and a worker maps the few it is asked for.
+
+Workers are spawned rather than forked: forking a parent that has already loaded torch
+(and its thread pools) can deadlock the child.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+from detectors.ngram_lm import NgramModel, perplexity_feature
+from preprocess import PreprocessedText
+from runtime import InferenceBackend, load_backend
+
+FEATURE_WORKERS = int(os.getenv("FEATURE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by ``_init_worker``.
+_worker_backend: InferenceBackend | None = None
+
+
+def _init_worker() -> None:
+    global _worker_backend
+    _worker_backend = load_backend()
+    if _worker_backend.name == "torch":
+        import torch
+
+        torch.set_num_threads(1)  # the pool already uses one process per core
+
+
+def text_features(
+    cleaned: str, token_count: int, backend: InferenceBackend, language_model: NgramModel | None
+) -> tuple[dict[str, float], dict[str, float]]:
+    """Detector features of a cleaned answer, and the seconds each detector took."""
+    tokens = cleaned.split(" ")
+    timings = {}
+    started = time.perf_counter()
+    cross_perplexity = backend.cross_perplexity(tokens)
+    timings["cross_perplexity"] = time.perf_counter() - started
+    started = time.perf_counter()
+    tocsin = backend.tocsin_score(tokens)
+    timings["tocsin"] = time.perf_counter() - started
+    started = time.perf_counter()
+    lm_perplexity = perplexity_feature(language_model, tokens)
+    timings["lm_perplexity"] = time.perf_counter() - started
+    details = {
+        "cross_perplexity": cross_perplexity,
+        "tocsin": tocsin,
+        "length_norm": token_count / 1000.0,
+        "lm_perplexity": lm_perplexity,
+    }
+    return details, timings
+
+
+@functools.lru_cache(maxsize=4)
+def _mapped_language_model(path: Path) -> NgramModel:
+    return NgramModel.load(path)  # memory-mapped: every worker shares the same pages
+
+
+def _worker_text_features(
+    cleaned: str, token_count: int, language_model_path: Path | None
+) -> tuple[dict[str, float], dict[str, float]]:
+    language_model = _mapped_language_model(language_model_path) if language_model_path else None
+    return text_features(cleaned, token_count, _worker_backend, language_model)
+
+
+def _ping() -> str:
+    return _worker_backend.name
+
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor | None:
+    global _executor
+    if _executor is None and FEATURE_WORKERS > 0:
+        _executor = ProcessPoolExecutor(
+            max_workers=FEATURE_WORKERS, mp_context=multiprocessing.get_context("spawn"), initializer=_init_worker
+        )
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def warm_up() -> None:
+    """Start every worker and wait until each has loaded the backend."""
+    executor = get_executor()
+    if executor is not None:
+        for future in [executor.submit(_ping) for _ in range(FEATURE_WORKERS)]:
+            future.result()
+
+
+async def features(
+    processed: PreprocessedText, backend: InferenceBackend, language_model: NgramModel | None
+) -> tuple[dict[str, float], dict[str, float]]:
+    """``text_features`` in a worker process, or inline (with ``backend``) without a pool.
+
+    Returns the features and each detector's seconds, which the caller records: this
+    module registers no metrics, so main-service's tests can import it.
+    """
+    executor = get_executor()
+    if executor is None:
+        details, timings = text_features(processed.cleaned, processed.token_count, backend, language_model)
+    else:
+        try:
+            path = language_model.path if language_model is not None else None
+            details, timings = await asyncio.get_running_loop().run_in_executor(
+                executor, _worker_text_features, processed.cleaned, processed.token_count, path
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool and score this answer here.
+            logger.exception("Feature worker pool broke; restarting it")
+            shutdown_executor()
+            details, timings = text_features(processed.cleaned, processed.token_count, backend, language_model)
+    return details, timings
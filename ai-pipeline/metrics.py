@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from contextlib import AbstractContextManager
+
+from prometheus_client import Counter, Gauge, Histogram
+from service_common import metrics as service_metrics
+from service_common.circuit_breaker import BreakerMetrics
+from starlette.types import ASGIApp
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Time spent in one stage of the detection pipeline",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+COHERENCE_FALLBACKS = Counter(
+    "coherence_fallbacks_total",
+    "Ollama coherence calls that fell back to the neutral 0.5 score",
+    ["reason"],
+)
+COALESCED_CALLS = Counter(
+    "coalesced_calls_total",
+    "Calls to a coalesced computation, by whether they ran it or shared one already in flight",
+    ["flight", "outcome"],
+)
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open",
+    ["breaker"],
+    multiprocess_mode="max",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state changes, by the state entered",
+    ["breaker", "state"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls skipped because the breaker was open",
+    ["breaker"],
+)
+BREAKER_METRICS = BreakerMetrics(CIRCUIT_STATE, CIRCUIT_TRANSITIONS, CIRCUIT_REJECTIONS)
+
+
+def stage_timer(stage: str) -> AbstractContextManager[None]:
+    return service_metrics.observe_seconds(STAGE_SECONDS.labels(stage=stage))
+
+
+render_metrics = service_metrics.render_metrics
+
+
+class RequestMetricsMiddleware(service_metrics.RequestMetricsMiddleware):
+    def __init__(self, app: ASGIApp) -> None:
+        super().__init__(app, REQUEST_SECONDS)
@@ -0,0 +1,205 @@
+"""Versioned, file-based registry for the blender weights.
+
+Layout under ``MODEL_DIR``::
+
+    versions/<version>.json            immutable; never rewritten once published
+    language_models/<digest>.bin       n-gram LMs that versions were trained with, by content
+    CURRENT                            the active version id, swapped atomically with os.replace
+
+A directory written before the registry existed (only ``logit_blender.json``) is served
+as version ``legacy``; with no model at all the built-in weights are version ``default``.
+Every process that scores answers (ai-pipeline workers, main-service's local tier) reads
+the same directory, and a ``ModelHandle`` notices a new ``CURRENT`` within
+``check_seconds`` and swaps it in.
+
+A version's ``language_model`` is the digest of the n-gram LM its ``lm_perplexity``
+feature was computed with (None: trained without one). The handle maps that LM together
+with the weights, so rebuilding ``ngram-lm.bin`` only changes scores once a version
+trained with it is published. Versions without the key (``default``, ``legacy`` and
+older ones) use whatever LM ``load_language_model`` finds beside the registry.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+from ensemble import DEFAULT_BIAS, DEFAULT_WEIGHTS
+
+DEFAULT_VERSION = "default"
+LEGACY_VERSION = "legacy"
+LEGACY_FILE = "logit_blender.json"
+LANGUAGE_MODEL_KEY = "language_model"
+_DIGEST = re.compile(r"[0-9a-f]{16}")
+
+
+def _write_atomic(path: Path, text: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "w") as handle:
+            handle.write(text)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.chmod(tmp, 0o644)  # mkstemp creates 0600; other services' workers read these files
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class ModelRegistry:
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+        self.versions_dir = self.root / "versions"
+        self.pointer = self.root / "CURRENT"
+        self.language_models_dir = self.root / "language_models"
+
+    def current_version(self) -> str:
+        try:
+            return self.pointer.read_text().strip()
+        except FileNotFoundError:
+            return LEGACY_VERSION if (self.root / LEGACY_FILE).exists() else DEFAULT_VERSION
+
+    def load(self, version: str) -> dict[str, Any]:
+        if version == DEFAULT_VERSION:
+            return {"weights": list(DEFAULT_WEIGHTS), "bias": DEFAULT_BIAS}
+        path = self.root / LEGACY_FILE if version == LEGACY_VERSION else self._version_path(version)
+        return json.loads(path.read_text())
+
+    def versions(self) -> list[str]:
+        if not self.versions_dir.exists():
+            return []
+        return sorted(path.stem for path in self.versions_dir.glob("*.json"))
+
+    def publish(self, payload: dict[str, Any], activate: bool = True) -> str:
+        """Store ``payload`` as a new immutable version and (by default) make it current."""
+        digest = hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:10]
+        created = datetime.now(timezone.utc)
+        version = f"{created:%Y%m%dT%H%M%S}-{digest}"
+        path = self._version_path(version)
+        if not path.exists():
+            _write_atomic(path, json.dumps({**payload, "version": version, "created_at": created.isoformat()}))
+        if activate:
+            self.activate(version)
+        return version
+
+    def add_language_model(self, path: Path) -> str:
+        """Store a copy of the n-gram LM at ``path`` under its digest, which is returned."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(1 << 20), b""):
+                digest.update(block)
+        name = digest.hexdigest()[:16]
+        target = self.language_model_path(name)
+        if not target.exists():
+            target.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.")
+            os.close(fd)
+            try:
+                shutil.copyfile(path, tmp)
+                os.chmod(tmp, 0o644)
+                os.replace(tmp, target)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        return name
+
+    def language_model_path(self, digest: str) -> Path:
+        if not isinstance(digest, str) or not _DIGEST.fullmatch(digest):
+            raise ValueError(f"Invalid language model digest {digest!r}")
+        return self.language_models_dir / f"{digest}.bin"
+
+    def activate(self, version: str) -> None:
+        if version not in (DEFAULT_VERSION, LEGACY_VERSION) and not self._version_path(version).exists():
+            raise ValueError(f"Unknown model version {version!r}")
+        _write_atomic(self.pointer, version + "\n")
+
+    def _version_path(self, version: str) -> Path:
+        if not version or "/" in version or version.startswith("."):
+            raise ValueError(f"Invalid model version {version!r}")
+        return self.versions_dir / f"{version}.json"
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    version: str
+    model: Any
+    language_model: Any = None  # the version's n-gram LM, when the handle loads them
+
+
+class ModelHandle:
+    """The current model of a registry, hot-swapped when ``CURRENT`` changes.
+
+    ``get()`` is a plain attribute read until ``check_seconds`` have passed; only then is
+    the pointer re-read, and a changed version is loaded by whichever caller gets there
+    first while the others keep serving the previous model.
+
+    With ``load_language_model``, each version's n-gram LM is mapped along with its
+    weights (``load_language_model(None)`` for a version that pins none), and a version
+    whose LM is missing is refused like a broken one.
+    """
+
+    def __init__(
+        self,
+        registry: ModelRegistry,
+        build: Callable[[dict[str, Any]], Any],
+        check_seconds: float = 2.0,
+        load_language_model: Callable[[Path | None], Any] | None = None,
+    ) -> None:
+        self.registry = registry
+        self.check_seconds = check_seconds
+        self._build = build
+        self._load_language_model = load_language_model
+        self._loaded: LoadedModel | None = None
+        self._next_check = 0.0
+        self._reload = threading.Lock()
+
+    def get(self) -> LoadedModel:
+        loaded = self._loaded
+        if loaded is not None and time.monotonic() < self._next_check:
+            return loaded
+        return self.refresh(blocking=loaded is None)
+
+    def refresh(self, blocking: bool = True) -> LoadedModel:
+        if not self._reload.acquire(blocking=blocking):
+            return self._loaded  # type: ignore[return-value]  # only non-blocking once loaded
+        try:
+            version = self.registry.current_version()
+            if self._loaded is None or self._loaded.version != version:
+                try:
+                    self._loaded = self._load(version)
+                except (OSError, ValueError, KeyError):
+                    # A broken or half-synced version must not take down a worker that has a model.
+                    if self._loaded is None:
+                        raise
+            self._next_check = time.monotonic() + self.check_seconds
+            return self._loaded
+        finally:
+            self._reload.release()
+
+    def _load(self, version: str) -> LoadedModel:
+        payload = self.registry.load(version)
+        if self._load_language_model is None:
+            return LoadedModel(version, self._build(payload))
+        if LANGUAGE_MODEL_KEY not in payload:
+            language_model = self._load_language_model(None)
+        elif payload[LANGUAGE_MODEL_KEY] is None:
+            language_model = None
+        else:
+            path = self.registry.language_model_path(payload[LANGUAGE_MODEL_KEY])
+            if not path.exists():
+                raise FileNotFoundError(f"Model version {version} needs language model {path.name}, which is missing")
+            language_model = self._load_language_model(path)
+        return LoadedModel(version, self._build(payload), language_model)
@@ -1,21 +1,79 @@
 from __future__ import annotations
 
-import re
+import os
 from dataclasses import dataclass
 
+# Past ``max_tokens``, the rest of the text is only counted (not normalized) when it is at
+# most this many characters; longer remainders are estimated from the kept prefix.
+EXACT_COUNT_CHARS = int(os.getenv("PREPROCESS_EXACT_COUNT_CHARS", str(256 * 1024)))
+
+# First guess at the prefix that holds ``max_tokens`` tokens; it grows if that is too short.
+CHARS_PER_TOKEN = 8
+
 
 @dataclass
 class PreprocessedText:
     original: str
     cleaned: str
     token_count: int
+    # Tokens in the whole text; estimated when ``total_exact`` is False.
+    total_tokens: int = 0
+    total_exact: bool = True
+
+
+def _prefix_tokens(text: str, limit: int) -> tuple[list[str], int]:
+    """Lowercased tokens of the shortest tried prefix holding more than ``limit`` of them, and its length.
+
+    The prefix starts at ``CHARS_PER_TOKEN`` characters per token and grows 4x at a time,
+    so the cost is bounded by ``limit`` rather than by the length of the text (a whole
+    PDF, say). Past ``limit``, the last token may have been cut in two.
+    """
+    window = max(limit, 1) * CHARS_PER_TOKEN
+    while True:
+        head = text[:window]
+        tokens = head.lower().split()
+        if window >= len(text) or len(tokens) > limit:
+            return tokens, len(head)
+        window *= 4
+
+
+def clean_text(text: str, max_tokens: int = 900, exact_count_chars: int = EXACT_COUNT_CHARS) -> PreprocessedText:
+    """Lowercase, collapse whitespace and keep the first ``max_tokens`` tokens."""
+    tokens, scanned = _prefix_tokens(text, max_tokens)
+    kept = tokens[:max_tokens]
+    token_count = len(kept) or 1  # an empty answer has always counted as one (empty) token
+    cleaned = " ".join(kept)
+    if scanned == len(text):
+        return PreprocessedText(text, cleaned, token_count, max(len(tokens), 1))
+    if len(text) - scanned <= exact_count_chars:
+        return PreprocessedText(text, cleaned, token_count, len(text.split()))
+    # Assume the rest has as many characters per token as the prefix.
+    estimate = round(len(tokens) * len(text) / scanned)
+    return PreprocessedText(text, cleaned, token_count, estimate, total_exact=False)
+
+
+@dataclass
+class Chunk:
+    start: int  # token offsets in the cleaned text
+    end: int
+    text: PreprocessedText
+
 
+def chunk_text(text: str, window: int = 900, overlap: int = 150, max_chunks: int = 8) -> list[Chunk]:
+    """Windows of ``window`` tokens, each overlapping the previous one by ``overlap``.
 
-def clean_text(text: str, max_tokens: int = 900) -> PreprocessedText:
-    normalized = text.lower()
-    normalized = re.sub(r"\s+", " ", normalized).strip()
-    tokens = normalized.split(" ")
-    if len(tokens) > max_tokens:
-        tokens = tokens[:max_tokens]
-    cleaned = " ".join(tokens)
-    return PreprocessedText(original=text, cleaned=cleaned, token_count=len(tokens))
+    At most ``max_chunks`` windows are made, so only their tokens are normalized; a text
+    that fits in one window gives exactly ``clean_text(text, window)``.
+    """
+    if overlap >= window:
+        raise ValueError(f"Chunk overlap ({overlap}) must be smaller than the window ({window})")
+    stride = window - overlap
+    limit = window + stride * (max(max_chunks, 1) - 1)
+    tokens = _prefix_tokens(text, limit)[0][:limit]
+    chunks = []
+    # A last window that would only repeat the previous one's overlap is left out.
+    for start in range(0, max(len(tokens) - overlap, 1), stride):
+        kept = tokens[start : start + window]
+        count = len(kept) or 1
+        chunks.append(Chunk(start, start + len(kept), PreprocessedText(" ".join(kept), " ".join(kept), count, count)))
+    return chunks
@@ -0,0 +1,68 @@
+"""Inference backends for the blender and detectors.
+
+``torch`` is the original implementation. ``python`` computes the same features and
+probabilities on plain floats, so a service can score answers without torch installed.
+``INFERENCE_BACKEND=auto`` (the default) uses torch when it is importable.
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import os
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+BACKENDS = ("torch", "python")
+
+
+@dataclass(frozen=True)
+class InferenceBackend:
+    name: str
+    blender_cls: Any
+    cross_perplexity: Callable[[Sequence[str]], float]
+    tocsin_score: Callable[[Sequence[str]], float]
+    as_features: Callable[[list[float]], Any]
+
+
+def torch_available() -> bool:
+    return importlib.util.find_spec("torch") is not None
+
+
+def resolve_backend_name(preference: str | None = None) -> str:
+    preference = (preference or os.getenv("INFERENCE_BACKEND", "auto")).lower()
+    if preference == "auto":
+        return "torch" if torch_available() else "python"
+    if preference not in BACKENDS:
+        raise ValueError(f"Unknown inference backend {preference!r}; expected auto, torch or python")
+    return preference
+
+
+def load_backend(preference: str | None = None) -> InferenceBackend:
+    name = resolve_backend_name(preference)
+    if name == "torch":
+        import torch
+
+        from detectors.cross_perplexity import compute_feature_vector
+        from detectors.tocsin import tocsin_score
+        from ensemble import LogisticBlender
+
+        return InferenceBackend(
+            name="torch",
+            blender_cls=LogisticBlender,
+            cross_perplexity=lambda tokens: compute_feature_vector(tokens)[0].item(),
+            tocsin_score=tocsin_score,
+            as_features=lambda values: torch.tensor(values, dtype=torch.float32),
+        )
+
+    from detectors.cross_perplexity import feature_values
+    from detectors.tocsin import tocsin_score_python
+    from ensemble import PythonBlender
+
+    return InferenceBackend(
+        name="python",
+        blender_cls=PythonBlender,
+        cross_perplexity=lambda tokens: feature_values(tokens)[0],
+        tocsin_score=tocsin_score_python,
+        as_features=list,
+    )
@@ -0,0 +1,23 @@
+"""Microbenchmarks for the detection pipeline, file ingestion and analytics queries.
+
+Run ``python -m benchmarks.run`` from the repository root with the main-service and
+ai-pipeline requirements installed.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+MAIN_SERVICE_DIR = REPO_ROOT / "main-service"
+PIPELINE_DIR = REPO_ROOT / "ai-pipeline"
+
+# main-service's ``app`` package must win over ai-pipeline's ``app.py`` module.
+if str(MAIN_SERVICE_DIR) not in sys.path:
+    sys.path.insert(0, str(MAIN_SERVICE_DIR))
+if str(PIPELINE_DIR) not in sys.path:
+    sys.path.append(str(PIPELINE_DIR))
+
+# Benchmarks must never reach a live detector service or Redis.
+os.environ.setdefault("AI_PIPELINE_URL", "")
+os.environ.setdefault("REDIS_URL", "redis://127.0.0.1:1/0")
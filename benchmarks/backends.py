@@ -0,0 +1,102 @@
+"""Compare the torch and plain-Python inference backends.
+
+Each backend is loaded in a fresh interpreter to measure its cold-start time, peak
+memory and per-answer feature + blender time; a final in-process run reports the
+largest difference between the two backends' outputs.
+
+    python -m benchmarks.backends
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+
+from . import PIPELINE_DIR, datagen
+
+_PROBE = """
+import json, random, resource, sys, time
+started = time.perf_counter()
+from preprocess import clean_text
+from runtime import load_backend
+backend = load_backend(sys.argv[1])
+blender = backend.blender_cls.load()
+loaded = time.perf_counter() - started
+texts = json.load(sys.stdin)
+random.seed(0)
+started = time.perf_counter()
+for text in texts:
+    tokens = clean_text(text).cleaned.split(" ")
+    values = [0.5, backend.cross_perplexity(tokens), backend.tocsin_score(tokens), len(tokens) / 1000, 0.5]
+    blender.predict(backend.as_features(values))
+per_answer = (time.perf_counter() - started) / len(texts)
+print(json.dumps({
+    "backend": backend.name,
+    "load_s": loaded,
+    "per_answer_ms": per_answer * 1000,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "torch_imported": "torch" in sys.modules,
+}))
+"""
+
+
+def profile(backend: str, texts: list[str]) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", _PROBE, backend],
+        input=json.dumps(texts),
+        cwd=PIPELINE_DIR,
+        env={**os.environ, "PYTHONHASHSEED": "0"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(result.stdout)
+
+
+def max_difference(texts: list[str]) -> float:
+    from preprocess import clean_text
+    from runtime import load_backend
+
+    torch_backend, python_backend = load_backend("torch"), load_backend("python")
+    torch_blender, python_blender = torch_backend.blender_cls.load(), python_backend.blender_cls.load()
+    worst = 0.0
+    for text in texts:
+        tokens = clean_text(text).cleaned.split(" ")
+        outputs = []
+        for backend, blender in ((torch_backend, torch_blender), (python_backend, python_blender)):
+            random.seed(0)
+            values = [0.5, backend.cross_perplexity(tokens), backend.tocsin_score(tokens), len(tokens) / 1000, 0.5]
+            outputs.append([*values, blender.predict(backend.as_features(values))])
+        worst = max(worst, *(abs(a - b) for a, b in zip(*outputs)))
+    return worst
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.backends", description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=50, help="synthetic answers scored per backend")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(7)
+    texts = [datagen.answer(rng, rng.choice(datagen.ANSWER_LENGTHS)) for _ in range(args.answers)]
+    rows = [profile(backend, texts) for backend in ("torch", "python")]
+    print(f"{'backend':10} {'load s':>8} {'per answer ms':>14} {'max RSS MB':>11} {'torch loaded':>13}")
+    for row in rows:
+        print(
+            f"{row['backend']:10} {row['load_s']:8.3f} {row['per_answer_ms']:14.3f} "
+            f"{row['max_rss_mb']:11.1f} {str(row['torch_imported']):>13}"
+        )
+    torch_row, python_row = rows
+    print(
+        f"\npython backend saves {torch_row['load_s'] - python_row['load_s']:.2f} s of load time and "
+        f"{torch_row['max_rss_mb'] - python_row['max_rss_mb']:.0f} MB of peak memory"
+    )
+    print(f"largest difference between backends (features and probability): {max_difference(texts):.2e}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
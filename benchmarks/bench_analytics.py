@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import tempfile
+from pathlib import Path
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app import crud
+from app.migrations import run_migrations
+from app.schemas import CourseCreate, CourseTopicCreate, StudentCreate, SubmissionCreate
+
+from . import datagen
+from .harness import BenchmarkResult, measure
+
+GROUP = "analytics"
+
+
+def seed(session: Session, data: datagen.Dataset) -> int:
+    """Load ``data`` through the bulk crud paths; returns the id of the first course."""
+    courses = crud.upsert_courses(session, [CourseCreate(**course) for course in data.courses])
+    topics = crud.upsert_topics(
+        session,
+        [
+            CourseTopicCreate(title=topic["title"], category=topic["category"], course_id=courses[topic["course"]].id)
+            for topic in data.topics
+        ],
+    )
+    students = crud.upsert_students(session, [StudentCreate(**student) for student in data.students])
+    student_ids = {student.email: student.id for student in students}
+    topic_ids = {(topic.course_id, topic.title): topic.id for topic in topics}
+    rows, refs = [], []
+    for row in data.submissions:
+        course_id = courses[row["course"]].id
+        payload = SubmissionCreate(answer_text=row["answer_text"], final_score=row["final_score"])
+        rows.append((payload, row["ai_probability"]))
+        refs.append(
+            crud.SubmissionRefs(
+                student_id=student_ids[row["student_email"]],
+                course_id=course_id,
+                topic_id=topic_ids[(course_id, row["topic_title"])],
+            )
+        )
+    for start in range(0, len(rows), crud.UPSERT_CHUNK_SIZE):
+        end = start + crud.UPSERT_CHUNK_SIZE
+        crud.create_submissions(session, rows[start:end], refs=refs[start:end])
+    return courses[0].id
+
+
+def run(scales: list[int], min_time: float) -> list[BenchmarkResult]:
+    results: list[BenchmarkResult] = []
+    for scale in scales:
+        with tempfile.TemporaryDirectory() as directory:
+            engine = create_engine(f"sqlite:///{Path(directory, 'bench.db').as_posix()}")
+            SQLModel.metadata.create_all(engine)
+            run_migrations(engine)
+            with Session(engine) as session:
+                course_id = seed(session, datagen.dataset(scale))
+                queries = {
+                    "analytics_by_topic": lambda: crud.analytics_by_topic(session),
+                    "student_risks": lambda: crud.student_risks(session),
+                    "analytics_overview": lambda: crud.analytics_overview(session),
+                    "course_summary": lambda: crud.course_summary(session, course_id),
+                    "list_submissions": lambda: crud.list_submissions(session),
+                }
+                for name, query in queries.items():
+                    # Expire between rounds so every call pays for loading rows, not the identity map.
+                    results.append(
+                        measure(
+                            name,
+                            GROUP,
+                            lambda query=query: (session.expire_all(), query()),
+                            scale=scale,
+                            min_rounds=3,
+                            min_time=min_time,
+                        )
+                    )
+            engine.dispose()
+    return results
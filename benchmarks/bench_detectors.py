@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import random
+import tempfile
+from pathlib import Path
+
+import torch
+from detectors.cross_perplexity import compute_feature_vector
+from detectors.ngram_lm import NgramModel, build
+from detectors.tocsin import tocsin_score, tocsin_score_python
+from ensemble import LogisticBlender, PythonBlender
+from preprocess import clean_text
+
+from app.services.detector_service import DetectorService
+
+from . import datagen
+from .harness import BenchmarkResult, measure
+
+GROUP = "detectors"
+
+
+def _blender() -> LogisticBlender:
+    return LogisticBlender.load(Path("/nonexistent/logit_blender.json"))
+
+
+def _language_model() -> NgramModel:
+    rng = random.Random(7)
+    corpus = [datagen.answer(rng, rng.choice(datagen.ANSWER_LENGTHS[:4])) for _ in range(2000)]
+    with tempfile.TemporaryDirectory(prefix="ngram-lm-") as workdir:
+        build(corpus, Path(workdir) / "ngram-lm.bin")
+        # The mapping stays readable after the file is removed.
+        return NgramModel.load(Path(workdir) / "ngram-lm.bin")
+
+
+def run(scales: list[int], min_time: float) -> list[BenchmarkResult]:
+    results: list[BenchmarkResult] = []
+
+    def bench(name: str, func, scale: int | None = None, **options) -> None:
+        results.append(measure(name, GROUP, func, scale=scale, min_time=min_time, **options))
+
+    detector = DetectorService(pipeline_url="")
+    language_model = _language_model()
+    for words, text in datagen.answers().items():
+        tokens = clean_text(text).cleaned.split(" ")
+        bench("clean_text", lambda: clean_text(text), scale=words)
+        bench("compute_feature_vector", lambda: compute_feature_vector(tokens), scale=words)
+        random.seed(0)
+        bench("tocsin_score", lambda: tocsin_score(tokens), scale=words)
+        bench("tocsin_score_python", lambda: tocsin_score_python(tokens), scale=words)
+        bench("ngram_perplexity", lambda: language_model.perplexity_feature(tokens), scale=words)
+        bench("heuristic_predict", lambda: detector._heuristic_predict(text), scale=words)
+    # Only the first 900 tokens are kept, so these should cost about the same as a 1500-word answer.
+    for words, text in datagen.documents().items():
+        bench("clean_text", lambda: clean_text(text), scale=words)
+        bench("heuristic_predict", lambda: detector._heuristic_predict(text), scale=words)
+
+    blender = _blender()
+    features = torch.tensor([0.5, 0.3, 0.2, 0.1, 0.5], dtype=torch.float32)
+    bench("blender_predict", lambda: blender.predict(features))
+    python_blender = PythonBlender.load(Path("/nonexistent/logit_blender.json"))
+    bench("blender_predict_python", lambda: python_blender.predict([0.5, 0.3, 0.2, 0.1, 0.5]))
+    rng = random.Random(11)
+    for rows in sorted({max(1, scale // 100) for scale in scales}):
+        samples = [
+            (torch.tensor([rng.random() for _ in range(5)], dtype=torch.float32), float(rng.random() > 0.5))
+            for _ in range(rows)
+        ]
+        bench("blender_fit", lambda: _blender().fit(samples, epochs=10), scale=rows, min_rounds=3)
+    return results
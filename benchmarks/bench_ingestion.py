@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import io
+
+from app.services.file_ingestion import extract_pdf_text, iter_courses, iter_students, iter_submissions
+from tests.pdfs import build_pdf
+
+from . import datagen
+from .harness import BenchmarkResult, measure
+
+GROUP = "ingestion"
+
+_SUBMISSION_COLUMNS = ["student_email", "course_name", "topic_title", "answer_text", "final_score"]
+
+
+def _consume(iterator) -> int:
+    return sum(1 for _ in iterator)
+
+
+def run(scales: list[int], min_time: float) -> list[BenchmarkResult]:
+    results: list[BenchmarkResult] = []
+    for scale in scales:
+        data = datagen.dataset(scale)
+        rows = [{**row, "course_name": data.courses[row["course"]]["name"]} for row in data.submissions]
+        files = {
+            "students.csv": (iter_students, datagen.csv_bytes(data.students, ["name", "email"])),
+            "students.xlsx": (iter_students, datagen.xlsx_bytes(data.students, ["name", "email"])),
+            "courses.csv": (iter_courses, datagen.csv_bytes(data.courses, ["name", "section_number", "description"])),
+            "submissions.csv": (iter_submissions, datagen.csv_bytes(rows, _SUBMISSION_COLUMNS)),
+            "submissions.xlsx": (iter_submissions, datagen.xlsx_bytes(rows, _SUBMISSION_COLUMNS)),
+        }
+        for filename, (parser, payload) in files.items():
+            results.append(
+                measure(
+                    f"{parser.__name__}[{filename.rsplit('.', 1)[1]}]",
+                    GROUP,
+                    lambda parser=parser, filename=filename, payload=payload: _consume(
+                        parser(io.BytesIO(payload), filename)
+                    ),
+                    scale=scale,
+                    min_rounds=3,
+                    min_time=min_time,
+                )
+            )
+
+    page_text = datagen.answers()[600]
+    for pages in (1, 5, 20):
+        pdf = build_pdf([page_text] * pages)
+        results.append(
+            measure(
+                "extract_pdf_text",
+                GROUP,
+                lambda pdf=pdf: extract_pdf_text(pdf),
+                scale=pages,
+                min_rounds=3,
+                min_time=min_time,
+            )
+        )
+    return results
@@ -0,0 +1,46 @@
+"""Compare two benchmark result files and flag regressions in median time.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.15
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+
+def _index(path: Path) -> dict[tuple, dict]:
+    payload = json.loads(path.read_text())
+    return {(row["group"], row["name"], row["scale"]): row for row in payload["results"]}
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description=__doc__.splitlines()[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("candidate", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10, help="relative slowdown that counts as a regression")
+    args = parser.parse_args(argv)
+
+    baseline, candidate = _index(args.baseline), _index(args.candidate)
+    regressions = 0
+    for key in sorted(baseline.keys() & candidate.keys(), key=lambda item: (item[0], item[1], item[2] or 0)):
+        before, after = baseline[key]["median_s"], candidate[key]["median_s"]
+        change = (after - before) / before if before else 0.0
+        marker = ""
+        if change > args.threshold:
+            marker = "  REGRESSION"
+            regressions += 1
+        elif change < -args.threshold:
+            marker = "  faster"
+        group, name, scale = key
+        label = name if scale is None else f"{name}@{scale}"
+        print(f"{group:10} {label:40} {before * 1000:10.3f} -> {after * 1000:10.3f} ms  {change:+7.1%}{marker}")
+    for key in sorted(baseline.keys() ^ candidate.keys(), key=str):
+        print(f"{key[0]:10} {key[1]}@{key[2]}: only in {'baseline' if key in baseline else 'candidate'}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
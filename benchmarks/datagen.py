@@ -0,0 +1,100 @@
+"""Deterministic synthetic data: the same seed and scale always produce the same bytes."""
+
+from __future__ import annotations
+
+import csv
+import io
+import random
+from dataclasses import dataclass, field
+
+from openpyxl import Workbook
+
+_WORDS = (
+    "process thread scheduler kernel memory page cache lock deadlock semaphore mutex queue "
+    "packet router latency bandwidth socket protocol handshake index query join transaction "
+    "commit rollback replica shard consensus leader follower heartbeat election snapshot log "
+    "compiler parser token grammar register allocation optimisation inline loop branch "
+    "because therefore however moreover although whereas consequently the a an of to in is "
+    "that it with as for on this by be are which from we can our results show"
+).split()
+_CATEGORIES = ("Lecture", "Tutorial", "Lab", "Quiz")
+# Answer lengths in words: short quiz replies up to essay-length scripts.
+ANSWER_LENGTHS = (5, 40, 150, 600, 1500)
+# Whole documents (an extracted PDF, say): about 1.5 and 6 MB of text.
+DOCUMENT_LENGTHS = (200_000, 800_000)
+
+
+@dataclass
+class Dataset:
+    courses: list[dict] = field(default_factory=list)
+    topics: list[dict] = field(default_factory=list)
+    students: list[dict] = field(default_factory=list)
+    submissions: list[dict] = field(default_factory=list)
+
+
+def answer(rng: random.Random, words: int) -> str:
+    sentences = []
+    remaining = words
+    while remaining > 0:
+        length = min(remaining, rng.randint(6, 18))
+        sentence = " ".join(rng.choice(_WORDS) for _ in range(length))
+        sentences.append(sentence.capitalize() + ".")
+        remaining -= length
+    return " ".join(sentences)
+
+
+def answers(seed: int = 7) -> dict[int, str]:
+    rng = random.Random(seed)
+    return {length: answer(rng, length) for length in ANSWER_LENGTHS}
+
+
+def documents(seed: int = 7) -> dict[int, str]:
+    rng = random.Random(seed)
+    return {length: answer(rng, length) for length in DOCUMENT_LENGTHS}
+
+
+def dataset(submissions: int, seed: int = 7) -> Dataset:
+    """Build ``submissions`` answers spread over a proportional number of students and courses."""
+    rng = random.Random(seed)
+    data = Dataset()
+    course_count = max(1, submissions // 500)
+    student_count = max(1, submissions // 5)
+    for index in range(course_count):
+        data.courses.append({"name": f"Course {index:04d}", "section_number": index % 3 + 1, "description": None})
+        for topic in range(4):
+            data.topics.append({"title": f"Topic {topic}", "category": _CATEGORIES[topic], "course": index})
+    for index in range(student_count):
+        data.students.append({"name": f"Student {index:06d}", "email": f"student{index:06d}@example.edu"})
+    for _ in range(submissions):
+        course = rng.randrange(course_count)
+        data.submissions.append(
+            {
+                "student_email": data.students[rng.randrange(student_count)]["email"],
+                "course": course,
+                "topic_title": f"Topic {rng.randrange(4)}",
+                "answer_text": answer(rng, rng.choice(ANSWER_LENGTHS[:3])),
+                "ai_probability": round(rng.random(), 4),
+                "final_score": rng.choice([None, rng.randint(40, 100)]),
+            }
+        )
+    return data
+
+
+def csv_bytes(rows: list[dict], columns: list[str]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore", lineterminator="\n")
+    writer.writeheader()
+    writer.writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def xlsx_bytes(rows: list[dict], columns: list[str]) -> bytes:
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(columns)
+    for row in rows:
+        sheet.append([row.get(column) for column in columns])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
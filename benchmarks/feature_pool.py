@@ -0,0 +1,83 @@
+"""Throughput of ai-pipeline's detector feature pool by worker count.
+
+Scores ``--answers`` synthetic answers concurrently through ``feature_pool.features``,
+once inline (``FEATURE_WORKERS=0``) and once per pool size in ``--workers``, and reports
+answers per second. A ticker on the event loop records the longest stall while they
+are scored: inline, the loop is blocked for a whole answer at a time.
+
+    python -m benchmarks.feature_pool --workers 1,2,4 --answers 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import time
+
+from . import datagen
+
+
+async def _score(feature_pool, texts: list[str], backend, language_model) -> tuple[float, float]:
+    from preprocess import clean_text
+
+    processed = [clean_text(text) for text in texts]
+    longest_stall = 0.0
+    done = False
+
+    async def ticker() -> None:
+        nonlocal longest_stall
+        last = time.perf_counter()
+        while not done:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            longest_stall = max(longest_stall, now - last)
+            last = now
+
+    ticking = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(feature_pool.features(item, backend, language_model) for item in processed))
+    elapsed = time.perf_counter() - started
+    done = True
+    await ticking
+    return elapsed, longest_stall
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.feature_pool", description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", default="1,2,4", help="comma-separated pool sizes")
+    parser.add_argument("--answers", type=int, default=200)
+    parser.add_argument("--words", type=int, default=600, help="words per answer")
+    parser.add_argument("--backend", default=None, help="torch or python (default: INFERENCE_BACKEND)")
+    args = parser.parse_args(argv)
+    if args.backend:
+        os.environ["INFERENCE_BACKEND"] = args.backend  # the spawned workers read it too
+
+    import feature_pool
+    from detectors.ngram_lm import load_model
+    from runtime import load_backend
+
+    rng = random.Random(7)
+    texts = [datagen.answer(rng, args.words) for _ in range(args.answers)]
+    backend, language_model = load_backend(), load_model()
+    print(f"{args.answers} answers of {args.words} words, {backend.name} backend, {os.cpu_count()} CPUs\n")
+    print(f"{'workers':>7} {'answers/s':>10} {'speedup':>8} {'longest loop stall ms':>22}")
+    baseline = None
+    for workers in [0, *(int(value) for value in args.workers.split(","))]:
+        feature_pool.FEATURE_WORKERS = workers
+        feature_pool.shutdown_executor()
+        feature_pool.warm_up()
+        try:
+            elapsed, stall = asyncio.run(_score(feature_pool, texts, backend, language_model))
+        finally:
+            feature_pool.shutdown_executor()
+        rate = args.answers / elapsed
+        baseline = baseline or rate
+        label = "inline" if workers == 0 else str(workers)
+        print(f"{label:>7} {rate:>10.1f} {rate / baseline:>7.2f}x {stall * 1000:>22.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import gc
+import statistics
+import time
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+
+
+@dataclass
+class BenchmarkResult:
+    name: str
+    group: str
+    scale: int | None
+    rounds: int
+    min_s: float
+    median_s: float
+    mean_s: float
+    stdev_s: float
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def measure(
+    name: str,
+    group: str,
+    func: Callable[[], object],
+    scale: int | None = None,
+    min_rounds: int = 5,
+    max_rounds: int = 200,
+    min_time: float = 0.5,
+) -> BenchmarkResult:
+    """Time ``func`` after one warm-up call, repeating until ``min_time`` has elapsed."""
+    func()
+    timings: list[float] = []
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        budget_end = time.perf_counter() + min_time
+        while len(timings) < min_rounds or (len(timings) < max_rounds and time.perf_counter() < budget_end):
+            started = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - started)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    return BenchmarkResult(
+        name=name,
+        group=group,
+        scale=scale,
+        rounds=len(timings),
+        min_s=min(timings),
+        median_s=statistics.median(timings),
+        mean_s=statistics.fmean(timings),
+        stdev_s=statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    )
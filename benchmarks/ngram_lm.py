@@ -0,0 +1,114 @@
+"""Memory and latency of the memory-mapped n-gram language model.
+
+Builds a model from synthetic answers, maps it and times scoring answers of each length.
+Then ``--workers`` fresh interpreters map the same file, the way ai-pipeline's feature
+workers and main-service's local tier do. Once all of them have touched the tables, each
+reports its resident (RSS) and proportional (PSS) share of the mapping: PSS is split
+between the processes sharing a page, so it adds up to one copy of the file.
+
+    python -m benchmarks.ngram_lm --corpus 20000 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from . import PIPELINE_DIR, datagen
+
+_PROBE = """
+import sys
+from detectors.ngram_lm import NgramModel
+model = NgramModel.load(__import__("pathlib").Path(sys.argv[1]))
+# Touch every page so the whole mapping is resident before memory is measured.
+for table in model.tables:
+    sum(table[index] for index in range(0, len(table), 1024))
+print("ready", flush=True)
+sys.stdin.readline()
+rss = pss = 0
+with open("/proc/self/smaps") as smaps:
+    inside = False
+    for line in smaps:
+        fields = line.split()
+        if "-" in fields[0] and len(fields) >= 5:
+            inside = line.rstrip().endswith(sys.argv[1])
+        elif inside and fields[0] == "Rss:":
+            rss += int(fields[1])
+        elif inside and fields[0] == "Pss:":
+            pss += int(fields[1])
+print(rss, pss, flush=True)
+sys.stdin.readline()  # stay mapped until every worker has measured
+"""
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.ngram_lm", description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=int, default=20000, help="synthetic human answers to build the model from")
+    parser.add_argument("--workers", type=int, default=4, help="processes mapping the model at the same time")
+    parser.add_argument("--bucket-bits", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    from detectors.ngram_lm import NgramModel, build
+    from preprocess import clean_text
+
+    rng = random.Random(7)
+    corpus = [datagen.answer(rng, rng.choice(datagen.ANSWER_LENGTHS[:4])) for _ in range(args.corpus)]
+    with tempfile.TemporaryDirectory(prefix="ngram-lm-") as workdir:
+        path = Path(workdir) / "ngram-lm.bin"
+        started = time.perf_counter()
+        model = build(corpus, path, bucket_bits=args.bucket_bits)
+        build_s = time.perf_counter() - started
+        print(
+            f"built from {model.answers} answers ({model.tokens} tokens) in {build_s:.1f} s: "
+            f"{path.stat().st_size / 2**20:.1f} MB"
+        )
+        started = time.perf_counter()
+        model = NgramModel.load(path)
+        print(f"load (map) time: {(time.perf_counter() - started) * 1000:.2f} ms\n")
+        print(f"{'answer words':>12} {'tokens':>7} {'us/answer':>10} {'us/token':>9}")
+        for words, text in datagen.answers().items():
+            tokens = clean_text(text).cleaned.split(" ")
+            rounds = 200
+            started = time.perf_counter()
+            for _ in range(rounds):
+                model.perplexity_feature(tokens)
+            micros = (time.perf_counter() - started) / rounds * 1e6
+            print(f"{words:>12} {len(tokens):7d} {micros:10.1f} {micros / len(tokens):9.2f}")
+        del model  # unmapped, so only the workers share the pages below
+
+        probes = [
+            subprocess.Popen(
+                [sys.executable, "-c", _PROBE, str(path)],
+                cwd=PIPELINE_DIR,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+            )
+            for _ in range(args.workers)
+        ]
+        for probe in probes:
+            assert probe.stdout.readline().strip() == "ready"
+        # Measured only once every worker has the tables resident, and before any of them exits.
+        for probe in probes:
+            probe.stdin.write("measure\n")
+            probe.stdin.flush()
+        rows = [[int(value) for value in probe.stdout.readline().split()] for probe in probes]
+        for probe in probes:
+            probe.communicate("done\n")
+
+    rss = sum(row[0] for row in rows) / 1024
+    pss = sum(row[1] for row in rows) / 1024
+    print(
+        f"\n{args.workers} workers: {rss:.1f} MB of the model resident in total (RSS), "
+        f"{pss:.1f} MB actually used (PSS) - one shared copy"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""Run the benchmark suites and write the results to JSON.
+
+    python -m benchmarks.run                       # all groups, default scales
+    python -m benchmarks.run --groups analytics --scales 1000,10000
+    python -m benchmarks.compare old.json new.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from . import REPO_ROOT
+
+GROUPS = ("detectors", "ingestion", "analytics", "startup")
+DEFAULT_SCALES = (100, 1000, 5000)
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _suite(group: str):
+    if group == "detectors":
+        from . import bench_detectors as suite
+    elif group == "ingestion":
+        from . import bench_ingestion as suite
+    elif group == "startup":
+        from . import startup as suite
+    else:
+        from . import bench_analytics as suite
+    return suite
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--groups", default=",".join(GROUPS), help="comma-separated subset of " + ", ".join(GROUPS))
+    parser.add_argument(
+        "--scales", default=",".join(map(str, DEFAULT_SCALES)), help="comma-separated data sizes (rows/submissions)"
+    )
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds to keep repeating each benchmark")
+    parser.add_argument(
+        "--output", type=Path, help="JSON file to write (default: benchmarks/results/<commit>-<time>.json)"
+    )
+    args = parser.parse_args(argv)
+
+    groups = [group.strip() for group in args.groups.split(",") if group.strip()]
+    unknown = set(groups) - set(GROUPS)
+    if unknown:
+        parser.error(f"unknown group(s): {', '.join(sorted(unknown))}")
+    scales = sorted({int(scale) for scale in args.scales.split(",") if scale.strip()})
+
+    commit = _git_commit()
+    results = []
+    started = time.perf_counter()
+    for group in groups:
+        for result in _suite(group).run(scales, args.min_time):
+            results.append(result.as_dict())
+            label = result.name if result.scale is None else f"{result.name}@{result.scale}"
+            print(f"{group:10} {label:40} median {result.median_s * 1000:10.3f} ms  ({result.rounds} rounds)")
+
+    payload = {
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "scales": scales,
+        "duration_s": round(time.perf_counter() - started, 3),
+        "results": results,
+    }
+    output = args.output or RESULTS_DIR / f"{commit or 'worktree'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(payload, indent=2))
+    print(f"wrote {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Cold-start benchmarks and a per-module import-time report for both services.
+
+Each measurement runs in a fresh interpreter, so it includes everything a restarted
+worker (or a test run) pays before it can serve a request.
+
+    python -m benchmarks.startup --service main-service --top 25
+    python -m benchmarks.startup --service ai-pipeline --warm-up
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+
+from . import MAIN_SERVICE_DIR, PIPELINE_DIR
+from .harness import BenchmarkResult, measure
+
+GROUP = "startup"
+
+SERVICES = {
+    "main-service": (MAIN_SERVICE_DIR, "import app.main", "from app.warmup import warm_up; warm_up()"),
+    "ai-pipeline": (PIPELINE_DIR, "import app", "app.warm_up()"),
+}
+
+
+@dataclass
+class ImportTime:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def _env() -> dict[str, str]:
+    return {
+        **os.environ,
+        "AI_PIPELINE_URL": "",
+        "DATABASE_URL": "sqlite://",
+        "ENABLE_MLFLOW": "0",
+        "WARMUP_ON_STARTUP": "0",
+    }
+
+
+def _python(service: str, code: str, *options: str) -> subprocess.CompletedProcess:
+    cwd, _, _ = SERVICES[service]
+    return subprocess.run(
+        [sys.executable, *options, "-c", code], cwd=cwd, env=_env(), capture_output=True, text=True, check=True
+    )
+
+
+def _code(service: str, warm_up: bool) -> str:
+    _, statement, warm = SERVICES[service]
+    return f"{statement}; {warm}" if warm_up else statement
+
+
+def import_times(service: str, warm_up: bool = False) -> list[ImportTime]:
+    """Parse ``python -X importtime`` for the service's entry point."""
+    stderr = _python(service, _code(service, warm_up), "-X", "importtime").stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append(ImportTime(name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def package_totals(rows: list[ImportTime]) -> list[tuple[str, int]]:
+    totals: dict[str, int] = defaultdict(int)
+    for row in rows:
+        totals[row.module.split(".")[0]] += row.self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+
+def run(scales: list[int], min_time: float) -> list[BenchmarkResult]:
+    results = []
+    for service in SERVICES:
+        for warm_up in (False, True):
+            code = _code(service, warm_up)
+            name = f"{service}_import" + ("_warm_up" if warm_up else "")
+            results.append(
+                measure(name, GROUP, lambda: _python(service, code), min_rounds=3, max_rounds=10, min_time=min_time)
+            )
+    return results
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description=__doc__.splitlines()[0])
+    parser.add_argument("--service", choices=sorted(SERVICES), default="main-service")
+    parser.add_argument("--warm-up", action="store_true", help="include what the startup warm-up hook loads")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    rows = import_times(args.service, args.warm_up)
+    total = sum(row.self_us for row in rows)
+    print(f"{args.service}: {len(rows)} modules imported in {total / 1e6:.3f} s")
+    print(f"\n{'package':40} {'self ms':>10} {'share':>7}")
+    for package, self_us in package_totals(rows)[: args.top]:
+        print(f"{package:40} {self_us / 1000:10.1f} {self_us / total:7.1%}")
+    print(f"\n{'module':60} {'cumulative ms':>14}")
+    for row in sorted(rows, key=lambda row: row.cumulative_us, reverse=True)[: args.top]:
+        print(f"{'  ' * row.depth + row.module:60} {row.cumulative_us / 1000:14.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
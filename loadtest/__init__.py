@@ -0,0 +1,5 @@
+"""Offline load testing: both services against a local Ollama stand-in.
+
+``python -m loadtest.run`` starts the fake Ollama, ai-pipeline and main-service as
+subprocesses, drives a weighted mix of requests and reports per-endpoint latency.
+"""
@@ -0,0 +1,156 @@
+"""Per-answer Ollama coherence latency for each request mode, against the fake Ollama.
+
+The fake model takes ``--latency-ms`` to the first token and ``--token-ms`` per further
+word, and explains its score in ``--explanation-words`` words, so the modes differ the
+way they would against a real model: ``blocking`` waits for the whole explanation,
+``stream`` hangs up after the score, ``capped`` also sets ``num_predict``, ``json``
+asks for ``{"coherence": ...}`` only and ``batch`` scores ``OLLAMA_BATCH_SIZE`` answers
+per generation (each answer's latency is then its batch's).
+
+    python -m loadtest.coherence --answers 200 --concurrency 8 --token-ms 20
+    python -m loadtest.coherence --ollama-url http://localhost:11434   # a real Ollama
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from contextlib import ExitStack
+from pathlib import Path
+
+import httpx
+
+from benchmarks import datagen
+from coherence import arequest_score, arequest_scores, build_request, pack_batches
+
+from .run import REPO_ROOT, _free_port, _service, percentile
+
+# name -> (stream, num_predict, format); ``batch`` uses the batch request instead
+MODES = {
+    "blocking": (False, 0, ""),
+    "stream": (True, 0, ""),
+    "capped": (True, 32, ""),
+    "json": (True, 32, "json"),
+    "batch": (False, 0, ""),
+}
+
+
+async def measure_mode(url: str, mode: str, texts: list[str], concurrency: int, model: str) -> dict:
+    stream, num_predict, output_format = MODES[mode]
+    latencies: list[float] = []
+    parsed = 0
+    limit = asyncio.Semaphore(concurrency)
+    async with httpx.AsyncClient(timeout=60) as client:
+        before = await _fake_stats(client, url)
+
+        async def one(text: str) -> None:
+            nonlocal parsed
+            payload = build_request(model, text, stream=stream, num_predict=num_predict, output_format=output_format)
+            async with limit:
+                started = time.perf_counter()
+                score = await arequest_score(client, url, payload)
+                latencies.append(time.perf_counter() - started)
+            parsed += score is not None
+
+        async def batch(indexes: list[int]) -> None:
+            nonlocal parsed
+            async with limit:
+                started = time.perf_counter()
+                scores = await arequest_scores(client, url, model, [texts[index] for index in indexes])
+                latencies.extend([time.perf_counter() - started] * len(indexes))
+            parsed += sum(score is not None for score in scores)
+
+        started = time.perf_counter()
+        if mode == "batch":
+            await asyncio.gather(*(batch(indexes) for indexes in pack_batches(texts)))
+        else:
+            await asyncio.gather(*(one(text) for text in texts))
+        elapsed = time.perf_counter() - started
+        after = await _fake_stats(client, url)
+    latencies.sort()
+    counted = before is not None and after is not None
+    return {
+        "mode": mode,
+        "answers": len(texts),
+        "answers_per_s": round(len(texts) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "parsed": round(parsed / len(texts), 3),
+        "calls_per_answer": round((after["requests"] - before["requests"]) / len(texts), 3) if counted else None,
+        "tokens_per_answer": round((after["tokens"] - before["tokens"]) / len(texts), 1) if counted else None,
+    }
+
+
+async def _fake_stats(client: httpx.AsyncClient, url: str) -> dict | None:
+    """Requests and words generated so far by the fake Ollama; None for a real one."""
+    try:
+        response = await client.get(f"{url}/stats")
+        return response.json() if response.status_code == 200 else None
+    except (httpx.HTTPError, ValueError):
+        return None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest.coherence", description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--modes", default=",".join(MODES), help="comma-separated subset of " + ", ".join(MODES))
+    parser.add_argument("--ollama-url", help="measure an already running (fake or real) Ollama")
+    parser.add_argument("--model", default=os.getenv("OLLAMA_MODEL", "llama3"))
+    parser.add_argument("--latency-ms", type=float, default=150, help="fake Ollama time to first token")
+    parser.add_argument("--token-ms", type=float, default=20, help="fake Ollama time per generated word")
+    parser.add_argument("--explanation-words", type=int, default=60, help="fake Ollama prose after the score")
+    parser.add_argument("--garbage-rate", type=float, default=0.0, help="fake Ollama replies without a usable score")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    texts = [datagen.answer(rng, rng.choice(datagen.ANSWER_LENGTHS)) for _ in range(args.answers)]
+    modes = [mode.strip() for mode in args.modes.split(",") if mode.strip()]
+    with ExitStack() as stack:
+        url = args.ollama_url
+        if url is None:
+            workdir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="coherence-")))
+            port = _free_port()
+            command = [
+                sys.executable, "-m", "loadtest.fake_ollama", "--port", str(port), "--seed", str(args.seed),
+                "--latency-ms", str(args.latency_ms), "--jitter-ms", "0", "--token-ms", str(args.token_ms),
+                "--explanation-words", str(args.explanation_words), "--garbage-rate", str(args.garbage_rate),
+            ]  # fmt: skip
+            url = stack.enter_context(
+                _service("fake-ollama", command, REPO_ROOT, dict(os.environ), f"http://127.0.0.1:{port}", workdir)
+            )
+        rows = [asyncio.run(measure_mode(url, mode, texts, args.concurrency, args.model)) for mode in modes]
+
+    print(
+        f"{'mode':10} {'answers/s':>10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'parsed':>7} "
+        f"{'calls/answer':>13} {'tokens/answer':>14}"
+    )
+    for row in rows:
+        calls = "-" if row["calls_per_answer"] is None else f"{row['calls_per_answer']:.3f}"
+        tokens = "-" if row["tokens_per_answer"] is None else f"{row['tokens_per_answer']:.1f}"
+        print(
+            f"{row['mode']:10} {row['answers_per_s']:10.1f} {row['mean_ms']:9.1f} {row['p50_ms']:9.1f} "
+            f"{row['p95_ms']:9.1f} {row['parsed']:7.1%} {calls:>13} {tokens:>14}"
+        )
+    baseline = next((row for row in rows if row["mode"] == "blocking"), None)
+    if baseline:
+        for row in rows:
+            if row is not baseline:
+                saved = 1 - row["mean_ms"] / baseline["mean_ms"]
+                print(f"{row['mode']}: {saved:.0%} lower mean latency than blocking")
+    if args.output:
+        args.output.write_text(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,144 @@
+"""A stand-in for Ollama's ``/api/generate`` with configurable latency, errors and scores.
+
+``--latency-ms`` is the time to the first token; each further word of the reply takes
+``--token-ms``, and ``--explanation-words`` of prose follow the score, the way a real
+model explains its rating. ``options.num_predict`` and ``format`` are honoured, and a
+streaming client that hangs up stops the generation.
+
+    python -m loadtest.fake_ollama --port 11500 --latency-ms 250 --jitter-ms 100 --error-rate 0.02
+    python -m loadtest.fake_ollama --latency-ms 150 --token-ms 20 --explanation-words 60
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+from dataclasses import dataclass
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+
+@dataclass
+class FakeOllamaConfig:
+    latency_ms: float = 200.0
+    jitter_ms: float = 50.0
+    error_rate: float = 0.0
+    garbage_rate: float = 0.0
+    score_alpha: float = 2.0
+    score_beta: float = 2.0
+    token_ms: float = 0.0
+    explanation_words: int = 0
+    seed: int | None = None
+
+
+EXPLANATION = (
+    "The answer states its main claim early, supports it with a relevant example and keeps "
+    "the terminology consistent, although the final paragraph repeats earlier points"
+).split(" ")
+
+
+def create_app(config: FakeOllamaConfig) -> Starlette:
+    rng = random.Random(config.seed)
+    stats = {"requests": 0, "errors": 0, "tokens": 0}
+
+    def score() -> str:
+        return f"{rng.betavariate(config.score_alpha, config.score_beta):.2f}"
+
+    def reply_words(payload: dict) -> list[str]:
+        schema = payload.get("format")
+        batch = schema.get("properties", {}).get("scores") if isinstance(schema, dict) else None
+        if batch:
+            # A batch prompt: one score per answer, or a list of the wrong length when garbled.
+            count = batch["minItems"] - (rng.random() < config.garbage_rate)
+            return ['{"scores":', "[" + ", ".join(score() for _ in range(count)) + "]}"]
+        if schema:
+            return ['{"coherence":', score() + "}"]  # constrained output ends with the object
+        if rng.random() < config.garbage_rate:
+            words = "I cannot rate this answer.".split(" ")
+        else:
+            words = ["Coherence", "score:", score() + "."]
+        words += [EXPLANATION[index % len(EXPLANATION)] for index in range(config.explanation_words)]
+        limit = int((payload.get("options") or {}).get("num_predict") or 0)
+        return words[:limit] if limit > 0 else words
+
+    async def generate(request: Request) -> Response:
+        payload = await request.json()
+        stats["requests"] += 1
+        # Latency is roughly normal around the configured mean, never negative.
+        await asyncio.sleep(max(0.0, rng.gauss(config.latency_ms, config.jitter_ms)) / 1000)
+        if rng.random() < config.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": "model overloaded"}, status_code=503)
+        words = reply_words(payload)
+        model = payload.get("model", "llama3")
+        if not payload.get("stream", True):
+            await asyncio.sleep(config.token_ms * (len(words) - 1) / 1000)
+            stats["tokens"] += len(words)
+            return JSONResponse({"model": model, "response": " ".join(words), "done": True})
+
+        async def chunks():
+            for index, word in enumerate(words):
+                if index:
+                    await asyncio.sleep(config.token_ms / 1000)
+                stats["tokens"] += 1
+                yield json.dumps({"model": model, "response": word + " ", "done": False}) + "\n"
+            yield json.dumps({"model": model, "response": "", "done": True}) + "\n"
+
+        return StreamingResponse(chunks(), media_type="application/x-ndjson")
+
+    async def healthz(request: Request) -> Response:
+        return JSONResponse({"status": "ok"})
+
+    async def fake_stats(request: Request) -> Response:
+        return JSONResponse(stats)
+
+    return Starlette(
+        routes=[
+            Route("/api/generate", generate, methods=["POST"]),
+            Route("/stats", fake_stats),
+            Route("/healthz", healthz),
+        ]
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(prog="python -m loadtest.fake_ollama", description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency-ms", type=float, default=FakeOllamaConfig.latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=FakeOllamaConfig.jitter_ms)
+    parser.add_argument("--error-rate", type=float, default=FakeOllamaConfig.error_rate, help="fraction answered 503")
+    parser.add_argument(
+        "--garbage-rate", type=float, default=FakeOllamaConfig.garbage_rate, help="fraction without a number"
+    )
+    parser.add_argument("--score-alpha", type=float, default=FakeOllamaConfig.score_alpha)
+    parser.add_argument("--score-beta", type=float, default=FakeOllamaConfig.score_beta)
+    parser.add_argument("--token-ms", type=float, default=FakeOllamaConfig.token_ms, help="time per generated word")
+    parser.add_argument(
+        "--explanation-words", type=int, default=FakeOllamaConfig.explanation_words, help="prose after the score"
+    )
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args(argv)
+    config = FakeOllamaConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        garbage_rate=args.garbage_rate,
+        score_alpha=args.score_alpha,
+        score_beta=args.score_beta,
+        token_ms=args.token_ms,
+        explanation_words=args.explanation_words,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
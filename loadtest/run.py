@@ -0,0 +1,295 @@
+"""Start the stack against the fake Ollama, drive a request mix and report latency.
+
+    python -m loadtest.run --duration 60 --concurrency 32 --ollama-latency-ms 300
+    python -m loadtest.run --main-url http://localhost:8000 --duration 30   # existing stack
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from collections.abc import Awaitable, Callable, Iterator
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+
+from benchmarks import datagen
+
+REPO_ROOT = Path(__file__).resolve().parents[1]
+DEFAULT_MIX = "detect=30,list_submissions=20,analytics_overview=15,analytics_topics=10,import_json=15,import_csv=10"
+SEED_STUDENTS = 200
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_healthy(url: str, process: subprocess.Popen, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming healthy")
+        try:
+            if httpx.get(f"{url}/healthz", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become healthy within {timeout:.0f}s")
+
+
+@contextmanager
+def _service(name: str, command: list[str], cwd: Path, env: dict[str, str], url: str, log_dir: Path) -> Iterator[str]:
+    log = open(log_dir / f"{name}.log", "w")
+    process = subprocess.Popen(command, cwd=cwd, env=env, stdout=log, stderr=subprocess.STDOUT)
+    try:
+        _wait_healthy(url, process, timeout=120)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log.close()
+
+
+@contextmanager
+def local_stack(args: argparse.Namespace) -> Iterator[str]:
+    """Run fake Ollama, ai-pipeline and main-service locally; yields the main-service URL."""
+    with ExitStack() as stack:
+        workdir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="loadtest-")))
+        print(f"service logs: {workdir}")
+        env = {**os.environ, "PYTHONUNBUFFERED": "1"}
+        ports = {name: _free_port() for name in ("ollama", "pipeline", "main")}
+        ollama_url = f"http://127.0.0.1:{ports['ollama']}"
+        fake = [
+            sys.executable, "-m", "loadtest.fake_ollama", "--port", str(ports["ollama"]),
+            "--latency-ms", str(args.ollama_latency_ms), "--jitter-ms", str(args.ollama_jitter_ms),
+            "--error-rate", str(args.ollama_error_rate), "--garbage-rate", str(args.ollama_garbage_rate),
+        ]  # fmt: skip
+        stack.enter_context(_service("fake-ollama", fake, REPO_ROOT, env, ollama_url, workdir))
+        pipeline_env = {**env, "OLLAMA_HOST": ollama_url, "ENABLE_MLFLOW": "0"}
+        pipeline_url = stack.enter_context(
+            _service(
+                "ai-pipeline",
+                [sys.executable, "-m", "uvicorn", "app:app", "--port", str(ports["pipeline"]),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                REPO_ROOT / "ai-pipeline",
+                pipeline_env,
+                f"http://127.0.0.1:{ports['pipeline']}",
+                workdir,
+            )
+        )  # fmt: skip
+        main_env = {
+            **env,
+            "DATABASE_URL": args.database_url or f"sqlite:///{(workdir / 'loadtest.db').as_posix()}",
+            "AI_PIPELINE_URL": pipeline_url,
+            "OLLAMA_HOST": ollama_url,
+            "REDIS_URL": args.redis_url,
+        }
+        main_url = stack.enter_context(
+            _service(
+                "main-service",
+                [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(ports["main"]),
+                 "--workers", str(args.workers), "--log-level", "warning"],
+                REPO_ROOT / "main-service",
+                main_env,
+                f"http://127.0.0.1:{ports['main']}",
+                workdir,
+            )
+        )  # fmt: skip
+        yield main_url
+
+
+@dataclass
+class Workload:
+    rng: random.Random
+    course_id: int
+    emails: list[str]
+    samples: list[tuple[str, float, bool]] = field(default_factory=list)
+
+    def submission(self) -> dict:
+        return {
+            "student_email": self.rng.choice(self.emails),
+            "course_id": self.course_id,
+            "topic_title": f"Topic {self.rng.randrange(4)}",
+            "answer_text": datagen.answer(self.rng, self.rng.choice(datagen.ANSWER_LENGTHS[:4])),
+            "final_score": self.rng.randint(40, 100),
+        }
+
+    async def detect(self, client: httpx.AsyncClient) -> httpx.Response:
+        text = datagen.answer(self.rng, self.rng.choice(datagen.ANSWER_LENGTHS))
+        return await client.post("/api/detect", json={"text": text})
+
+    async def list_submissions(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get("/submissions/")
+
+    async def analytics_overview(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get("/analytics/overview")
+
+    async def analytics_topics(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.get("/analytics/topics")
+
+    async def import_json(self, client: httpx.AsyncClient) -> httpx.Response:
+        return await client.post("/submissions/import", json=[self.submission() for _ in range(5)])
+
+    async def import_csv(self, client: httpx.AsyncClient) -> httpx.Response:
+        rows = [self.submission() for _ in range(20)]
+        body = datagen.csv_bytes(rows, ["student_email", "topic_title", "answer_text", "final_score"])
+        return await client.post(
+            "/import-file/submissions",
+            params={"course_id": self.course_id},
+            files={"file": ("answers.csv", body, "text/csv")},
+        )
+
+
+ENDPOINTS: dict[str, str] = {
+    "detect": "POST /api/detect",
+    "list_submissions": "GET /submissions/",
+    "analytics_overview": "GET /analytics/overview",
+    "analytics_topics": "GET /analytics/topics",
+    "import_json": "POST /submissions/import",
+    "import_csv": "POST /import-file/submissions",
+}
+
+
+def parse_mix(spec: str) -> dict[str, float]:
+    mix: dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"unknown scenario {name!r}; choose from {', '.join(ENDPOINTS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+async def seed(client: httpx.AsyncClient, rng: random.Random) -> Workload:
+    course = (await client.post("/courses/import", json=[{"name": "Load Test", "section_number": 1}])).json()[0]
+    students = [{"name": f"Load {i}", "email": f"load{i:04d}@example.edu"} for i in range(SEED_STUDENTS)]
+    (await client.post("/students/import", json=students)).raise_for_status()
+    workload = Workload(rng=rng, course_id=course["id"], emails=[student["email"] for student in students])
+    (await client.post("/submissions/import", json=[workload.submission() for _ in range(50)])).raise_for_status()
+    return workload
+
+
+async def drive(base_url: str, mix: dict[str, float], duration: float, concurrency: int, seed_value: int) -> dict:
+    rng = random.Random(seed_value)
+    timeout = httpx.Timeout(120)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        workload = await seed(client, rng)
+        names, weights = list(mix), list(mix.values())
+        latencies: dict[str, list[float]] = defaultdict(list)
+        errors: dict[str, int] = defaultdict(int)
+        deadline = time.perf_counter() + duration
+
+        async def worker() -> None:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, weights)[0]
+                scenario: Callable[[httpx.AsyncClient], Awaitable[httpx.Response]] = getattr(workload, name)
+                started = time.perf_counter()
+                try:
+                    response = await scenario(client)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                latencies[name].append(time.perf_counter() - started)
+                if failed:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return {"elapsed_s": elapsed, "latencies": dict(latencies), "errors": dict(errors)}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values) + 0.5) - 1))
+    return sorted_values[index]
+
+
+def summarize(run: dict) -> list[dict]:
+    rows = []
+    everything: list[float] = []
+    for name, values in sorted(run["latencies"].items()):
+        values = sorted(values)
+        everything.extend(values)
+        rows.append(_summary_row(ENDPOINTS[name], values, run["errors"].get(name, 0), run["elapsed_s"]))
+    rows.append(_summary_row("total", sorted(everything), sum(run["errors"].values()), run["elapsed_s"]))
+    return rows
+
+
+def _summary_row(label: str, values: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        "endpoint": label,
+        "requests": len(values),
+        "errors": errors,
+        "throughput_rps": round(len(values) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(values, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+    }
+
+
+def print_table(rows: list[dict]) -> None:
+    header = (
+        f"{'endpoint':32} {'reqs':>7} {'errors':>7} {'rps':>8} "
+        f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}"
+    )
+    print(header)
+    print("-" * len(header))
+    for row in rows:
+        print(
+            f"{row['endpoint']:32} {row['requests']:7d} {row['errors']:7d} {row['throughput_rps']:8.2f} "
+            f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['max_ms']:9.1f}"
+        )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest.run", description=__doc__.splitlines()[0])
+    parser.add_argument("--duration", type=float, default=30, help="seconds of load after seeding")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent virtual users")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight pairs; scenarios: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--main-url", help="target an already running main-service instead of starting the stack")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers per service")
+    parser.add_argument("--database-url", help="main-service DATABASE_URL (default: a fresh SQLite file)")
+    parser.add_argument("--redis-url", default="redis://127.0.0.1:6379/0")
+    parser.add_argument("--ollama-latency-ms", type=float, default=200)
+    parser.add_argument("--ollama-jitter-ms", type=float, default=50)
+    parser.add_argument("--ollama-error-rate", type=float, default=0.0)
+    parser.add_argument("--ollama-garbage-rate", type=float, default=0.0)
+    parser.add_argument("--output", type=Path, help="also write the summary as JSON")
+    args = parser.parse_args(argv)
+    mix = parse_mix(args.mix)
+
+    with ExitStack() as stack:
+        base_url = args.main_url or stack.enter_context(local_stack(args))
+        run = asyncio.run(drive(base_url, mix, args.duration, args.concurrency, args.seed))
+    rows = summarize(run)
+    print_table(rows)
+    if args.output:
+        settings = {key: str(value) for key, value in vars(args).items()}
+        args.output.write_text(json.dumps({"args": settings, "results": rows}, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,7 @@ from typing import Any
 from redis.asyncio import Redis
 
 from .config import get_settings
+from .metrics import CACHE_LOOKUPS, timed
 
 _redis_client: Redis | None = None
 
@@ -23,6 +24,7 @@ def get_redis() -> Redis | None:
     return _redis_client
 
 
+@timed("redis.set")
 async def cache_set(key: str, value: Any, ttl_seconds: int = 60) -> None:
     client = get_redis()
     if not client:
@@ -33,6 +35,7 @@ async def cache_set(key: str, value: Any, ttl_seconds: int = 60) -> None:
         pass
 
 
+@timed("redis.get")
 async def cache_get(key: str) -> Any | None:
     client = get_redis()
     if not client:
@@ -40,12 +43,26 @@ async def cache_get(key: str) -> Any | None:
     try:
         payload = await client.get(key)
         if payload:
+            CACHE_LOOKUPS.labels(cache="redis", result="hit").inc()
             return json.loads(payload)
     except Exception:
+        CACHE_LOOKUPS.labels(cache="redis", result="error").inc()
         return None
+    CACHE_LOOKUPS.labels(cache="redis", result="miss").inc()
     return None
 
 
+@timed("redis.delete")
+async def cache_delete(*keys: str) -> None:
+    client = get_redis()
+    if not client or not keys:
+        return
+    try:
+        await client.delete(*keys)
+    except Exception:
+        pass
+
+
 async def warm_cache(key: str, loader) -> Any:
     cached = await cache_get(key)
     if cached:
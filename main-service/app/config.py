@@ -19,6 +19,76 @@ class Settings(BaseSettings):
         default=os.getenv("AI_PIPELINE_URL", "http://ai-pipeline:8001"),
         description="Base URL for the AI detection microservice",
     )
+    session_backend: str = Field(
+        default=os.getenv("SESSION_BACKEND", "memory"),
+        description="Where auth sessions live: 'memory' (single worker) or 'redis' (shared across workers)",
+    )
+    session_ttl_minutes: int = Field(default=int(os.getenv("SESSION_TTL_MINUTES", "60")))
+    session_max_entries: int = Field(
+        default=int(os.getenv("SESSION_MAX_ENTRIES", "10000")),
+        description="Upper bound on in-memory sessions; the oldest are evicted first",
+    )
+    session_sweep_seconds: float = Field(default=float(os.getenv("SESSION_SWEEP_SECONDS", "60")))
+    session_cache_seconds: float = Field(
+        default=float(os.getenv("SESSION_CACHE_SECONDS", "5")),
+        description="How long a validated token is trusted locally before asking the backend again",
+    )
+    pdf_workers: int = Field(
+        default=int(os.getenv("PDF_WORKERS", str(min(4, os.cpu_count() or 1)))),
+        description="Processes used to extract text from large PDFs in parallel",
+    )
+    pdf_pages_per_task: int = Field(default=int(os.getenv("PDF_PAGES_PER_TASK", "16")))
+    pdf_max_pages: int = Field(
+        default=int(os.getenv("PDF_MAX_PAGES", "500")),
+        description="Pages beyond this limit are not extracted",
+    )
+    pdf_time_budget_seconds: float = Field(default=float(os.getenv("PDF_TIME_BUDGET_SECONDS", "120")))
+    archive_batch_size: int = Field(
+        default=int(os.getenv("ARCHIVE_BATCH_SIZE", "16")),
+        description="Archive entries extracted, scored and inserted together",
+    )
+    archive_max_entry_bytes: int = Field(default=int(os.getenv("ARCHIVE_MAX_ENTRY_BYTES", str(50 * 1024 * 1024))))
+    query_debug_headers: bool = Field(
+        default=os.getenv("QUERY_DEBUG_HEADERS", "0") == "1",
+        description="Add X-DB-Query-Count / X-DB-Query-Time-Ms to every response",
+    )
+    slow_request_query_count: int = Field(
+        default=int(os.getenv("SLOW_REQUEST_QUERY_COUNT", "50")),
+        description="Requests running more SQL statements than this are logged",
+    )
+    slow_request_db_seconds: float = Field(default=float(os.getenv("SLOW_REQUEST_DB_SECONDS", "1.0")))
+    profiling_enabled: bool = Field(
+        default=os.getenv("PROFILING_ENABLED", "0") == "1",
+        description="Allow requests to be profiled; off unless explicitly enabled",
+    )
+    profiling_token: str = Field(
+        default=os.getenv("PROFILING_TOKEN", ""),
+        description="Value the X-Profile header must carry to profile a request or read profiles",
+    )
+    profiling_sample_rate: float = Field(
+        default=float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+        description="Fraction of requests profiled without the X-Profile header",
+    )
+    profiling_interval_ms: float = Field(default=float(os.getenv("PROFILING_INTERVAL_MS", "5")))
+    profile_dir: str = Field(default=os.getenv("PROFILE_DIR", "./profiles"))
+    profiling_keep: int = Field(default=int(os.getenv("PROFILING_KEEP", "50")))
+    warmup_on_startup: bool = Field(
+        default=os.getenv("WARMUP_ON_STARTUP", "1") == "1",
+        description="Load torch, the detector model and the file parsers at startup instead of on first use",
+    )
+    rescore_interval_seconds: float = Field(
+        default=float(os.getenv("RESCORE_INTERVAL_SECONDS", "60")),
+        description="How often each worker checks for a new detector model to re-score submissions with; 0 disables",
+    )
+    rescore_batch_size: int = Field(default=int(os.getenv("RESCORE_BATCH_SIZE", "200")))
+    rescore_concurrency: int = Field(
+        default=int(os.getenv("RESCORE_CONCURRENCY", "4")),
+        description="Answers scored in parallel by the re-scoring worker",
+    )
+    rescore_lease_seconds: float = Field(
+        default=float(os.getenv("RESCORE_LEASE_SECONDS", "120")),
+        description="A pass whose worker has not checkpointed for this long is taken over by another worker",
+    )
     allow_origins: list[str] = Field(
         default_factory=lambda: os.getenv("CORS_ALLOW_ORIGINS", "*").split(",")
     )
@@ -1,10 +1,15 @@
+from dataclasses import dataclass
 from datetime import datetime
 from typing import Iterable, Sequence
 
-from sqlalchemy import case
+from sqlalchemy import case, insert, or_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
 from sqlmodel import Session, func, select
 
-from .models import Course, CourseTopic, QuizSubmission, Student, User, UserCourse
+from .hashing import answer_hash, text_digest
+from .metrics import stage_timer, timed
+from .models import Course, CourseTopic, QuizSubmission, Student, TextBlob, UploadedFile, User, UserCourse
 from .schemas import (
     AnalyticsByTopic,
     AnalyticsOverview,
@@ -47,61 +52,87 @@ def authenticate_user(session: Session, payload: UserLogin) -> User | None:
     return user
 
 
+UPSERT_CHUNK_SIZE = 500
+
+
+def _chunked(items: Sequence, size: int = UPSERT_CHUNK_SIZE) -> Iterable[Sequence]:
+    for offset in range(0, len(items), size):
+        yield items[offset : offset + size]
+
+
+def _bulk_upsert(session: Session, model, key_fields: tuple[str, ...], rows: list[dict], update_fields: tuple[str, ...]):
+    """Upsert ``rows`` with one prefetch, one bulk UPDATE and one INSERT ... RETURNING per chunk.
+
+    Later rows win over earlier rows with the same key, matching the old per-row loop, and
+    the result holds one detached instance per input row so callers never refresh.
+    """
+    if not rows:
+        return []
+    latest: dict[tuple, dict] = {}
+    for row in rows:
+        latest[tuple(row[name] for name in key_fields)] = row
+    columns = [model.__table__.c.id, *(model.__table__.c[name] for name in rows[0])]
+    lookup_column = model.__table__.c[key_fields[0]]
+    stored: dict[tuple, dict] = {}
+    for chunk in _chunked(list(latest)):
+        wanted = set(chunk)
+        existing = session.execute(
+            select(*columns).where(lookup_column.in_({key[0] for key in chunk})).order_by(model.__table__.c.id)
+        ).mappings()
+        for record in existing:
+            key = tuple(record[name] for name in key_fields)
+            if key in wanted and key not in stored:
+                stored[key] = dict(record)
+        updated = [key for key in chunk if key in stored]
+        if update_fields and updated:
+            for key in updated:
+                stored[key].update({name: latest[key][name] for name in update_fields})
+            session.execute(
+                update(model),
+                [{"id": stored[key]["id"], **{name: stored[key][name] for name in update_fields}} for key in updated],
+            )
+        inserts = [key for key in chunk if key not in stored]
+        if inserts:
+            # RETURNING the natural key maps ids back without relying on row order, which keeps
+            # the multi-row VALUES batching on SQLite as well as Postgres.
+            key_columns = [model.__table__.c[name] for name in key_fields]
+            returned = session.execute(
+                insert(model).returning(model.__table__.c.id, *key_columns),
+                [latest[key] for key in inserts],
+            ).all()
+            for new_id, *key in returned:
+                stored[tuple(key)] = {**latest[tuple(key)], "id": new_id}
+    with stage_timer("db.commit"):
+        session.commit()
+    return [model(**stored[tuple(row[name] for name in key_fields)]) for row in rows]
+
+
+@timed("crud.upsert_courses")
 def upsert_courses(session: Session, payload: Iterable[CourseCreate]) -> list[Course]:
-    stored: list[Course] = []
-    for entry in payload:
-        stmt = select(Course).where(Course.name == entry.name, Course.section_number == entry.section_number)
-        course = session.exec(stmt).first()
-        if course:
-            course.description = entry.description
-            course.content_manifest = entry.content_manifest
-        else:
-            course = Course.from_orm(entry)
-            session.add(course)
-        stored.append(course)
-    session.commit()
-    for course in stored:
-        session.refresh(course)
-    return stored
+    rows = [
+        {
+            "name": entry.name,
+            "section_number": entry.section_number,
+            "description": entry.description,
+            "content_manifest": entry.content_manifest,
+        }
+        for entry in payload
+    ]
+    return _bulk_upsert(
+        session, Course, ("name", "section_number"), rows, update_fields=("description", "content_manifest")
+    )
 
 
+@timed("crud.upsert_topics")
 def upsert_topics(session: Session, payload: Iterable[CourseTopicCreate]) -> list[CourseTopic]:
-    stored: list[CourseTopic] = []
-    for entry in payload:
-        stmt = select(CourseTopic).where(
-            CourseTopic.title == entry.title,
-            CourseTopic.category == entry.category,
-            CourseTopic.course_id == entry.course_id,
-        )
-        topic = session.exec(stmt).first()
-        if topic:
-            topic.course_id = entry.course_id
-        else:
-            topic = CourseTopic.from_orm(entry)
-            session.add(topic)
-        stored.append(topic)
-    session.commit()
-    for topic in stored:
-        session.refresh(topic)
-    return stored
+    rows = [{"title": entry.title, "category": entry.category, "course_id": entry.course_id} for entry in payload]
+    return _bulk_upsert(session, CourseTopic, ("title", "category", "course_id"), rows, update_fields=())
 
 
+@timed("crud.upsert_students")
 def upsert_students(session: Session, payload: Iterable[StudentCreate]) -> list[Student]:
-    stored: list[Student] = []
-    for entry in payload:
-        email = _normalize_email(entry.email)
-        stmt = select(Student).where(Student.email == email)
-        student = session.exec(stmt).first()
-        if student:
-            student.name = entry.name
-        else:
-            student = Student(name=entry.name, email=email or entry.email)
-            session.add(student)
-        stored.append(student)
-    session.commit()
-    for student in stored:
-        session.refresh(student)
-    return stored
+    rows = [{"name": entry.name, "email": _normalize_email(entry.email) or entry.email} for entry in payload]
+    return _bulk_upsert(session, Student, ("email",), rows, update_fields=("name",))
 
 
 def _resolve_student(session: Session, payload: SubmissionCreate) -> Student:
@@ -155,34 +186,269 @@ def _resolve_topic(session: Session, payload: SubmissionCreate, course_id: int |
     return None
 
 
-def create_submission(
-    session: Session,
-    payload: SubmissionCreate,
-    ai_probability: float,
-) -> QuizSubmission:
+@dataclass(frozen=True)
+class SubmissionRefs:
+    student_id: int
+    course_id: int
+    topic_id: int | None
+
+
+def resolve_submission_refs(session: Session, payload: SubmissionCreate) -> SubmissionRefs:
     student = _resolve_student(session, payload)
     course = _resolve_course(session, payload)
     topic = _resolve_topic(session, payload, course.id)
-    submission = QuizSubmission(
-        student_id=student.id,
-        course_id=course.id,
-        topic_id=topic.id if topic else None,
-        answer_text=payload.answer_text,
+    return SubmissionRefs(student_id=student.id, course_id=course.id, topic_id=topic.id if topic else None)
+
+
+def store_text_blobs(session: Session, texts: Iterable[str | None]) -> dict[str, TextBlob]:
+    """Return blobs for ``texts`` keyed by content hash, adding the ones not stored yet.
+
+    Identical texts (a PDF's answer and OCR output, re-submitted answers) share one row.
+    Missing rows are inserted with ``ON CONFLICT DO NOTHING``, so a concurrent import of
+    the same text, which may insert it first, does not fail this one.
+    """
+    wanted = {text_digest(text): text for text in texts if text is not None}
+    if not wanted:
+        return {}
+
+    def stored(hashes) -> dict[str, TextBlob]:
+        statement = select(TextBlob).where(TextBlob.content_hash.in_(hashes))
+        return {blob.content_hash: blob for blob in session.exec(statement).all()}
+
+    blobs = stored(wanted)
+    missing = [digest for digest in wanted if digest not in blobs]
+    if missing:
+        dialect = postgresql if session.get_bind().dialect.name == "postgresql" else sqlite
+        session.execute(
+            dialect.insert(TextBlob).on_conflict_do_nothing(index_elements=["content_hash"]),
+            [
+                {"content_hash": digest, "size": len(wanted[digest].encode("utf-8")), "content": wanted[digest]}
+                for digest in missing
+            ],
+        )
+        blobs.update(stored(missing))
+    return blobs
+
+
+# Submissions at or above this probability are flagged for review.
+FLAG_THRESHOLD = 0.6
+
+
+def _build_submission(
+    payload: SubmissionCreate,
+    ai_probability: float,
+    refs: SubmissionRefs,
+    blobs: dict[str, TextBlob],
+    model_version: str | None = None,
+) -> QuizSubmission:
+    return QuizSubmission(
+        student_id=refs.student_id,
+        course_id=refs.course_id,
+        topic_id=refs.topic_id,
+        answer_blob=blobs[text_digest(payload.answer_text)],
         ai_probability=ai_probability,
-        flagged=ai_probability >= 0.6,
+        flagged=ai_probability >= FLAG_THRESHOLD,
         raw_score=payload.raw_score,
         final_score=payload.final_score,
         exam_type=payload.exam_type or "closed_book",
         source_filename=payload.source_filename,
         source_path=payload.source_path,
-        ocr_text=payload.ocr_text,
+        ocr_blob=blobs[text_digest(payload.ocr_text)] if payload.ocr_text is not None else None,
+        answer_hash=answer_hash(payload.answer_text),
+        source_hash=payload.source_hash,
+        model_version=model_version,
     )
+
+
+@timed("crud.create_submission")
+def create_submission(
+    session: Session,
+    payload: SubmissionCreate,
+    ai_probability: float,
+    model_version: str | None = None,
+) -> QuizSubmission:
+    refs = resolve_submission_refs(session, payload)
+    blobs = store_text_blobs(session, [payload.answer_text, payload.ocr_text])
+    submission = _build_submission(payload, ai_probability, refs, blobs, model_version)
     session.add(submission)
     session.commit()
     session.refresh(submission)
     return submission
 
 
+@timed("crud.create_submissions")
+def create_submissions(
+    session: Session,
+    rows: Iterable[tuple[SubmissionCreate, float]],
+    refs: Sequence[SubmissionRefs] | None = None,
+    updated: Sequence[QuizSubmission] = (),
+    model_versions: Sequence[str | None] | None = None,
+) -> list[QuizSubmission]:
+    """Insert a chunk of scored submissions with a single flush and commit.
+
+    ``refs`` may carry already resolved student/course/topic ids, one per row, as may
+    ``model_versions`` the detector model behind each score; ``updated`` holds existing
+    rows modified in the same unit of work. All of them are
+    returned detached with their column values loaded; new rows also keep their text,
+    but relationships such as ``submission.student`` are not available on them.
+    """
+    rows = list(rows)
+    if refs is None:
+        refs = [resolve_submission_refs(session, payload) for payload, _ in rows]
+    blobs = store_text_blobs(
+        session, (text for payload, _ in rows for text in (payload.answer_text, payload.ocr_text))
+    )
+    if model_versions is None:
+        model_versions = [None] * len(rows)
+    submissions = [
+        _build_submission(payload, ai_probability, row_refs, blobs, version)
+        for (payload, ai_probability), row_refs, version in zip(rows, refs, model_versions)
+    ]
+    session.add_all(submissions)
+    session.flush()
+    for instance in [*submissions, *updated, *blobs.values()]:
+        session.expunge(instance)
+    with stage_timer("db.commit"):
+        session.commit()
+    return submissions
+
+
+@timed("crud.find_duplicate_submissions")
+def find_duplicate_submissions(
+    session: Session,
+    keys: Sequence[tuple[SubmissionRefs, str | None, str | None]],
+) -> list[QuizSubmission | None]:
+    """Match ``(refs, answer_hash, source_hash)`` keys against stored submissions in one query."""
+    if not keys:
+        return []
+    answer_hashes = {answer for _, answer, _ in keys if answer}
+    source_hashes = {source for _, _, source in keys if source}
+    stmt = (
+        select(QuizSubmission)
+        .where(
+            QuizSubmission.student_id.in_({refs.student_id for refs, _, _ in keys}),
+            or_(QuizSubmission.answer_hash.in_(answer_hashes), QuizSubmission.source_hash.in_(source_hashes)),
+        )
+        .order_by(QuizSubmission.id)
+    )
+    by_answer: dict[tuple, QuizSubmission] = {}
+    by_source: dict[tuple, QuizSubmission] = {}
+    for submission in session.exec(stmt).all():
+        scope = (submission.student_id, submission.course_id, submission.topic_id)
+        if submission.answer_hash:
+            by_answer.setdefault((*scope, submission.answer_hash), submission)
+        if submission.source_hash:
+            by_source.setdefault((*scope, submission.source_hash), submission)
+    matches: list[QuizSubmission | None] = []
+    for refs, answer, source in keys:
+        scope = (refs.student_id, refs.course_id, refs.topic_id)
+        matches.append(by_source.get((*scope, source)) or by_answer.get((*scope, answer)))
+    return matches
+
+
+def apply_duplicate_update(submission: QuizSubmission, payload: SubmissionCreate) -> None:
+    # A re-import may carry corrected grades; the stored AI score is kept as-is.
+    for field in ("raw_score", "final_score", "exam_type"):
+        value = getattr(payload, field)
+        if value is not None:
+            setattr(submission, field, value)
+
+
+def _stale_condition(target_version: str):
+    return or_(QuizSubmission.model_version.is_(None), QuizSubmission.model_version != target_version)
+
+
+def count_stale_submissions(session: Session, target_version: str) -> int:
+    return session.exec(select(func.count(QuizSubmission.id)).where(_stale_condition(target_version))).one()
+
+
+@timed("crud.stale_submissions")
+def stale_submissions(
+    session: Session, target_version: str, after_id: int, limit: int
+) -> list[tuple[int, str | None, str]]:
+    """Next ``limit`` submissions not scored by ``target_version``, as ``(id, blob hash, answer text)``.
+
+    Keyset pagination on the primary key keeps every batch an index range scan, however
+    far into the table the pass has got.
+    """
+    stmt = (
+        select(QuizSubmission.id, QuizSubmission.answer_blob_hash, TextBlob.content)
+        .outerjoin(TextBlob, TextBlob.content_hash == QuizSubmission.answer_blob_hash)
+        .where(QuizSubmission.id > after_id, _stale_condition(target_version))
+        .order_by(QuizSubmission.id)
+        .limit(limit)
+    )
+    return [(row_id, blob_hash, content or "") for row_id, blob_hash, content in session.exec(stmt).all()]
+
+
+@timed("crud.update_submission_scores")
+def update_submission_scores(session: Session, scores: Sequence[tuple[int, float, str]]) -> None:
+    """Store ``(id, ai_probability, model_version)`` rows with one bulk UPDATE and commit."""
+    if not scores:
+        return
+    session.execute(
+        update(QuizSubmission),
+        [
+            {
+                "id": row_id,
+                "ai_probability": probability,
+                "flagged": probability >= FLAG_THRESHOLD,
+                "model_version": version,
+            }
+            for row_id, probability, version in scores
+        ],
+    )
+    with stage_timer("db.commit"):
+        session.commit()
+
+
+def human_answer_texts(session: Session, batch_size: int = 500) -> Iterable[str]:
+    """Distinct answer texts of submissions that were not flagged, a batch at a time.
+
+    Keyset pagination on the blob hash, so the whole corpus is never held in memory.
+    """
+    after = ""
+    while True:
+        stmt = (
+            select(TextBlob.content_hash, TextBlob.content)
+            .where(
+                TextBlob.content_hash > after,
+                TextBlob.content_hash.in_(
+                    select(QuizSubmission.answer_blob_hash).where(QuizSubmission.flagged == False)
+                ),
+            )
+            .order_by(TextBlob.content_hash)
+            .limit(batch_size)
+        )
+        rows = session.exec(stmt).all()
+        if not rows:
+            return
+        for _, content in rows:
+            yield content
+        after = rows[-1][0]
+
+
+@timed("crud.record_upload")
+def record_upload(session: Session, content_hash: str, kind: str, filename: str | None) -> tuple[UploadedFile, bool]:
+    """Stage an uploaded file's record by content hash; returns it and whether it was seen before.
+
+    Nothing is committed here: the import commits the record with its last rows, so an
+    upload that fails to parse or validate is not remembered.
+    """
+    upload = session.exec(
+        select(UploadedFile).where(UploadedFile.content_hash == content_hash, UploadedFile.kind == kind)
+    ).first()
+    seen = upload is not None
+    if upload:
+        upload.upload_count += 1
+        upload.last_imported_at = datetime.utcnow()
+        upload.filename = filename or upload.filename
+    else:
+        upload = UploadedFile(content_hash=content_hash, kind=kind, filename=filename)
+        session.add(upload)
+    return upload, seen
+
+
 def assign_course_to_user(session: Session, user_id: int, course_id: int, role: str = "instructor") -> UserCourse:
     record = session.exec(
         select(UserCourse).where(UserCourse.user_id == user_id, UserCourse.course_id == course_id)
@@ -212,12 +478,32 @@ def list_students(session: Session) -> list[Student]:
     return list(session.exec(select(Student)).all())
 
 
+def _submission_read_options():
+    # Everything SubmissionRead needs, batch-loaded instead of one lazy query per row.
+    return (
+        selectinload(QuizSubmission.student),
+        selectinload(QuizSubmission.course),
+        selectinload(QuizSubmission.topic),
+        selectinload(QuizSubmission.answer_blob),
+    )
+
+
+@timed("crud.get_submissions")
+def get_submissions(session: Session, ids: Sequence[int]) -> list[QuizSubmission]:
+    """Load submissions with their student, course, topic and text, in the order of ``ids``."""
+    stmt = select(QuizSubmission).where(QuizSubmission.id.in_(set(ids))).options(*_submission_read_options())
+    by_id = {submission.id: submission for submission in session.exec(stmt).all()}
+    return [by_id[submission_id] for submission_id in ids if submission_id in by_id]
+
+
+@timed("crud.list_submissions")
 def list_submissions(session: Session) -> list[QuizSubmission]:
-    return list(session.exec(select(QuizSubmission).order_by(QuizSubmission.submitted_at.desc())).all())
+    stmt = select(QuizSubmission).options(*_submission_read_options()).order_by(QuizSubmission.submitted_at.desc())
+    return list(session.exec(stmt).all())
 
 
-def analytics_by_topic(session: Session) -> list[AnalyticsByTopic]:
-    stmt = (
+def analytics_by_topic_statement():
+    return (
         select(
             QuizSubmission.course_id,
             Course.name,
@@ -231,7 +517,11 @@ def analytics_by_topic(session: Session) -> list[AnalyticsByTopic]:
         .outerjoin(CourseTopic, CourseTopic.id == QuizSubmission.topic_id)
         .group_by(QuizSubmission.course_id, Course.name, QuizSubmission.topic_id, CourseTopic.title)
     )
-    rows = session.exec(stmt).all()
+
+
+@timed("crud.analytics_by_topic")
+def analytics_by_topic(session: Session) -> list[AnalyticsByTopic]:
+    rows = session.exec(analytics_by_topic_statement()).all()
     results: list[AnalyticsByTopic] = []
     for course_id, course_name, topic_id, topic_title, avg_prob, flagged_count, submission_count in rows:
         results.append(
@@ -248,17 +538,20 @@ def analytics_by_topic(session: Session) -> list[AnalyticsByTopic]:
     return results
 
 
-def _latest_final_score(session: Session, student_id: int) -> float | None:
-    stmt = (
+def latest_final_score_statement(student_id: int):
+    return (
         select(QuizSubmission.final_score)
         .where(QuizSubmission.student_id == student_id, QuizSubmission.final_score.is_not(None))
         .order_by(QuizSubmission.submitted_at.desc())
     )
-    return session.exec(stmt).first()
 
 
-def student_risks(session: Session) -> list[StudentRisk]:
-    stmt = (
+def _latest_final_score(session: Session, student_id: int) -> float | None:
+    return session.exec(latest_final_score_statement(student_id)).first()
+
+
+def student_risks_statement():
+    return (
         select(
             Student.id,
             Student.name,
@@ -270,7 +563,11 @@ def student_risks(session: Session) -> list[StudentRisk]:
         .join(QuizSubmission, QuizSubmission.student_id == Student.id)
         .group_by(Student.id)
     )
-    rows = session.exec(stmt).all()
+
+
+@timed("crud.student_risks")
+def student_risks(session: Session) -> list[StudentRisk]:
+    rows = session.exec(student_risks_statement()).all()
     risks: list[StudentRisk] = []
     for student_id, name, email, submission_count, avg_prob, flagged_count in rows:
         risks.append(
@@ -287,6 +584,7 @@ def student_risks(session: Session) -> list[StudentRisk]:
     return risks
 
 
+@timed("crud.analytics_overview")
 def analytics_overview(session: Session) -> AnalyticsOverview:
     per_topic = analytics_by_topic(session)
     per_topic.sort(key=lambda x: (x.flagged_count, x.average_ai_probability), reverse=True)
@@ -297,15 +595,21 @@ def analytics_overview(session: Session) -> AnalyticsOverview:
     )
 
 
-def course_summary(session: Session, course_id: int) -> CourseSummary:
-    course = session.get(Course, course_id)
-    if not course:
-        raise ValueError("Course not found")
+def course_summary_statements(course_id: int):
     total_stmt = select(func.count(QuizSubmission.id)).where(QuizSubmission.course_id == course_id)
     flagged_stmt = select(func.count(QuizSubmission.id)).where(
         QuizSubmission.course_id == course_id, QuizSubmission.flagged == True
     )
     avg_stmt = select(func.avg(QuizSubmission.ai_probability)).where(QuizSubmission.course_id == course_id)
+    return total_stmt, flagged_stmt, avg_stmt
+
+
+@timed("crud.course_summary")
+def course_summary(session: Session, course_id: int) -> CourseSummary:
+    course = session.get(Course, course_id)
+    if not course:
+        raise ValueError("Course not found")
+    total_stmt, flagged_stmt, avg_stmt = course_summary_statements(course_id)
     total_submissions = session.exec(total_stmt).one()
     flagged = session.exec(flagged_stmt).one()
     average_ai = session.exec(avg_stmt).one() or 0
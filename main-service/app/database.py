@@ -3,16 +3,20 @@ from collections.abc import Generator
 from sqlmodel import Session, SQLModel, create_engine
 
 from .config import get_settings
+from .migrations import run_migrations
+from .query_stats import install as install_query_stats
 
 
 settings = get_settings()
 
 connect_args = {"check_same_thread": False} if settings.database_url.startswith("sqlite") else {}
 engine = create_engine(settings.database_url, connect_args=connect_args)
+install_query_stats(engine)
 
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
+    run_migrations(engine)
 
 
 def get_session() -> Generator[Session, None, None]:
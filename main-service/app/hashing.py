@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import hashlib
+from typing import BinaryIO
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def normalize_answer(text: str | None) -> str:
+    return " ".join((text or "").lower().split())
+
+
+def answer_hash(text: str | None) -> str:
+    """Hash of an answer after case folding and whitespace collapsing, used for deduplication."""
+    return hashlib.sha256(normalize_answer(text).encode("utf-8")).hexdigest()
+
+
+def text_digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_digest(source: BinaryIO) -> str:
+    """SHA-256 of a seekable upload, leaving the stream rewound for the parser."""
+    digest = hashlib.sha256()
+    source.seek(0)
+    while chunk := source.read(_CHUNK_SIZE):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
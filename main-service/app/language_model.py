@@ -0,0 +1,39 @@
+"""Build ai-pipeline's n-gram language model from the answers stored here.
+
+Every distinct answer of a submission that was not flagged counts as human-written. The
+model is written beside the blender registry (``MODEL_DIR``, or ``NGRAM_MODEL_PATH``);
+the next ``/train`` pins it to the version it publishes, which every service then
+scores with.
+
+Run ``python -m app.language_model [--order N] [--bucket-bits N]`` from ``main-service``.
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from sqlmodel import Session
+
+from . import crud
+from .services.detector_service import MODEL_DIR
+
+
+def main(argv: list[str] | None = None) -> int:
+    from detectors.ngram_lm import DEFAULT_BUCKET_BITS, DEFAULT_ORDER, build, default_path
+
+    parser = argparse.ArgumentParser(prog="python -m app.language_model", description=__doc__.splitlines()[0])
+    parser.add_argument("--order", type=int, default=DEFAULT_ORDER)
+    parser.add_argument("--bucket-bits", type=int, default=DEFAULT_BUCKET_BITS)
+    args = parser.parse_args(argv)
+
+    from .database import engine
+
+    output = default_path(MODEL_DIR)
+    with Session(engine) as session:
+        model = build(crud.human_answer_texts(session), output, args.order, args.bucket_bits)
+    print(f"{output}: {model.answers} answers, {model.tokens} tokens")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,13 +1,21 @@
+import asyncio
 import json
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import FileResponse, PlainTextResponse
 
 from .config import get_settings
 from .database import init_db
-from .routers import analytics, auth, courses, detection, imports, students, submissions
+from .metrics import RequestMetricsMiddleware, render_metrics
+from .profiling import ProfilingMiddleware, profiling_config
+from .query_stats import QueryStatsMiddleware
+from .routers import analytics, auth, courses, detection, imports, profiles, students, submissions
+from .services.detector_service import detector
+from .services.pdf_extraction import shutdown_executor
+from .services.rescoring import rescorer
+from .warmup import warm_up
 
 CONTRACT_FILE = Path(__file__).resolve().parents[2] / "documentation" / "api-contracts" / "main-service.yaml"
 
@@ -31,14 +39,39 @@ def create_app() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+    app.add_middleware(ProfilingMiddleware, config=profiling_config(settings))
+    app.add_middleware(QueryStatsMiddleware)
+    app.add_middleware(RequestMetricsMiddleware)
 
     @app.on_event("startup")
     def _startup() -> None:
         init_db()
+        if settings.warmup_on_startup:
+            warm_up()
+
+    background: list[asyncio.Task] = []
+
+    @app.on_event("startup")
+    async def _start_rescoring() -> None:
+        if settings.rescore_interval_seconds > 0:
+            background.append(asyncio.create_task(rescorer.watch(settings.rescore_interval_seconds)))
+
+    @app.on_event("shutdown")
+    def _shutdown() -> None:
+        for task in background:
+            task.cancel()
+        shutdown_executor()
 
     @app.get("/healthz")
-    def health() -> dict[str, str]:
-        return {"status": "ok"}
+    def health() -> dict[str, object]:
+        breakers = detector.health()
+        degraded = any(breaker["state"] != "closed" for breaker in breakers.values())
+        return {"status": "degraded" if degraded else "ok", "breakers": breakers}
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        body, content_type = render_metrics()
+        return Response(body, media_type=content_type)
 
     @app.get("/contracts/main-service.yaml", include_in_schema=False)
     def contract():
@@ -53,6 +86,7 @@ def create_app() -> FastAPI:
     app.include_router(submissions.router)
     app.include_router(analytics.router)
     app.include_router(imports.router)
+    app.include_router(profiles.router)
 
     return app
 
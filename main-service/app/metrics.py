@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import functools
+from collections.abc import Callable
+from contextlib import AbstractContextManager
+from typing import TypeVar
+
+from prometheus_client import Counter, Gauge, Histogram
+from service_common import metrics as service_metrics
+from service_common.circuit_breaker import BreakerMetrics
+from starlette.types import ASGIApp
+
+F = TypeVar("F", bound=Callable)
+
+PDF_EXTRACTION_SECONDS = Histogram(
+    "pdf_extraction_seconds",
+    "Wall-clock time to extract text from an uploaded PDF",
+    ["outcome"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+PDF_EXTRACTED_PAGES = Counter("pdf_extracted_pages_total", "PDF pages passed to the text extractor")
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Request latency by route template",
+    ["method", "route", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60),
+)
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds",
+    "Time spent in one stage of detection, ingestion or persistence",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+DETECTOR_PREDICTIONS = Counter(
+    "detector_predictions_total",
+    "Submissions scored, by the detector tier that produced the score",
+    ["source"],
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    "db_queries_per_request",
+    "SQL statements executed while serving one request",
+    ["route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144, 233, 500, 1000),
+)
+DB_SECONDS_PER_REQUEST = Histogram(
+    "db_seconds_per_request",
+    "Cumulative time spent executing SQL for one request",
+    ["route"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+CIRCUIT_STATE = Gauge(
+    "circuit_breaker_state",
+    "Circuit breaker state: 0 closed, 1 half-open, 2 open",
+    ["breaker"],
+    multiprocess_mode="max",
+)
+CIRCUIT_TRANSITIONS = Counter(
+    "circuit_breaker_transitions_total",
+    "Circuit breaker state changes, by the state entered",
+    ["breaker", "state"],
+)
+CIRCUIT_REJECTIONS = Counter(
+    "circuit_breaker_rejections_total",
+    "Calls skipped because the breaker was open",
+    ["breaker"],
+)
+BREAKER_METRICS = BreakerMetrics(CIRCUIT_STATE, CIRCUIT_TRANSITIONS, CIRCUIT_REJECTIONS)
+DETECTOR_BUDGET_EXHAUSTED = Counter(
+    "detector_budget_exhausted_total",
+    "Detector tiers skipped because the per-answer latency budget was spent",
+    ["tier"],
+)
+RESCORED_SUBMISSIONS = Counter(
+    "rescored_submissions_total",
+    "Stored submissions re-scored after a model change, by outcome",
+    ["outcome"],
+)
+RESCORE_REMAINING = Gauge(
+    "rescore_remaining_submissions",
+    "Submissions the running re-scoring pass has not reached yet",
+    multiprocess_mode="max",
+)
+COALESCED_CALLS = Counter(
+    "coalesced_calls_total",
+    "Calls to a coalesced computation, by whether they ran it or shared one already in flight",
+    ["flight", "outcome"],
+)
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+
+
+def stage_timer(stage: str) -> AbstractContextManager[None]:
+    return service_metrics.observe_seconds(STAGE_SECONDS.labels(stage=stage))
+
+
+def timed(stage: str) -> Callable[[F], F]:
+    """Record every call of the decorated (sync or async) function under ``stage``."""
+    histogram = STAGE_SECONDS.labels(stage=stage)
+
+    def decorate(func: F) -> F:
+        if asyncio.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with service_metrics.observe_seconds(histogram):
+                    return await func(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with service_metrics.observe_seconds(histogram):
+                return func(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return decorate
+
+
+render_metrics = service_metrics.render_metrics
+
+
+class RequestMetricsMiddleware(service_metrics.RequestMetricsMiddleware):
+    def __init__(self, app: ASGIApp) -> None:
+        super().__init__(app, REQUEST_SECONDS)
@@ -0,0 +1,320 @@
+"""Versioned, in-place schema migrations for the main service database.
+
+`SQLModel.metadata.create_all` only creates missing tables, so every change to an
+existing table (indexes, constraints, new columns) is expressed as a numbered
+migration below. Applied versions are recorded in the ``schemamigration`` table.
+
+Run ``python -m app.migrations [upgrade|status|explain]`` from ``main-service``.
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from sqlalchemy import Connection, Engine, inspect, text
+from sqlmodel import SQLModel
+
+from . import crud
+from .hashing import answer_hash, text_digest
+from .models import SchemaMigration, TextBlob
+
+MIGRATION_LOCK_ID = 480_026
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+@dataclass
+class QueryPlan:
+    name: str
+    sql: str
+    plan: list[str]
+    full_scans: list[str] = field(default_factory=list)
+
+    @property
+    def uses_index(self) -> bool:
+        return not self.full_scans
+
+
+MIGRATIONS: list[Migration] = []
+
+
+def migration(version: int, name: str) -> Callable[[Callable[[Connection], None]], Callable[[Connection], None]]:
+    def register(func: Callable[[Connection], None]) -> Callable[[Connection], None]:
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise MigrationError(f"Duplicate migration version {version}")
+        MIGRATIONS.append(Migration(version=version, name=name, upgrade=func))
+        MIGRATIONS.sort(key=lambda item: item.version)
+        return func
+
+    return register
+
+
+def _quote(conn: Connection, name: str) -> str:
+    return conn.dialect.identifier_preparer.quote(name)
+
+
+def _create_index(conn: Connection, name: str, table: str, columns: list[str], unique: bool = False) -> None:
+    cols = ", ".join(_quote(conn, column) for column in columns)
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    conn.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {_quote(conn, table)} ({cols})"))
+
+
+def _ensure_no_duplicates(conn: Connection, table: str, columns: list[str], nullable: list[str] | None = None) -> None:
+    cols = ", ".join(_quote(conn, column) for column in columns)
+    where = ""
+    if nullable:
+        where = " WHERE " + " AND ".join(f"{_quote(conn, column)} IS NOT NULL" for column in nullable)
+    rows = conn.execute(
+        text(f"SELECT {cols}, COUNT(*) FROM {_quote(conn, table)}{where} GROUP BY {cols} HAVING COUNT(*) > 1 LIMIT 5")
+    ).all()
+    if rows:
+        sample = ", ".join(str(tuple(row[:-1])) for row in rows)
+        raise MigrationError(
+            f"Cannot add unique index on {table}({', '.join(columns)}): duplicate rows exist, e.g. {sample}. "
+            "Merge the duplicates and re-run the migration."
+        )
+
+
+@migration(1, "add_hot_path_indexes")
+def _add_hot_path_indexes(conn: Connection) -> None:
+    _create_index(conn, "ix_quizsubmission_student_submitted", "quizsubmission", ["student_id", "submitted_at"])
+    _create_index(conn, "ix_quizsubmission_course_id", "quizsubmission", ["course_id"])
+    _create_index(conn, "ix_quizsubmission_topic_id", "quizsubmission", ["topic_id"])
+    _create_index(conn, "ix_quizsubmission_submitted_at", "quizsubmission", ["submitted_at"])
+    _create_index(conn, "ix_quizsubmission_flagged", "quizsubmission", ["flagged"])
+
+
+@migration(2, "add_upsert_unique_constraints")
+def _add_upsert_unique_constraints(conn: Connection) -> None:
+    # NULL section numbers / course ids never collide in a unique index, so they are
+    # excluded from the duplicate check the same way the database excludes them.
+    _ensure_no_duplicates(conn, "user", ["email"])
+    _create_index(conn, "ux_user_email", "user", ["email"], unique=True)
+    _ensure_no_duplicates(conn, "student", ["email"])
+    _create_index(conn, "ux_student_email", "student", ["email"], unique=True)
+    _ensure_no_duplicates(conn, "course", ["name", "section_number"], nullable=["section_number"])
+    _create_index(conn, "ux_course_name_section", "course", ["name", "section_number"], unique=True)
+    _ensure_no_duplicates(conn, "coursetopic", ["title", "category", "course_id"], nullable=["course_id"])
+    _create_index(
+        conn, "ux_coursetopic_title_category_course", "coursetopic", ["title", "category", "course_id"], unique=True
+    )
+
+
+def _has_column(conn: Connection, table: str, column: str) -> bool:
+    return column in {existing["name"] for existing in inspect(conn).get_columns(table)}
+
+
+def _add_column(conn: Connection, table: str, column: str, ddl_type: str) -> None:
+    if _has_column(conn, table, column):
+        return
+    conn.execute(text(f"ALTER TABLE {_quote(conn, table)} ADD COLUMN {_quote(conn, column)} {ddl_type}"))
+
+
+@migration(3, "add_submission_content_hashes")
+def _add_submission_content_hashes(conn: Connection) -> None:
+    _add_column(conn, "quizsubmission", "answer_hash", "VARCHAR(64)")
+    _add_column(conn, "quizsubmission", "source_hash", "VARCHAR(64)")
+    _create_index(conn, "ix_quizsubmission_student_answer_hash", "quizsubmission", ["student_id", "answer_hash"])
+    _create_index(conn, "ix_quizsubmission_source_hash", "quizsubmission", ["source_hash"])
+    if not _has_column(conn, "quizsubmission", "answer_text"):
+        return  # created after the text moved to textblob (migration 4); nothing to backfill
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, answer_text FROM quizsubmission WHERE answer_hash IS NULL AND id > :last_id "
+                "ORDER BY id LIMIT 1000"
+            ),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            text("UPDATE quizsubmission SET answer_hash = :answer_hash WHERE id = :id"),
+            [{"id": row_id, "answer_hash": answer_hash(answer_text)} for row_id, answer_text in rows],
+        )
+        last_id = rows[-1][0]
+
+
+@migration(4, "move_submission_text_to_blobs")
+def _move_submission_text_to_blobs(conn: Connection) -> None:
+    TextBlob.__table__.create(conn, checkfirst=True)
+    _add_column(conn, "quizsubmission", "answer_blob_hash", "VARCHAR")
+    _add_column(conn, "quizsubmission", "ocr_blob_hash", "VARCHAR")
+    if not _has_column(conn, "quizsubmission", "answer_text"):
+        return
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text("SELECT id, answer_text, ocr_text FROM quizsubmission WHERE id > :last_id ORDER BY id LIMIT 1000"),
+            {"last_id": last_id},
+        ).all()
+        if not rows:
+            break
+        texts = {
+            text_digest(value): value for _, answer, ocr in rows for value in (answer or "", ocr) if value is not None
+        }
+        stored = {
+            digest
+            for (digest,) in conn.execute(
+                TextBlob.__table__.select()
+                .with_only_columns(TextBlob.__table__.c.content_hash)
+                .where(TextBlob.__table__.c.content_hash.in_(texts))
+            )
+        }
+        missing = [
+            {"content_hash": digest, "size": len(value.encode("utf-8")), "content": value}
+            for digest, value in texts.items()
+            if digest not in stored
+        ]
+        if missing:
+            conn.execute(TextBlob.__table__.insert(), missing)
+        conn.execute(
+            text("UPDATE quizsubmission SET answer_blob_hash = :answer, ocr_blob_hash = :ocr WHERE id = :id"),
+            [
+                {
+                    "id": row_id,
+                    "answer": text_digest(answer or ""),
+                    "ocr": text_digest(ocr) if ocr is not None else None,
+                }
+                for row_id, answer, ocr in rows
+            ],
+        )
+        last_id = rows[-1][0]
+    for column in ("answer_text", "ocr_text"):
+        conn.execute(text(f"ALTER TABLE quizsubmission DROP COLUMN {_quote(conn, column)}"))
+
+
+@migration(5, "add_submission_model_version")
+def _add_submission_model_version(conn: Connection) -> None:
+    # Existing rows keep NULL: their model is unknown, so the re-scoring worker treats them as stale.
+    _add_column(conn, "quizsubmission", "model_version", "VARCHAR")
+    _create_index(conn, "ix_quizsubmission_model_version", "quizsubmission", ["model_version"])
+
+
+@contextmanager
+def _migration_lock(conn: Connection) -> Iterator[None]:
+    # Several uvicorn workers run init_db concurrently; serialise them on Postgres.
+    if conn.dialect.name != "postgresql":
+        yield
+        return
+    conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_ID})
+    conn.commit()
+    try:
+        yield
+    finally:
+        conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_ID})
+        conn.commit()
+
+
+def applied_versions(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(SchemaMigration.__tablename__):
+        return set()
+    return {row[0] for row in conn.execute(text("SELECT version FROM schemamigration")).all()}
+
+
+def run_migrations(engine: Engine) -> list[Migration]:
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    applied: list[Migration] = []
+    with engine.connect() as conn:
+        with _migration_lock(conn):
+            done = applied_versions(conn)
+            conn.commit()
+            for item in MIGRATIONS:
+                if item.version in done:
+                    continue
+                with conn.begin():
+                    item.upgrade(conn)
+                    conn.execute(
+                        SchemaMigration.__table__.insert().values(
+                            version=item.version, name=item.name, applied_at=datetime.utcnow()
+                        )
+                    )
+                applied.append(item)
+    return applied
+
+
+def pending_migrations(engine: Engine) -> list[Migration]:
+    with engine.connect() as conn:
+        done = applied_versions(conn)
+    return [item for item in MIGRATIONS if item.version not in done]
+
+
+def _analytics_statements() -> list[tuple[str, object]]:
+    total_stmt, flagged_stmt, avg_stmt = crud.course_summary_statements(1)
+    return [
+        ("analytics_by_topic", crud.analytics_by_topic_statement()),
+        ("student_risks", crud.student_risks_statement()),
+        ("latest_final_score", crud.latest_final_score_statement(1)),
+        ("course_summary_total", total_stmt),
+        ("course_summary_flagged", flagged_stmt),
+        ("course_summary_average", avg_stmt),
+    ]
+
+
+_SQLITE_SCAN = re.compile(r"^SCAN (\w+)(?!\w| USING (?:COVERING )?INDEX)")
+_POSTGRES_SCAN = re.compile(r"Seq Scan on (\w+)")
+
+
+def explain_analytics_queries(engine: Engine) -> list[QueryPlan]:
+    """EXPLAIN every analytics query and report which tables are read without an index."""
+    plans: list[QueryPlan] = []
+    with engine.connect() as conn:
+        dialect = conn.dialect
+        for name, stmt in _analytics_statements():
+            sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+            if dialect.name == "sqlite":
+                lines = [str(row[-1]) for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").all()]
+                scans = [match.group(1) for match in map(_SQLITE_SCAN.match, lines) if match]
+            else:
+                lines = [str(row[0]) for row in conn.exec_driver_sql(f"EXPLAIN {sql}").all()]
+                scans = [match.group(1) for match in map(_POSTGRES_SCAN.search, lines) if match]
+            plans.append(QueryPlan(name=name, sql=sql, plan=lines, full_scans=scans))
+    return plans
+
+
+def main(argv: list[str]) -> int:
+    from .database import engine
+
+    command = argv[0] if argv else "upgrade"
+    if command == "upgrade":
+        SQLModel.metadata.create_all(engine)
+        applied = run_migrations(engine)
+        for item in applied:
+            print(f"applied {item.version:04d} {item.name}")
+        if not applied:
+            print("database is up to date")
+        return 0
+    if command == "status":
+        pending = pending_migrations(engine)
+        for item in MIGRATIONS:
+            state = "pending" if item in pending else "applied"
+            print(f"{item.version:04d} {item.name}: {state}")
+        return 0
+    if command == "explain":
+        for plan in explain_analytics_queries(engine):
+            verdict = "ok" if plan.uses_index else f"full scan of {', '.join(plan.full_scans)}"
+            print(f"{plan.name}: {verdict}")
+            for line in plan.plan:
+                print(f"    {line}")
+        return 0
+    print("usage: python -m app.migrations [upgrade|status|explain]", file=sys.stderr)
+    return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv[1:]))
@@ -1,15 +1,32 @@
+import zlib
 from datetime import datetime
 from typing import List, Optional
 
+from sqlalchemy import Column, Index, LargeBinary, TypeDecorator
 from sqlmodel import Field, Relationship, SQLModel
 
 
+class CompressedText(TypeDecorator):
+    """Unicode text stored zlib-compressed; callers only ever see ``str``."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else zlib.compress(value.encode("utf-8"))
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else zlib.decompress(value).decode("utf-8")
+
+
 class UserBase(SQLModel):
     email: str
     name: Optional[str] = None
 
 
 class User(UserBase, table=True):
+    __table_args__ = (Index("ux_user_email", "email", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     hashed_password: str
     courses: List["UserCourse"] = Relationship(back_populates="user")
@@ -30,6 +47,8 @@ class CourseBase(SQLModel):
 
 
 class Course(CourseBase, table=True):
+    __table_args__ = (Index("ux_course_name_section", "name", "section_number", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     content_manifest: Optional[str] = Field(
         default=None, description="JSON describing uploaded course content assets"
@@ -46,6 +65,10 @@ class CourseTopicBase(SQLModel):
 
 
 class CourseTopic(CourseTopicBase, table=True):
+    __table_args__ = (
+        Index("ux_coursetopic_title_category_course", "title", "category", "course_id", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     course: Optional[Course] = Relationship(back_populates="topics")
     submissions: List["QuizSubmission"] = Relationship(back_populates="topic")
@@ -57,15 +80,25 @@ class StudentBase(SQLModel):
 
 
 class Student(StudentBase, table=True):
+    __table_args__ = (Index("ux_student_email", "email", unique=True),)
+
     id: Optional[int] = Field(default=None, primary_key=True)
     submissions: List["QuizSubmission"] = Relationship(back_populates="student")
 
 
+class TextBlob(SQLModel, table=True):
+    """Content-addressed answer/OCR text, shared by every submission with identical text."""
+
+    content_hash: str = Field(primary_key=True, description="SHA-256 of the uncompressed text")
+    size: int = Field(description="Uncompressed length in bytes")
+    content: str = Field(sa_column=Column(CompressedText, nullable=False))
+
+
 class QuizSubmissionBase(SQLModel):
     student_id: int = Field(foreign_key="student.id")
     course_id: int = Field(foreign_key="course.id")
     topic_id: Optional[int] = Field(default=None, foreign_key="coursetopic.id")
-    answer_text: str
+    answer_blob_hash: Optional[str] = Field(default=None, foreign_key="textblob.content_hash")
     ai_probability: float = 0.0
     flagged: bool = False
     raw_score: Optional[float] = Field(default=None, description="Score for the quiz/test")
@@ -78,11 +111,83 @@ class QuizSubmissionBase(SQLModel):
         default=None, description="Original filename for traceability"
     )
     source_path: Optional[str] = Field(default=None, description="Server path for uploaded file")
-    ocr_text: Optional[str] = Field(default=None, description="Raw OCR output if extracted from PDF")
+    ocr_blob_hash: Optional[str] = Field(
+        default=None, foreign_key="textblob.content_hash", description="Raw OCR output if extracted from PDF"
+    )
+    answer_hash: Optional[str] = Field(
+        default=None, description="SHA-256 of the normalized answer, used to deduplicate imports"
+    )
+    source_hash: Optional[str] = Field(default=None, description="SHA-256 of the uploaded file or archive entry")
+    model_version: Optional[str] = Field(
+        default=None, description="Detector model that produced ai_probability; NULL when scoring failed"
+    )
 
 
 class QuizSubmission(QuizSubmissionBase, table=True):
+    __table_args__ = (
+        Index("ix_quizsubmission_student_submitted", "student_id", "submitted_at"),
+        Index("ix_quizsubmission_course_id", "course_id"),
+        Index("ix_quizsubmission_topic_id", "topic_id"),
+        Index("ix_quizsubmission_submitted_at", "submitted_at"),
+        Index("ix_quizsubmission_flagged", "flagged"),
+        Index("ix_quizsubmission_student_answer_hash", "student_id", "answer_hash"),
+        Index("ix_quizsubmission_source_hash", "source_hash"),
+        Index("ix_quizsubmission_model_version", "model_version"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     student: Student = Relationship(back_populates="submissions")
     course: Course = Relationship(back_populates="submissions")
     topic: Optional[CourseTopic] = Relationship(back_populates="submissions")
+    # Text lives outside the row so scans stay narrow; it is only loaded on access.
+    answer_blob: Optional[TextBlob] = Relationship(
+        sa_relationship_kwargs={"foreign_keys": "QuizSubmission.answer_blob_hash", "lazy": "select"}
+    )
+    ocr_blob: Optional[TextBlob] = Relationship(
+        sa_relationship_kwargs={"foreign_keys": "QuizSubmission.ocr_blob_hash", "lazy": "select"}
+    )
+
+    @property
+    def answer_text(self) -> str:
+        return self.answer_blob.content if self.answer_blob else ""
+
+    @property
+    def ocr_text(self) -> Optional[str]:
+        return self.ocr_blob.content if self.ocr_blob else None
+
+
+class UploadedFile(SQLModel, table=True):
+    __table_args__ = (Index("ux_uploadedfile_hash_kind", "content_hash", "kind", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    content_hash: str
+    kind: str
+    filename: Optional[str] = None
+    upload_count: int = 1
+    first_imported_at: datetime = Field(default_factory=datetime.utcnow)
+    last_imported_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RescoreJob(SQLModel, table=True):
+    """Progress of re-scoring stored submissions with one detector model version."""
+
+    __table_args__ = (Index("ux_rescorejob_target_version", "target_version", unique=True),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    target_version: str
+    status: str = Field(default="running", description="running, completed or failed")
+    last_id: int = Field(default=0, description="Highest submission id processed; the pass resumes after it")
+    total: int = Field(default=0, description="Stale submissions when the pass started")
+    processed: int = 0
+    updated: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    heartbeat_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+
+class SchemaMigration(SQLModel, table=True):
+    version: int = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
@@ -0,0 +1,20 @@
+"""Put ai-pipeline's modules on ``sys.path``.
+
+main-service runs ai-pipeline's detectors as its optional local tier. The two directories
+sit side by side both in the repository and in the main-service image (see its
+Dockerfile); without ai-pipeline, ``PIPELINE_DIR`` is ``None`` and submissions that the
+remote tier cannot score fall back to the heuristic.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+PIPELINE_DIR: Path | None = None
+
+candidate = Path(__file__).resolve().parents[2] / "ai-pipeline"
+if candidate.exists():
+    PIPELINE_DIR = candidate
+    if str(PIPELINE_DIR) not in sys.path:
+        sys.path.append(str(PIPELINE_DIR))
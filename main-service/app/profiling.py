@@ -0,0 +1,34 @@
+"""Per-request profiling: the shared profiler, configured from main-service's settings."""
+
+from __future__ import annotations
+
+from service_common.profiling import (
+    PROFILE_HEADER,
+    ProfileRecord,
+    ProfileStore,
+    ProfilingConfig,
+    ProfilingMiddleware,
+    token_allowed,
+)
+
+from .config import Settings
+
+__all__ = [
+    "PROFILE_HEADER",
+    "ProfileRecord",
+    "ProfileStore",
+    "ProfilingMiddleware",
+    "profiling_config",
+    "token_allowed",
+]
+
+
+def profiling_config(settings: Settings) -> ProfilingConfig:
+    return ProfilingConfig(
+        enabled=settings.profiling_enabled,
+        token=settings.profiling_token,
+        sample_rate=settings.profiling_sample_rate,
+        interval_ms=settings.profiling_interval_ms,
+        directory=settings.profile_dir,
+        keep=settings.profiling_keep,
+    )
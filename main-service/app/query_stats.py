@@ -0,0 +1,126 @@
+"""Per-request SQL query counting, used to spot N+1 patterns.
+
+``install(engine)`` hooks SQLAlchemy cursor events once; every statement executed
+while a ``track_queries()`` block is active (on any thread that inherited the
+context, such as FastAPI's threadpool) is counted and timed.
+"""
+
+from __future__ import annotations
+
+import logging
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+
+from sqlalchemy import Engine, event
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .config import Settings, get_settings
+from .metrics import DB_QUERIES_PER_REQUEST, DB_SECONDS_PER_REQUEST
+
+logger = logging.getLogger(__name__)
+
+QUERY_COUNT_HEADER = "X-DB-Query-Count"
+QUERY_TIME_HEADER = "X-DB-Query-Time-Ms"
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    statements: list[str] = field(default_factory=list)
+    capture: bool = False
+
+
+_current: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _finish(conn, statement: str) -> None:
+    started_at = conn.info.get("query_started")
+    if not started_at:
+        return
+    started = started_at.pop()
+    stats = _current.get()
+    if stats is None:
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started
+    if stats.capture:
+        stats.statements.append(statement)
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    _finish(conn, statement)
+
+
+def _handle_error(context) -> None:
+    # A failed statement never reaches after_cursor_execute; without this its start time
+    # would stay on the pooled connection's stack for good.
+    if context.connection is not None and context.statement is not None:
+        _finish(context.connection, context.statement)
+
+
+def install(engine: Engine) -> None:
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+@contextmanager
+def track_queries(capture: bool = False) -> Iterator[QueryStats]:
+    stats = QueryStats(capture=capture)
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+class QueryStatsMiddleware:
+    """Counts the SQL each request runs; reports it as metrics, debug headers and slow-request logs."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        settings = get_settings()
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                if message["type"] == "http.response.start" and settings.query_debug_headers:
+                    headers = MutableHeaders(scope=message)
+                    headers[QUERY_COUNT_HEADER] = str(stats.count)
+                    headers[QUERY_TIME_HEADER] = f"{stats.seconds * 1000:.1f}"
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._report(scope, stats, settings)
+
+    @staticmethod
+    def _report(scope: Scope, stats: QueryStats, settings: Settings) -> None:
+        route = getattr(scope.get("route"), "path", "unmatched")
+        DB_QUERIES_PER_REQUEST.labels(route=route).observe(stats.count)
+        DB_SECONDS_PER_REQUEST.labels(route=route).observe(stats.seconds)
+        if stats.count > settings.slow_request_query_count or stats.seconds > settings.slow_request_db_seconds:
+            logger.warning(
+                "%s %s ran %d SQL queries in %.1f ms",
+                scope["method"],
+                route,
+                stats.count,
+                stats.seconds * 1000,
+            )
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlmodel import Session
 
 from .. import crud
+from ..config import get_settings
 from ..database import get_session
 from ..schemas import AuthResponse, Message, UserCreate, UserLogin
 from ..sessions import session_store
@@ -15,7 +16,7 @@ def signup(payload: UserCreate, session: Session = Depends(get_session)) -> Auth
         user = crud.create_user(session, payload)
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    token = session_store.create(user.id)
+    token = session_store.create(user.id, ttl_minutes=get_settings().session_ttl_minutes)
     return AuthResponse(token=token, user_id=user.id)
 
 
@@ -24,5 +25,5 @@ def login(payload: UserLogin, session: Session = Depends(get_session)) -> AuthRe
     user = crud.authenticate_user(session, payload)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
-    token = session_store.create(user.id)
+    token = session_store.create(user.id, ttl_minutes=get_settings().session_ttl_minutes)
     return AuthResponse(token=token, user_id=user.id)
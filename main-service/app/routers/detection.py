@@ -1,7 +1,10 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
+from ..schemas import RescoreStatus
 from ..services.detector_service import detector
+from ..services.rescoring import rescorer
 
 router = APIRouter(prefix="/api/detect", tags=["detection"])
 
@@ -13,9 +16,31 @@ class DetectRequest(BaseModel):
 class DetectResponse(BaseModel):
     prob_ai: float
     label: str
+    model_version: str | None = None
 
 
 @router.post("", response_model=DetectResponse)
 def detect(req: DetectRequest) -> DetectResponse:
     result = detector.predict(req.text)
-    return DetectResponse(prob_ai=float(result["prob_ai"]), label=str(result["label"]))
+    return DetectResponse(
+        prob_ai=float(result["prob_ai"]),
+        label=str(result["label"]),
+        model_version=result.get("model_version"),
+    )
+
+
+@router.get("/rescore", response_model=RescoreStatus)
+def rescore_status() -> RescoreStatus:
+    return rescorer.status()
+
+
+@router.post("/rescore", response_model=RescoreStatus, status_code=202)
+async def start_rescore() -> RescoreStatus:
+    """Re-score every submission not scored by the current model, starting a finished pass over."""
+    target = await run_in_threadpool(detector.current_model_version)
+    if target is None:
+        raise HTTPException(status_code=503, detail="No detector model is reachable to re-score with")
+    job = await run_in_threadpool(rescorer.claim, target, restart=True)
+    if job is not None:
+        rescorer.spawn(job)
+    return await run_in_threadpool(rescorer.status)
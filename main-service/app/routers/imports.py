@@ -1,69 +1,201 @@
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile
+from collections.abc import Iterator
+from pathlib import Path
+from typing import TypeVar
+
+from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
 from .. import crud
 from ..database import get_session
-from ..routers.submissions import _fetch_ai_probability  # reuse detection pipeline client
-from ..schemas import CourseRead, StudentRead, SubmissionRead
+from ..hashing import file_digest
+from ..metrics import timed
+from ..routers.submissions import DEDUPLICATED_HEADER, _score_submissions  # reuse detection pipeline client
+from ..schemas import ArchiveImportResult, CourseRead, StudentRead, SubmissionRead
+from ..services.archive_ingestion import ingest_archive, is_archive
 from ..services.file_ingestion import (
-    parse_courses_from_file,
-    parse_students_from_file,
-    parse_submissions_file,
+    chunked,
+    iter_courses,
+    iter_students,
+    iter_submissions,
+    submission_from_pdf_text,
 )
+from ..services.pdf_extraction import PdfExtractionError, extract_pdf_text_async
+from ..services.submission_ingestion import ingest_submissions
 
 router = APIRouter(prefix="/import-file", tags=["file-imports"])
 
+PREVIOUSLY_IMPORTED_HEADER = "X-Upload-Previously-Imported"
+
+_next_chunk = timed("ingest.parse")(next)
+
+T = TypeVar("T")
+
+
+def _mark_last(chunks: Iterator[T]) -> Iterator[tuple[T, bool]]:
+    # Parses one chunk ahead so the route knows which write is the last one.
+    chunk = next(chunks, None)
+    while chunk is not None:
+        following = next(chunks, None)
+        yield chunk, following is None
+        chunk = following
+
+
+def _record_upload(session: Session, file: UploadFile, digest: str, kind: str, response: Response) -> None:
+    # Only staged: the caller's next commit, the one storing the import's last rows, saves it.
+    _, seen = crud.record_upload(session, digest, kind, file.filename)
+    response.headers[PREVIOUSLY_IMPORTED_HEADER] = str(seen).lower()
+
 
+# Uploads are read straight from the spooled temporary file in chunks and each chunk is
+# written before the next one is parsed, so memory stays flat regardless of file size.
+# The upload itself is recorded with the last chunk, once every row has been accepted.
 @router.post("/courses", response_model=list[CourseRead])
-async def upload_courses(
+def upload_courses(
+    response: Response,
     file: UploadFile = File(...),
     session: Session = Depends(get_session),
 ) -> list[CourseRead]:
-    contents = await file.read()
+    digest = file_digest(file.file)
+    stored: list[CourseRead] = []
     try:
-        courses_payload = parse_courses_from_file(contents, file.filename or "courses")
+        for chunk, last in _mark_last(chunked(iter_courses(file.file, file.filename or "courses"))):
+            if last:
+                _record_upload(session, file, digest, "courses", response)
+            stored.extend(CourseRead.from_orm(course) for course in crud.upsert_courses(session, chunk))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    courses = crud.upsert_courses(session, courses_payload)
-    return [CourseRead.from_orm(course) for course in courses]
+    return stored
 
 
 @router.post("/students", response_model=list[StudentRead])
-async def upload_students(
+def upload_students(
+    response: Response,
     file: UploadFile = File(...),
     session: Session = Depends(get_session),
 ) -> list[StudentRead]:
-    contents = await file.read()
+    digest = file_digest(file.file)
+    stored: list[StudentRead] = []
     try:
-        payload = parse_students_from_file(contents, file.filename or "students")
+        for chunk, last in _mark_last(chunked(iter_students(file.file, file.filename or "students"))):
+            if last:
+                _record_upload(session, file, digest, "students", response)
+            stored.extend(StudentRead.from_orm(student) for student in crud.upsert_students(session, chunk))
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    students = crud.upsert_students(session, payload)
-    return [StudentRead.from_orm(s) for s in students]
+    return stored
+
+
+async def _upload_pdf_submission(
+    session: Session,
+    file: UploadFile,
+    filename: str,
+    digest: str,
+    course_id: int | None,
+    student_email: str | None,
+    response: Response,
+) -> list[SubmissionRead]:
+    # The owner is resolved before extraction so a re-uploaded script is matched by its
+    # file hash without paying for text extraction and detection again.
+    record = submission_from_pdf_text("", filename, course_id, student_email)
+    record.source_hash = digest
+    try:
+        refs = crud.resolve_submission_refs(session, record)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    duplicate = crud.find_duplicate_submissions(session, [(refs, None, digest)])[0]
+    if duplicate is not None:
+        _record_upload(session, file, digest, "submissions", response)
+        await run_in_threadpool(session.commit)
+        response.headers[DEDUPLICATED_HEADER] = "1"
+        return [SubmissionRead.from_orm(duplicate)]
+    try:
+        text = await extract_pdf_text_async(file.file)
+    except PdfExtractionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    record.answer_text = text
+    record.ocr_text = text
+    _record_upload(session, file, digest, "submissions", response)
+    result = await ingest_submissions(session, [record], score=_score_submissions, refs=[refs])
+    response.headers[DEDUPLICATED_HEADER] = str(result.deduplicated_count)
+    return [SubmissionRead.from_orm(submission) for submission in result.stored()]
 
 
 @router.post("/submissions", response_model=list[SubmissionRead])
 async def upload_submissions(
+    response: Response,
     file: UploadFile = File(...),
     course_id: int | None = None,
     student_email: str | None = None,
     session: Session = Depends(get_session),
 ) -> list[SubmissionRead]:
-    contents = await file.read()
+    filename = file.filename or "submissions"
+    digest = await run_in_threadpool(file_digest, file.file)
+    if Path(filename).suffix.lower() == ".pdf":
+        return await _upload_pdf_submission(session, file, filename, digest, course_id, student_email, response)
+
+    chunks = _mark_last(
+        chunked(
+            iter_submissions(
+                file.file,
+                filename,
+                default_course_id=course_id,
+                default_student_email=student_email,
+            )
+        )
+    )
+    created: list[SubmissionRead] = []
+    deduplicated = 0
+    while True:
+        try:
+            item = await run_in_threadpool(_next_chunk, chunks, None)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        if item is None:
+            break
+        chunk, last = item
+        if last:
+            _record_upload(session, file, digest, "submissions", response)
+        try:
+            result = await ingest_submissions(session, chunk, score=_score_submissions)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc)) from exc
+        deduplicated += result.deduplicated_count
+        stored = crud.get_submissions(session, [submission.id for submission in result.stored()])
+        created.extend(SubmissionRead.from_orm(submission) for submission in stored)
+    if not created:
+        raise HTTPException(status_code=400, detail="No rows detected in upload")
+    response.headers[DEDUPLICATED_HEADER] = str(deduplicated)
+    return created
+
+
+@router.post("/submissions/archive", response_model=ArchiveImportResult)
+async def upload_submission_archive(
+    response: Response,
+    file: UploadFile = File(...),
+    course_id: int | None = None,
+    filename_pattern: str | None = None,
+    session: Session = Depends(get_session),
+) -> ArchiveImportResult:
+    filename = file.filename or "submissions.zip"
+    if not is_archive(filename):
+        raise HTTPException(status_code=400, detail="Upload a .zip or .tar(.gz) archive of answer scripts")
+    digest = await run_in_threadpool(file_digest, file.file)
     try:
-        submissions_payload = parse_submissions_file(
-            contents,
-            file.filename or "submissions",
+        result = await ingest_archive(
+            session,
+            file.file,
+            filename,
+            score=_score_submissions,
             default_course_id=course_id,
-            default_student_email=student_email,
+            filename_pattern=filename_pattern,
+            before_last_flush=lambda: _record_upload(session, file, digest, "archive", response),
         )
     except ValueError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
-    if not submissions_payload:
-        raise HTTPException(status_code=400, detail="No rows detected in upload")
-    created: list[SubmissionRead] = []
-    for record in submissions_payload:
-        ai_probability = await _fetch_ai_probability(record)
-        created_submission = crud.create_submission(session, record, ai_probability=ai_probability)
-        created.append(SubmissionRead.from_orm(created_submission))
-    return created
+    if not result.entries:
+        raise HTTPException(status_code=400, detail="No answer scripts found in archive")
+    # Commits the record when the last flush had nothing to insert; otherwise a no-op.
+    await run_in_threadpool(session.commit)
+    response.headers[DEDUPLICATED_HEADER] = str(result.deduplicated)
+    return result
@@ -0,0 +1,31 @@
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import FileResponse
+
+from ..config import get_settings
+from ..profiling import PROFILE_HEADER, ProfileRecord, ProfileStore, profiling_config, token_allowed
+
+router = APIRouter(prefix="/debug/profiles", tags=["profiling"], include_in_schema=False)
+
+
+def _store(token: str | None) -> ProfileStore:
+    settings = get_settings()
+    if not token_allowed(profiling_config(settings), token):
+        raise HTTPException(status_code=404, detail="Not found")
+    return ProfileStore(settings.profile_dir, settings.profiling_keep)
+
+
+@router.get("", response_model=list[ProfileRecord])
+def list_profiles(x_profile: str | None = Header(default=None, alias=PROFILE_HEADER)) -> list[ProfileRecord]:
+    return _store(x_profile).list()
+
+
+@router.get("/{profile_id}/{kind}")
+def download_profile(
+    profile_id: str,
+    kind: str,
+    x_profile: str | None = Header(default=None, alias=PROFILE_HEADER),
+) -> FileResponse:
+    path = _store(x_profile).path(profile_id, kind)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, filename=path.name)
@@ -1,26 +1,32 @@
 import asyncio
+from collections.abc import Sequence
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlmodel import Session
 
 from .. import crud
 from ..database import get_session
+from ..metrics import DETECTOR_PREDICTIONS
 from ..schemas import SubmissionCreate, SubmissionRead
 from ..services.detector_service import detector
+from ..services.submission_ingestion import Score, ingest_submissions
 
 router = APIRouter(prefix="/submissions", tags=["submissions"])
 
+DEDUPLICATED_HEADER = "X-Deduplicated-Count"
 
-async def _fetch_ai_probability(payload: SubmissionCreate) -> float:
+
+async def _score_submissions(payloads: Sequence[SubmissionCreate]) -> list[Score]:
     loop = asyncio.get_running_loop()
 
-    def _predict() -> float:
+    def _predict() -> list[Score]:
         try:
-            result = detector.predict(payload.answer_text or "")
-            return float(result.get("prob_ai", 0.0))
+            results = detector.predict_many([payload.answer_text or "" for payload in payloads])
+            return [Score(float(result.get("prob_ai", 0.0)), result.get("model_version")) for result in results]
         except Exception:
-            # fall back to deterministic low score when the detector fails
-            return 0.05
+            # fall back to deterministic low score when the detector fails; no version, so it is re-scored later
+            DETECTOR_PREDICTIONS.labels(source="error").inc(len(payloads))
+            return [Score(0.05) for _ in payloads]
 
     return await loop.run_in_executor(None, _predict)
 
@@ -45,6 +51,7 @@ def _serialize(submission) -> SubmissionRead:
         topic_category=getattr(submission.topic, "category", None),
         source_filename=submission.source_filename,
         source_path=submission.source_path,
+        model_version=submission.model_version,
     )
 
 
@@ -56,16 +63,15 @@ def list_submissions(session: Session = Depends(get_session)) -> list[Submission
 @router.post("/import", response_model=list[SubmissionRead])
 async def import_submissions(
     payload: list[SubmissionCreate],
+    response: Response,
     session: Session = Depends(get_session),
 ) -> list[SubmissionRead]:
     if not payload:
         raise HTTPException(status_code=400, detail="Payload is empty")
-    submissions: list[SubmissionRead] = []
-    for row in payload:
-        ai_probability = await _fetch_ai_probability(row)
-        try:
-            created = crud.create_submission(session, row, ai_probability)
-        except ValueError as exc:
-            raise HTTPException(status_code=400, detail=str(exc)) from exc
-        submissions.append(_serialize(created))
-    return submissions
+    try:
+        result = await ingest_submissions(session, payload, score=_score_submissions)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    response.headers[DEDUPLICATED_HEADER] = str(result.deduplicated_count)
+    stored = crud.get_submissions(session, [submission.id for submission in result.stored()])
+    return [_serialize(submission) for submission in stored]
@@ -72,6 +72,7 @@ class SubmissionCreate(SQLModel):
     source_filename: Optional[str] = None
     source_path: Optional[str] = None
     ocr_text: Optional[str] = None
+    source_hash: Optional[str] = Field(default=None, description="Set by file imports for deduplication")
 
 
 class SubmissionRead(SQLModel):
@@ -93,6 +94,38 @@ class SubmissionRead(SQLModel):
     topic_category: Optional[str] = None
     source_filename: Optional[str] = None
     source_path: Optional[str] = None
+    model_version: Optional[str] = None
+
+
+class RescoreStatus(BaseModel):
+    target_version: Optional[str] = None
+    status: str = "idle"
+    total: int = 0
+    processed: int = 0
+    updated: int = 0
+    failed: int = 0
+    remaining: int = 0
+    error: Optional[str] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class ArchiveEntryResult(BaseModel):
+    entry: str
+    submission_id: Optional[int] = None
+    student_id: Optional[int] = None
+    ai_probability: Optional[float] = None
+    flagged: Optional[bool] = None
+    deduplicated: bool = False
+    error: Optional[str] = None
+
+
+class ArchiveImportResult(BaseModel):
+    archive: str
+    created: int
+    deduplicated: int = 0
+    skipped: int
+    entries: list[ArchiveEntryResult]
 
 
 class AnalyticsByTopic(BaseModel):
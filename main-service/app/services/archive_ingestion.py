@@ -0,0 +1,315 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import re
+import tarfile
+import zipfile
+from collections.abc import Callable, Iterator
+from dataclasses import dataclass
+from pathlib import PurePosixPath
+from typing import BinaryIO
+
+from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
+
+from .. import crud
+from ..config import get_settings
+from ..metrics import timed
+from ..schemas import ArchiveEntryResult, ArchiveImportResult, SubmissionCreate
+from .file_ingestion import _clean, iter_rows
+from .pdf_extraction import PdfExtractionError, extract_pdf_file_async, spool_to_disk
+from .submission_ingestion import Scorer, ingest_submissions
+
+MANIFEST_NAME = "manifest.csv"
+ENTRY_SUFFIXES = {".pdf", ".txt"}
+DEFAULT_FILENAME_PATTERN = "{student_email}.*"
+# ``filename_pattern`` comes from the request, so it is a template rather than a regular
+# expression: placeholders and ``*`` are the only parts that match variable text, and
+# only this much of each member name is matched against it.
+MAX_PATTERN_LENGTH = 200
+MAX_MATCHED_NAME_LENGTH = 255
+_PLACEHOLDERS = {
+    "{student_email}": r"(?P<email>[^@\s/]+@[\w-]+(?:\.[\w-]+)+)",
+    "{student_id}": r"(?P<student_id>\d+)",
+    "*": r".*",
+}
+_TEMPLATE_TOKEN = re.compile(r"(\{student_email\}|\{student_id\}|\*)")
+
+_MANIFEST_FIELDS = (
+    "student_email",
+    "student_id",
+    "course_id",
+    "course_name",
+    "topic_title",
+    "topic_category",
+    "raw_score",
+    "final_score",
+    "exam_type",
+)
+
+
+@dataclass
+class ArchiveMember:
+    name: str
+    size: int
+    open: Callable[[], BinaryIO]
+
+
+def is_archive(filename: str) -> bool:
+    lowered = filename.lower()
+    return lowered.endswith((".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz"))
+
+
+def iter_members(source: BinaryIO, filename: str) -> Iterator[ArchiveMember]:
+    """Yield regular files from a ZIP or tar upload; member data is only read on ``open()``."""
+    source.seek(0)
+    if filename.lower().endswith(".zip"):
+        with zipfile.ZipFile(source) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield ArchiveMember(info.filename, info.file_size, lambda info=info: archive.open(info))
+        return
+    with tarfile.open(fileobj=source, mode="r:*") as archive:
+        for member in archive:
+            if member.isfile():
+                yield ArchiveMember(member.name, member.size, lambda member=member: archive.extractfile(member))
+
+
+def compile_filename_pattern(pattern: str | None) -> re.Pattern[str]:
+    """Compile a ``filename_pattern`` template such as ``s-{student_email}.*`` or ``{student_id}_*.pdf``.
+
+    Each placeholder or ``*`` takes the longest text that the literal after it can follow
+    and is never revisited, so matching a name is linear in its length.
+    """
+    template = pattern if pattern is not None else DEFAULT_FILENAME_PATTERN
+    if len(template) > MAX_PATTERN_LENGTH:
+        raise ValueError(f"Invalid filename pattern: longer than {MAX_PATTERN_LENGTH} characters")
+    parts = _TEMPLATE_TOKEN.split(template)
+    literals, tokens = parts[::2], parts[1::2]
+    if any("{" in literal or "}" in literal for literal in literals):
+        raise ValueError("Invalid filename pattern: the only placeholders are {student_email} and {student_id}")
+    if "{student_email}" not in tokens and "{student_id}" not in tokens:
+        raise ValueError("Invalid filename pattern: it must contain {student_email} or {student_id}")
+    if any(tokens.count(token) > 1 for token in _PLACEHOLDERS if token != "*"):
+        raise ValueError("Invalid filename pattern: each placeholder may appear only once")
+    if any(not literal for literal in literals[1:-1]):
+        raise ValueError("Invalid filename pattern: placeholders and * must be separated by literal text")
+    regex = re.escape(literals[0])
+    for token, literal in zip(tokens, literals[1:]):
+        # An atomic group keeps the match from backtracking into earlier placeholders.
+        regex += f"(?>{_PLACEHOLDERS[token]}{re.escape(literal)})" if literal else _PLACEHOLDERS[token]
+    return re.compile(regex, re.IGNORECASE)
+
+
+def _parse_manifest(handle: BinaryIO) -> dict[str, dict]:
+    rows = list(iter_rows(handle, MANIFEST_NAME))
+    return {PurePosixPath(str(row.get("filename") or "")).name: row for row in rows if row.get("filename")}
+
+
+def _read_member_manifest(member: ArchiveMember) -> dict[str, dict]:
+    with member.open() as handle:
+        return _parse_manifest(handle)
+
+
+def _is_manifest(name: str) -> bool:
+    return PurePosixPath(name).name.lower() == MANIFEST_NAME
+
+
+def read_manifest(source: BinaryIO, filename: str) -> dict[str, dict]:
+    """The manifest of a ZIP upload, found through its central directory without reading other members.
+
+    A compressed tar has no index, so its manifest is read in the streaming pass instead
+    and returns ``{}`` here.
+    """
+    if not filename.lower().endswith(".zip"):
+        return {}
+    source.seek(0)
+    with zipfile.ZipFile(source) as archive:
+        for info in archive.infolist():
+            if not info.is_dir() and _is_manifest(info.filename):
+                with archive.open(info) as handle:
+                    return _parse_manifest(handle)
+    return {}
+
+
+def entry_submission(
+    name: str,
+    manifest: dict[str, dict],
+    pattern: re.Pattern[str],
+    default_course_id: int | None,
+) -> SubmissionCreate | None:
+    basename = PurePosixPath(name).name
+    row = manifest.get(basename)
+    if row is not None:
+        fields = {key: _clean(row.get(key)) for key in _MANIFEST_FIELDS}
+    else:
+        match = pattern.fullmatch(basename[:MAX_MATCHED_NAME_LENGTH])
+        if not match:
+            return None
+        groups = match.groupdict()
+        fields = {"student_email": groups.get("email"), "student_id": groups.get("student_id")}
+    fields["course_id"] = fields.get("course_id") or default_course_id
+    return SubmissionCreate(answer_text="", source_filename=basename, **{k: v for k, v in fields.items() if v})
+
+
+async def _extract_member_text(path: str, suffix: str) -> str:
+    if suffix == ".pdf":
+        return await extract_pdf_file_async(path, prefer_processes=True)
+    with open(path, "rb") as handle:
+        return handle.read().decode("utf-8", errors="replace").strip()
+
+
+class _HashingReader:
+    def __init__(self, handle: BinaryIO) -> None:
+        self._handle = handle
+        self.digest = hashlib.sha256()
+
+    def seekable(self) -> bool:
+        return False
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._handle.read(size)
+        self.digest.update(chunk)
+        return chunk
+
+
+def _spool_member(member: ArchiveMember) -> tuple[str, str]:
+    """Copy a member to disk, returning the path and the SHA-256 of its bytes."""
+    with member.open() as handle:
+        reader = _HashingReader(handle)
+        path = spool_to_disk(reader, suffix=PurePosixPath(member.name).suffix.lower())
+    return path, reader.digest.hexdigest()
+
+
+@timed("ingest.archive")
+async def ingest_archive(
+    session: Session,
+    source: BinaryIO,
+    filename: str,
+    score: Scorer,
+    default_course_id: int | None = None,
+    filename_pattern: str | None = None,
+    before_last_flush: Callable[[], None] | None = None,
+) -> ArchiveImportResult:
+    """Import every answer script in a ZIP/tar upload.
+
+    Members are spooled to disk one at a time while earlier ones are extracted in the
+    process pool; once ``archive_batch_size`` entries are pending they are scored
+    concurrently and inserted with a single commit. Entries whose bytes were already
+    imported for the same student are skipped before extraction. The archive is read in
+    one pass, so a tar's ``manifest.csv`` must come before the scripts it maps.
+    ``before_last_flush`` runs once the whole archive has been read, so whatever it adds
+    to the session is committed with the last batch.
+    """
+    settings = get_settings()
+    pattern = compile_filename_pattern(filename_pattern)
+    try:
+        manifest = await run_in_threadpool(read_manifest, source, filename)
+        members = iter_members(source, filename)
+        is_tar = not filename.lower().endswith(".zip")
+    except (zipfile.BadZipFile, tarfile.TarError) as exc:
+        raise ValueError("Upload is not a readable ZIP or tar archive") from exc
+
+    results: list[ArchiveEntryResult] = []
+    pending: list[tuple[str, SubmissionCreate, crud.SubmissionRefs, asyncio.Task]] = []
+
+    def entry_result(name: str, submission, deduplicated: bool = False) -> ArchiveEntryResult:
+        return ArchiveEntryResult(
+            entry=name,
+            submission_id=submission.id,
+            student_id=submission.student_id,
+            ai_probability=submission.ai_probability,
+            flagged=submission.flagged,
+            deduplicated=deduplicated,
+        )
+
+    async def flush() -> None:
+        batch = list(pending)
+        pending.clear()
+        texts = await asyncio.gather(*(task for *_, task in batch), return_exceptions=True)
+        ready: list[tuple[str, SubmissionCreate, crud.SubmissionRefs]] = []
+        for (name, record, refs, _), text in zip(batch, texts):
+            if isinstance(text, PdfExtractionError):
+                results.append(ArchiveEntryResult(entry=name, error=str(text)))
+                continue
+            if isinstance(text, BaseException):
+                raise text
+            record.answer_text = text
+            record.ocr_text = text
+            ready.append((name, record, refs))
+        if not ready:
+            return
+        ingested = await ingest_submissions(
+            session,
+            [record for _, record, _ in ready],
+            score=score,
+            refs=[refs for _, _, refs in ready],
+        )
+        for (name, _, _), submission, deduplicated in zip(ready, ingested.submissions, ingested.deduplicated):
+            results.append(entry_result(name, submission, deduplicated))
+
+    async def extract_and_cleanup(path: str, suffix: str) -> str:
+        try:
+            return await _extract_member_text(path, suffix)
+        finally:
+            os.unlink(path)
+
+    try:
+        while True:
+            member = await run_in_threadpool(next, members, None)
+            if member is None:
+                break
+            if _is_manifest(member.name):
+                if is_tar and (results or pending):
+                    error = "A tar archive's manifest must come before the answer scripts"
+                    results.append(ArchiveEntryResult(entry=member.name, error=error))
+                elif is_tar:
+                    manifest = await run_in_threadpool(_read_member_manifest, member)
+                continue
+            suffix = PurePosixPath(member.name).suffix.lower()
+            if suffix not in ENTRY_SUFFIXES:
+                continue
+            if member.size > settings.archive_max_entry_bytes:
+                results.append(ArchiveEntryResult(entry=member.name, error="Entry exceeds the size limit"))
+                continue
+            record = entry_submission(member.name, manifest, pattern, default_course_id)
+            if record is None:
+                results.append(ArchiveEntryResult(entry=member.name, error="No student mapping for entry"))
+                continue
+            try:
+                refs = await run_in_threadpool(crud.resolve_submission_refs, session, record)
+            except ValueError as exc:
+                results.append(ArchiveEntryResult(entry=member.name, error=str(exc)))
+                continue
+            path, record.source_hash = await run_in_threadpool(_spool_member, member)
+            duplicates = await run_in_threadpool(
+                crud.find_duplicate_submissions, session, [(refs, None, record.source_hash)]
+            )
+            duplicate = duplicates[0]
+            if duplicate is not None:
+                os.unlink(path)
+                results.append(entry_result(member.name, duplicate, deduplicated=True))
+                continue
+            task = asyncio.ensure_future(extract_and_cleanup(path, suffix))
+            pending.append((member.name, record, refs, task))
+            if len(pending) >= settings.archive_batch_size:
+                await flush()
+        if before_last_flush is not None:
+            before_last_flush()
+        await flush()
+    finally:
+        for *_, task in pending:
+            task.cancel()
+        members.close()
+
+    deduplicated = sum(1 for result in results if result.deduplicated)
+    created = sum(1 for result in results if result.submission_id is not None) - deduplicated
+    return ArchiveImportResult(
+        archive=filename,
+        created=created,
+        deduplicated=deduplicated,
+        skipped=len(results) - created - deduplicated,
+        entries=results,
+    )
@@ -1,167 +1,290 @@
 from __future__ import annotations
 
+import functools
 import math
 import os
-import re
-import sys
+import threading
+import time
 from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Tuple
 
 import httpx
+from service_common.circuit_breaker import OPEN, CircuitBreaker
+from service_common.single_flight import SingleFlight
 
-try:
-    import torch  # type: ignore
-except Exception:  # pragma: no cover - torch is optional in the main service container
-    torch = None  # type: ignore
-
-PIPELINE_DIR: Path | None = None
-MODEL_PATH: Path | None = None
-LOCAL_PIPELINE_AVAILABLE = False
-
-try:
-    project_root = Path(__file__).resolve().parents[2]
-    repo_root = project_root.parent
-except IndexError:
-    repo_root = Path(__file__).resolve().parent
-
-candidate = repo_root / "ai-pipeline"
-if candidate.exists():
-    PIPELINE_DIR = candidate
-    MODEL_PATH = PIPELINE_DIR / "models" / "logit_blender.json"
-    if str(PIPELINE_DIR) not in sys.path:
-        sys.path.append(str(PIPELINE_DIR))
-
-if PIPELINE_DIR:
+from ..hashing import answer_hash
+from ..metrics import (
+    BREAKER_METRICS,
+    COALESCED_CALLS,
+    DETECTOR_BUDGET_EXHAUSTED,
+    DETECTOR_PREDICTIONS,
+    stage_timer,
+    timed,
+)
+from ..pipeline_path import PIPELINE_DIR
+
+MODEL_DIR: Path | None = Path(os.environ["MODEL_DIR"]) if os.getenv("MODEL_DIR") else None
+if PIPELINE_DIR is not None:
+    MODEL_DIR = MODEL_DIR or PIPELINE_DIR / "models"
+# The heuristic reads as many tokens as ai-pipeline's clean_text keeps.
+HEURISTIC_MAX_TOKENS = 900
+
+
+@dataclass(frozen=True)
+class LocalPipeline:
+    clean_text: Callable
+    backend: Any
+    ModelRegistry: Any
+    ModelHandle: Any
+    build_coherence_request: Callable
+    request_coherence: Callable
+    language_model_path: Callable
+    load_language_model: Callable
+    perplexity_feature: Callable
+
+
+@functools.lru_cache(maxsize=None)
+def load_local_pipeline(backend: str | None = None) -> LocalPipeline | None:
+    """Import the ai-pipeline modules on first use; ``None`` when they are not shipped.
+
+    ``backend`` (default ``INFERENCE_BACKEND``, i.e. torch when installed) picks the
+    inference runtime; without torch the plain-Python backend scores the same features.
+    Importing torch costs seconds, so this is deferred until a submission actually falls
+    back to the local tier (or ``DetectorService.warm_up`` runs at startup).
+    """
+    if PIPELINE_DIR is None:
+        return None
     try:
-        from detectors.cross_perplexity import compute_feature_vector  # type: ignore  # noqa: E402
-        from detectors.tocsin import tocsin_score  # type: ignore  # noqa: E402
-        from ensemble import LogisticBlender  # type: ignore  # noqa: E402
-        from preprocess import clean_text  # type: ignore  # noqa: E402
-
-        LOCAL_PIPELINE_AVAILABLE = True
-    except Exception:
-        compute_feature_vector = None  # type: ignore
-        tocsin_score = None  # type: ignore
-        LogisticBlender = None  # type: ignore
-        clean_text = None  # type: ignore
-        LOCAL_PIPELINE_AVAILABLE = False
-else:
-    compute_feature_vector = None  # type: ignore
-    tocsin_score = None  # type: ignore
-    LogisticBlender = None  # type: ignore
-    clean_text = None  # type: ignore
+        from coherence import build_request, request_score  # type: ignore
+        from detectors.ngram_lm import default_path, load_model, perplexity_feature  # type: ignore
+        from model_registry import ModelHandle, ModelRegistry  # type: ignore
+        from preprocess import clean_text  # type: ignore
+        from runtime import load_backend  # type: ignore
+    except ImportError:  # pragma: no cover - the main-service image may ship without ai-pipeline
+        return None
+    return LocalPipeline(
+        clean_text,
+        load_backend(backend),
+        ModelRegistry,
+        ModelHandle,
+        build_request,
+        request_score,
+        default_path,
+        load_model,
+        perplexity_feature,
+    )
+
+
+# Scores from the heuristic tier are versioned separately from the blender's registry.
+HEURISTIC_VERSION = "heuristic"
+# Blank answers never reach a model; every version gives them this probability.
+BLANK_PROBABILITY = 0.05
 
 
 class DetectorService:
     """Wraps the AI inference pipeline so the main service can score submissions."""
 
-    def __init__(self, model_path: Path | None = None, pipeline_url: str | None = None) -> None:
-        self.model_path = model_path or MODEL_PATH
+    def __init__(
+        self, model_dir: Path | None = None, pipeline_url: str | None = None, backend: str | None = None
+    ) -> None:
+        self.model_dir = model_dir or MODEL_DIR
+        self.backend = backend
+        self.model_reload_seconds = float(os.getenv("MODEL_RELOAD_SECONDS", "2"))
         self.threshold = float(os.getenv("AI_FLAG_THRESHOLD", "0.6"))
         self.ollama_host = os.getenv("OLLAMA_HOST", "http://ollama:11434")
         self.ollama_model = os.getenv("OLLAMA_MODEL", "llama3")
         self.ai_pipeline_url = pipeline_url or os.getenv("AI_PIPELINE_URL", "http://ai-pipeline:8001")
         self.pipeline_timeout = float(os.getenv("AI_PIPELINE_TIMEOUT", "15"))
-        self._local_enabled = (
-            LOCAL_PIPELINE_AVAILABLE
-            and self.model_path is not None
-            and "LogisticBlender" in globals()
-            and LogisticBlender is not None
-            and torch is not None
-        )
-        self._blender = LogisticBlender.load(self.model_path) if self._local_enabled else None  # type: ignore
+        # Answers per /analyze/batch call when scoring imports; ai-pipeline packs them into shared LLM prompts.
+        self.pipeline_batch_size = int(os.getenv("AI_PIPELINE_BATCH_SIZE", "32"))
+        self.ollama_timeout = float(os.getenv("OLLAMA_TIMEOUT", "20"))
+        # Wall-clock allowance for one answer across every tier; the heuristic always runs.
+        self.answer_budget = float(os.getenv("AI_DETECT_BUDGET_SECONDS", "20"))
+        self.pipeline_breaker = CircuitBreaker.from_env("ai_pipeline", BREAKER_METRICS)
+        self.ollama_breaker = CircuitBreaker.from_env("ollama", BREAKER_METRICS)
+        # None until the local pipeline has been looked for (see ``_local_model``).
+        self._local_enabled: bool | None = None
+        self._model = None
+        self._model_lock = threading.Lock()
+        # Every tier scores the case-folded, whitespace-collapsed answer, so duplicates share one call.
+        self._flights: SingleFlight[Dict[str, Any]] = SingleFlight("detector.predict", COALESCED_CALLS)
 
-    def _coherence_score(self, text: str) -> float:
+    def _local_model(self):
+        """The registry's current blender (a ``LoadedModel``), or None without a local pipeline."""
+        if self._local_enabled is False:
+            return None
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    pipeline = load_local_pipeline(self.backend)
+                    if pipeline is None or self.model_dir is None:
+                        self._local_enabled = False
+                        return None
+                    default_language_model = pipeline.language_model_path(self.model_dir)
+                    # Each version comes with the n-gram LM it was trained with (see ai-pipeline's model_registry.py).
+                    self._model = pipeline.ModelHandle(
+                        pipeline.ModelRegistry(self.model_dir),
+                        pipeline.backend.blender_cls.from_dict,
+                        check_seconds=self.model_reload_seconds,
+                        load_language_model=lambda path: pipeline.load_language_model(path or default_language_model),
+                    )
+                    self._local_enabled = True
+        return self._model.get()
+
+    def current_model_version(self) -> str | None:
+        """Version new scores will come from: ai-pipeline's current model, else the local registry's.
+
+        None when neither is reachable; heuristic scores are never a re-scoring target.
+        """
+        if self.ai_pipeline_url and self.pipeline_breaker.state != OPEN:
+            try:
+                with httpx.Client(timeout=self.pipeline_timeout) as client:
+                    response = client.get(f"{self.ai_pipeline_url.rstrip('/')}/models")
+                    response.raise_for_status()
+                    return response.json()["current"]
+            except Exception:
+                pass
+        pipeline = load_local_pipeline(self.backend)
+        if pipeline is None or self.model_dir is None:
+            return None
+        return pipeline.ModelRegistry(self.model_dir).current_version()
+
+    def warm_up(self) -> bool:
+        """Load the local pipeline and blender now instead of on the first fallback."""
+        return self._local_model() is not None
+
+    @timed("detector.ollama")
+    def _coherence_score(self, text: str, deadline: float) -> float:
+        """Ollama's coherence rating, streamed and cut off at the first score (see ai-pipeline's coherence.py)."""
         if not text:
             return 0.5
-        payload = {
-            "model": self.ollama_model,
-            "prompt": f"Evaluate coherence (0-1 FLOAT) for: {text[:800]}",
-            "stream": False,
-        }
+        pipeline = load_local_pipeline(self.backend)
+        timeout = _remaining(deadline, self.ollama_timeout, "ollama")
+        if pipeline is None or timeout is None or not self.ollama_breaker.allow():
+            return 0.5
         try:
-            with httpx.Client(timeout=20) as client:
-                response = client.post(f"{self.ollama_host}/api/generate", json=payload)
-                response.raise_for_status()
-                data = response.json()
+            with httpx.Client(timeout=timeout) as client:
+                score = pipeline.request_coherence(
+                    client, self.ollama_host, pipeline.build_coherence_request(self.ollama_model, text)
+                )
         except Exception:
+            self.ollama_breaker.record_failure()
             return 0.5
-        message = str(data.get("response", "0.5"))
-        for token in message.split():
-            token = token.strip().strip("%")
-            try:
-                score = float(token)
-            except ValueError:
-                continue
-            if 0 <= score <= 1:
-                return score
-            if 0 <= score <= 100:
-                return score / 100
-        return 0.5
-
-    def _build_features(self, text: str) -> tuple[torch.Tensor, Dict[str, float]]:
-        if torch is None or not (clean_text and compute_feature_vector and tocsin_score):  # type: ignore
+        self.ollama_breaker.record_success()
+        return 0.5 if score is None else score
+
+    def _build_features(self, text: str, deadline: float, language_model: Any) -> tuple[Any, Dict[str, float]]:
+        pipeline = load_local_pipeline(self.backend)
+        if pipeline is None:
             raise RuntimeError("Local pipeline modules are unavailable.")
-        processed = clean_text(text)  # type: ignore
+        with stage_timer("detector.clean_text"):
+            processed = pipeline.clean_text(text)
         tokens = processed.cleaned.split(" ")
-        cross_vec = compute_feature_vector(tokens)  # type: ignore
-        tocsin = tocsin_score(tokens)  # type: ignore
-        coherence = self._coherence_score(processed.cleaned)
-        features = torch.tensor(
+        with stage_timer("detector.cross_perplexity"):
+            cross_perplexity = pipeline.backend.cross_perplexity(tokens)
+        with stage_timer("detector.tocsin"):
+            tocsin = pipeline.backend.tocsin_score(tokens)
+        with stage_timer("detector.lm_perplexity"):
+            lm_perplexity = pipeline.perplexity_feature(language_model, tokens)
+        coherence = self._coherence_score(processed.cleaned, deadline)
+        features = pipeline.backend.as_features(
             [
                 coherence,
-                cross_vec[0].item(),
+                cross_perplexity,
                 tocsin,
                 processed.token_count / 1000.0,
-            ],
-            dtype=torch.float32,
+                lm_perplexity,
+            ]
         )
         metrics = {
             "coherence": coherence,
-            "cross_perplexity": cross_vec[0].item(),
+            "cross_perplexity": cross_perplexity,
             "tocsin": tocsin,
             "length_norm": processed.token_count / 1000.0,
+            "lm_perplexity": lm_perplexity,
         }
         return features, metrics
 
-    def _remote_predict(self, text: str) -> Dict[str, Any] | None:
+    def _call_pipeline(self, path: str, payload: Dict[str, Any], deadline: float) -> Any | None:
         if not self.ai_pipeline_url:
             return None
-        url = f"{self.ai_pipeline_url.rstrip('/')}/analyze"
+        timeout = _remaining(deadline, self.pipeline_timeout, "remote")
+        if timeout is None or not self.pipeline_breaker.allow():
+            return None
+        url = f"{self.ai_pipeline_url.rstrip('/')}{path}"
         try:
-            with httpx.Client(timeout=self.pipeline_timeout) as client:
-                response = client.post(url, json={"answer": text})
+            with httpx.Client(timeout=timeout) as client:
+                response = client.post(url, json=payload)
                 response.raise_for_status()
                 data = response.json()
+        except httpx.HTTPStatusError as exc:
+            # A 4xx means this request was rejected, not that the pipeline is unhealthy.
+            if exc.response.status_code < 500:
+                self.pipeline_breaker.record_success()
+            else:
+                self.pipeline_breaker.record_failure()
+            return None
         except Exception:
+            self.pipeline_breaker.record_failure()
             return None
+        self.pipeline_breaker.record_success()
+        return data
+
+    def _remote_result(self, data: Dict[str, Any]) -> Dict[str, Any]:
         probability = float(data.get("ai_probability", data.get("prob_ai", 0.0)) or 0.0)
         metrics = {
             "coherence": float(data.get("coherence", 0.0) or 0.0),
             "cross_perplexity": float(data.get("cross_perplexity", 0.0) or 0.0),
             "tocsin": float(data.get("tocsin", 0.0) or 0.0),
             "length_norm": float(data.get("length_norm", 0.0) or 0.0),
+            "lm_perplexity": float(data.get("lm_perplexity", 0.0) or 0.0),
         }
         label = "ai" if probability >= self.threshold else "human"
-        return {"prob_ai": probability, "label": label, "metrics": metrics}
+        version = data.get("model_version")
+        return {"prob_ai": probability, "label": label, "metrics": metrics, "model_version": version}
+
+    @timed("detector.remote")
+    def _remote_predict(self, text: str, deadline: float) -> Dict[str, Any] | None:
+        data = self._call_pipeline("/analyze", {"answer": text}, deadline)
+        return None if data is None else self._remote_result(data)
+
+    @timed("detector.remote_batch")
+    def _remote_predict_many(self, texts: list[str], deadline: float) -> list[Dict[str, Any]] | None:
+        data = self._call_pipeline("/analyze/batch", {"answers": [{"answer": text} for text in texts]}, deadline)
+        results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(results, list) or len(results) != len(texts):
+            return None
+        return [self._remote_result(item) for item in results]
 
-    def _local_predict(self, text: str) -> Dict[str, Any] | None:
-        if not (self._local_enabled and self._blender):
+    def _local_predict(self, text: str, deadline: float) -> Dict[str, Any] | None:
+        model = self._local_model()
+        if model is None:
             return None
-        features, metrics = self._build_features(text)
-        probability = float(self._blender.predict(features))
+        if _remaining(deadline, self.answer_budget, "local") is None:
+            return None
+        features, metrics = self._build_features(text, deadline, model.language_model)
+        with stage_timer("detector.blender"):
+            probability = float(model.model.predict(features))
         label = "ai" if probability >= self.threshold else "human"
-        return {"prob_ai": probability, "label": label, "metrics": metrics}
+        return {"prob_ai": probability, "label": label, "metrics": metrics, "model_version": model.version}
 
     def _tokenize(self, text: str) -> list[str]:
-        normalized = re.sub(r"\s+", " ", (text or "").lower()).strip()
-        return normalized.split(" ") if normalized else []
+        """The first ``HEURISTIC_MAX_TOKENS`` lowercased tokens; the rest of the text is never scanned."""
+        text = text or ""
+        window = HEURISTIC_MAX_TOKENS * 8
+        while True:
+            tokens = text[:window].lower().split()
+            if window >= len(text) or len(tokens) > HEURISTIC_MAX_TOKENS:
+                return tokens[:HEURISTIC_MAX_TOKENS]
+            window *= 4
 
     def _heuristic_metrics(self, text: str) -> Tuple[float, Dict[str, float]]:
         tokens = self._tokenize(text)
         if not tokens:
-            return 0.05, {"coherence": 0.5, "cross_perplexity": 0.0, "tocsin": 0.0, "length_norm": 0.0}
+            return BLANK_PROBABILITY, {"coherence": 0.5, "cross_perplexity": 0.0, "tocsin": 0.0, "length_norm": 0.0}
         counts = Counter(tokens)
         total = float(len(tokens))
         entropy = -sum((freq / total) * math.log(freq / total + 1e-9) for freq in counts.values())
@@ -185,22 +308,68 @@ class DetectorService:
         }
         return probability, metrics
 
+    @timed("detector.heuristic")
     def _heuristic_predict(self, text: str) -> Dict[str, Any]:
         probability, metrics = self._heuristic_metrics(text)
         label = "ai" if probability >= self.threshold else "human"
-        return {"prob_ai": probability, "label": label, "metrics": metrics}
+        return {"prob_ai": probability, "label": label, "metrics": metrics, "model_version": HEURISTIC_VERSION}
 
     def predict(self, text: str) -> Dict[str, Any]:
         normalized = text or ""
         if not normalized.strip():
+            DETECTOR_PREDICTIONS.labels(source="heuristic").inc()
             return self._heuristic_predict("")
-        remote = self._remote_predict(normalized)
+        return self._flights.do(answer_hash(normalized), lambda: self._predict(normalized))
+
+    def _predict(self, normalized: str) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.answer_budget
+        remote = self._remote_predict(normalized, deadline)
         if remote:
+            DETECTOR_PREDICTIONS.labels(source="remote").inc()
             return remote
-        local = self._local_predict(normalized)
+        local = self._local_predict(normalized, deadline)
         if local:
+            DETECTOR_PREDICTIONS.labels(source="local").inc()
             return local
+        DETECTOR_PREDICTIONS.labels(source="heuristic").inc()
         return self._heuristic_predict(normalized)
 
+    def predict_many(self, texts: list[str]) -> list[Dict[str, Any]]:
+        """``predict`` for several answers; ai-pipeline scores them ``pipeline_batch_size`` at a time.
+
+        Duplicate answers are scored once. Answers the batch call could not score go
+        through ``predict`` one by one.
+        """
+        keys = [answer_hash(text) if (text or "").strip() else None for text in texts]
+        unique = {key: text for key, text in zip(keys, texts) if key is not None}
+        pending = list(unique)
+        scored: dict[str, Dict[str, Any]] = {}
+        for start in range(0, len(pending), max(self.pipeline_batch_size, 1)):
+            chunk = pending[start : start + self.pipeline_batch_size]
+            remote = self._remote_predict_many([unique[key] for key in chunk], time.monotonic() + self.answer_budget)
+            if remote is None:
+                continue
+            DETECTOR_PREDICTIONS.labels(source="remote").inc(len(chunk))
+            scored.update(zip(chunk, remote))
+        for key, text in unique.items():
+            if key not in scored:
+                scored[key] = self.predict(text)
+        return [scored[key] if key is not None else self.predict(text) for key, text in zip(keys, texts)]
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "ai_pipeline": self.pipeline_breaker.snapshot(),
+            "ollama": self.ollama_breaker.snapshot(),
+        }
+
+
+def _remaining(deadline: float, limit: float, tier: str) -> float | None:
+    """Timeout for the next call: ``limit`` capped by what is left of the answer budget."""
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        DETECTOR_BUDGET_EXHAUSTED.labels(tier=tier).inc()
+        return None
+    return min(limit, remaining)
+
 
 detector = DetectorService()
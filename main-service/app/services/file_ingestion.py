@@ -3,13 +3,17 @@ from __future__ import annotations
 import csv
 import io
 import json
+from collections.abc import Iterable, Iterator
+from itertools import islice
 from pathlib import Path
-
-import pdfplumber
-from openpyxl import load_workbook
+from typing import BinaryIO, TypeVar
 
 from ..schemas import CourseCreate, StudentCreate, SubmissionCreate
 
+INGEST_CHUNK_SIZE = 500
+
+T = TypeVar("T")
+
 
 def _clean(value):
     if value is None:
@@ -20,96 +24,139 @@ def _clean(value):
     return value
 
 
-def _load_rows(file_bytes: bytes, filename: str) -> list[dict]:
+def chunked(items: Iterable[T], size: int = INGEST_CHUNK_SIZE) -> Iterator[list[T]]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def iter_rows(source: BinaryIO, filename: str) -> Iterator[dict]:
+    """Yield tabular rows one at a time from a binary file object (CSV or XLSX)."""
     suffix = Path(filename).suffix.lower()
     if suffix in {".csv", ".txt"}:
-        reader = csv.DictReader(io.StringIO(file_bytes.decode("utf-8")))
-        return [row for row in reader]
+        text = io.TextIOWrapper(source, encoding="utf-8", newline="")
+        try:
+            yield from csv.DictReader(text)
+        finally:
+            text.detach()
+        return
     if suffix in {".xlsx", ".xls"}:
-        workbook = load_workbook(io.BytesIO(file_bytes), read_only=True)
-        sheet = workbook.active
-        rows = []
-        headers = [str(cell.value).strip() if cell.value else "" for cell in next(sheet.iter_rows(max_row=1))]
-        for row in sheet.iter_rows(min_row=2, values_only=True):
-            rows.append({headers[idx]: row[idx] for idx in range(len(headers))})
-        return rows
+        from openpyxl import load_workbook  # deferred: only spreadsheet uploads pay for it
+
+        workbook = load_workbook(source, read_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header_row = next(rows, None)
+            if header_row is None:
+                return
+            headers = [str(value).strip() if value else "" for value in header_row]
+            for row in rows:
+                yield {header: row[idx] if idx < len(row) else None for idx, header in enumerate(headers)}
+        finally:
+            workbook.close()
+        return
     raise ValueError("Unsupported file type for tabular import")
 
 
+def _course_from_row(row: dict) -> CourseCreate:
+    manifest = row.get("content_manifest")
+    if isinstance(manifest, (dict, list)):
+        manifest = json.dumps(manifest)
+    return CourseCreate(
+        name=str(_clean(row.get("name") or row.get("course_name") or "")),
+        section_number=_clean(row.get("section_number")),
+        description=_clean(row.get("description")),
+        content_manifest=manifest,
+    )
+
+
+def _student_from_row(row: dict) -> StudentCreate:
+    return StudentCreate(
+        name=str(_clean(row.get("name") or row.get("student_name") or "")),
+        email=str(_clean(row.get("email") or row.get("student_email") or "")),
+    )
+
+
+def iter_courses(source: BinaryIO, filename: str) -> Iterator[CourseCreate]:
+    return map(_course_from_row, iter_rows(source, filename))
+
+
+def iter_students(source: BinaryIO, filename: str) -> Iterator[StudentCreate]:
+    return map(_student_from_row, iter_rows(source, filename))
+
+
 def parse_courses_from_file(file_bytes: bytes, filename: str) -> list[CourseCreate]:
-    rows = _load_rows(file_bytes, filename)
-    records: list[CourseCreate] = []
-    for row in rows:
-        manifest = row.get("content_manifest")
-        if isinstance(manifest, (dict, list)):
-            manifest = json.dumps(manifest)
-        records.append(
-            CourseCreate(
-                name=str(_clean(row.get("name") or row.get("course_name") or "")),
-                section_number=_clean(row.get("section_number")),
-                description=_clean(row.get("description")),
-                content_manifest=manifest,
-            )
-        )
-    return records
+    return list(iter_courses(io.BytesIO(file_bytes), filename))
 
 
 def parse_students_from_file(file_bytes: bytes, filename: str) -> list[StudentCreate]:
-    rows = _load_rows(file_bytes, filename)
-    students: list[StudentCreate] = []
-    for row in rows:
-        students.append(
-            StudentCreate(
-                name=str(_clean(row.get("name") or row.get("student_name") or "")),
-                email=str(_clean(row.get("email") or row.get("student_email") or "")),
-            )
-        )
-    return students
+    return list(iter_students(io.BytesIO(file_bytes), filename))
 
 
-def extract_pdf_text(file_bytes: bytes) -> str:
-    with pdfplumber.open(io.BytesIO(file_bytes)) as pdf:
+def extract_pdf_text(source: bytes | BinaryIO) -> str:
+    import pdfplumber
+
+    stream = io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    with pdfplumber.open(stream) as pdf:
         contents = []
         for page in pdf.pages:
             contents.append(page.extract_text() or "")
         return "\n".join(contents).strip()
 
 
-def parse_submissions_file(
-    file_bytes: bytes,
+def submission_from_pdf_text(
+    text: str,
     filename: str,
     default_course_id: int | None = None,
     default_student_email: str | None = None,
-) -> list[SubmissionCreate]:
+) -> SubmissionCreate:
+    return SubmissionCreate(
+        course_id=default_course_id,
+        student_email=default_student_email,
+        answer_text=text,
+        source_filename=filename,
+        ocr_text=text,
+    )
+
+
+def iter_submissions(
+    source: BinaryIO,
+    filename: str,
+    default_course_id: int | None = None,
+    default_student_email: str | None = None,
+) -> Iterator[SubmissionCreate]:
     suffix = Path(filename).suffix.lower()
-    submissions: list[SubmissionCreate] = []
     if suffix == ".pdf":
-        text = extract_pdf_text(file_bytes)
-        submissions.append(
-            SubmissionCreate(
-                course_id=default_course_id,
-                student_email=default_student_email,
-                answer_text=text,
-                source_filename=filename,
-                ocr_text=text,
-            )
+        yield submission_from_pdf_text(extract_pdf_text(source), filename, default_course_id, default_student_email)
+        return
+
+    for row in iter_rows(source, filename):
+        yield SubmissionCreate(
+            student_email=_clean(row.get("student_email") or row.get("email")) or default_student_email,
+            student_id=_clean(row.get("student_id")),
+            course_id=_clean(row.get("course_id")) or default_course_id,
+            course_name=_clean(row.get("course_name")),
+            topic_title=_clean(row.get("topic_title") or row.get("topic")),
+            topic_category=_clean(row.get("topic_category")),
+            answer_text=str(_clean(row.get("answer_text") or row.get("answer") or "")),
+            raw_score=_clean(row.get("raw_score")),
+            final_score=_clean(row.get("final_score")),
+            exam_type=_clean(row.get("exam_type") or row.get("exam")),
+            source_filename=filename,
         )
-        return submissions
-
-    for row in _load_rows(file_bytes, filename):
-        submissions.append(
-            SubmissionCreate(
-                student_email=_clean(row.get("student_email") or row.get("email")) or default_student_email,
-                student_id=_clean(row.get("student_id")),
-                course_id=_clean(row.get("course_id")) or default_course_id,
-                course_name=_clean(row.get("course_name")),
-                topic_title=_clean(row.get("topic_title") or row.get("topic")),
-                topic_category=_clean(row.get("topic_category")),
-                answer_text=str(_clean(row.get("answer_text") or row.get("answer") or "")),
-                raw_score=_clean(row.get("raw_score")),
-                final_score=_clean(row.get("final_score")),
-                exam_type=_clean(row.get("exam_type") or row.get("exam")),
-                source_filename=filename,
-            )
+
+
+def parse_submissions_file(
+    file_bytes: bytes,
+    filename: str,
+    default_course_id: int | None = None,
+    default_student_email: str | None = None,
+) -> list[SubmissionCreate]:
+    return list(
+        iter_submissions(
+            io.BytesIO(file_bytes),
+            filename,
+            default_course_id=default_course_id,
+            default_student_email=default_student_email,
         )
-    return submissions
+    )
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import get_settings
+from ..metrics import PDF_EXTRACTED_PAGES, PDF_EXTRACTION_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+
+class PdfExtractionError(ValueError):
+    pass
+
+
+_executor: ProcessPoolExecutor | None = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=get_settings().pdf_workers)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _discard_executor(executor: ProcessPoolExecutor, cancel_futures: bool = True) -> None:
+    """Stop sending work to ``executor``; new extractions start a fresh pool."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=cancel_futures)
+
+
+def _page_count(path: str) -> int:
+    import pdfplumber  # deferred so app startup and worker processes only load it when a PDF arrives
+
+    with pdfplumber.open(path) as pdf:
+        return len(pdf.pages)
+
+
+def _extract_page_range(path: str, start: int, stop: int) -> list[str]:
+    # Runs in a worker process; each range reopens the file so nothing large is pickled.
+    import pdfplumber
+
+    with pdfplumber.open(path) as pdf:
+        return [pdf.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+def page_ranges(page_count: int, pages_per_task: int) -> list[tuple[int, int]]:
+    step = max(1, pages_per_task)
+    return [(start, min(start + step, page_count)) for start in range(0, page_count, step)]
+
+
+def spool_to_disk(source: bytes | BinaryIO, suffix: str = ".pdf") -> str:
+    handle = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    with handle:
+        if isinstance(source, (bytes, bytearray)):
+            handle.write(source)
+        else:
+            if source.seekable():
+                source.seek(0)
+            shutil.copyfileobj(source, handle)
+    return handle.name
+
+
+async def extract_pdf_file_async(path: str, prefer_processes: bool = False) -> str:
+    """Extract text from a PDF on disk without blocking the event loop.
+
+    Documents longer than ``pdf_pages_per_task`` are split into page ranges that run in
+    parallel in the process pool; shorter ones use the threadpool unless
+    ``prefer_processes`` is set (bulk callers extracting many small files at once).
+    Pages past ``pdf_max_pages`` are ignored and the whole extraction must finish within
+    ``pdf_time_budget_seconds``; otherwise, or when a page cannot be extracted, a
+    ``PdfExtractionError`` is raised.
+    """
+    settings = get_settings()
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        try:
+            total_pages = await run_in_threadpool(_page_count, path)
+        except Exception as exc:
+            raise PdfExtractionError("Uploaded file is not a readable PDF") from exc
+        ranges = page_ranges(min(total_pages, settings.pdf_max_pages), settings.pdf_pages_per_task)
+        use_processes = len(ranges) > 1 or prefer_processes
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.pdf_time_budget_seconds
+        for attempt in range(2):
+            executor = get_executor() if use_processes else None
+            if executor is None:
+                tasks = [run_in_threadpool(_extract_page_range, path, *pages) for pages in ranges]
+            else:
+                tasks = [loop.run_in_executor(executor, _extract_page_range, path, *pages) for pages in ranges]
+            try:
+                chunks = await asyncio.wait_for(asyncio.gather(*tasks), timeout=max(0.0, deadline - loop.time()))
+                break
+            except asyncio.TimeoutError as exc:
+                outcome = "timeout"
+                if executor is not None:
+                    # A range a worker has picked up cannot be cancelled, and killing it would break the
+                    # pool under every other extraction sharing it. Leave the old pool to finish the work
+                    # it holds (this document's queued ranges were cancelled with the wait) and move on.
+                    _discard_executor(executor, cancel_futures=False)
+                raise PdfExtractionError(
+                    f"PDF extraction exceeded the {settings.pdf_time_budget_seconds:g}s time budget"
+                ) from exc
+            except BrokenProcessPool as exc:
+                # A worker died (e.g. killed for memory): retry once on a new pool.
+                logger.warning("PDF worker pool broke; replacing it")
+                _discard_executor(executor)
+                if attempt:
+                    raise PdfExtractionError("PDF extraction failed") from exc
+            except Exception as exc:
+                raise PdfExtractionError("Could not extract text from the PDF") from exc
+        PDF_EXTRACTED_PAGES.inc(sum(len(pages) for pages in chunks))
+        outcome = "ok"
+        return "\n".join(text for pages in chunks for text in pages).strip()
+    finally:
+        PDF_EXTRACTION_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - started)
+
+
+async def extract_pdf_text_async(source: bytes | BinaryIO, prefer_processes: bool = False) -> str:
+    path = await run_in_threadpool(spool_to_disk, source)
+    try:
+        return await extract_pdf_file_async(path, prefer_processes=prefer_processes)
+    finally:
+        os.unlink(path)
@@ -0,0 +1,232 @@
+"""Re-score stored submissions after the detector model changes.
+
+A pass targets one model version and walks the submissions scored by any other version
+(or by none) in primary-key order, ``rescore_batch_size`` at a time. Each distinct answer
+in a batch is scored once, at most ``rescore_concurrency`` at a time, and the batch is
+written back with one bulk UPDATE. Progress is checkpointed in ``RescoreJob`` after every
+batch: a restarted worker resumes after ``last_id``, and a pass whose worker stops
+checkpointing for ``rescore_lease_seconds`` is taken over by another worker.
+
+Rows the detector could not score with the target model (it fell back to the heuristic)
+keep their old score and are counted as failed; a batch where that happens to every
+row fails the pass, which is resumed on the next check.
+
+Database work runs in the threadpool so a pass never blocks the event loop.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import Engine, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+from starlette.concurrency import run_in_threadpool
+
+from .. import crud
+from ..cache import cache_delete
+from ..config import get_settings
+from ..database import engine
+from ..metrics import RESCORE_REMAINING, RESCORED_SUBMISSIONS, timed
+from ..models import RescoreJob
+from ..schemas import RescoreStatus
+from .detector_service import BLANK_PROBABILITY, DetectorService, detector
+
+logger = logging.getLogger(__name__)
+
+RUNNING, COMPLETED, FAILED = "running", "completed", "failed"
+# Cached dashboards that aggregate ai_probability / flagged.
+ANALYTICS_CACHE_KEYS = ("analytics:overview",)
+
+
+class Rescorer:
+    def __init__(
+        self,
+        engine: Engine,
+        detector: DetectorService,
+        batch_size: int = 200,
+        concurrency: int = 4,
+        lease_seconds: float = 120.0,
+    ) -> None:
+        self.engine = engine
+        self.detector = detector
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_settings(cls, engine: Engine, detector: DetectorService) -> Rescorer:
+        settings = get_settings()
+        return cls(
+            engine,
+            detector,
+            batch_size=settings.rescore_batch_size,
+            concurrency=settings.rescore_concurrency,
+            lease_seconds=settings.rescore_lease_seconds,
+        )
+
+    def status(self) -> RescoreStatus:
+        with Session(self.engine) as session:
+            job = session.exec(select(RescoreJob).order_by(RescoreJob.heartbeat_at.desc())).first()
+            if job is None:
+                return RescoreStatus()
+            return RescoreStatus(
+                target_version=job.target_version,
+                status=job.status,
+                total=job.total,
+                processed=job.processed,
+                updated=job.updated,
+                failed=job.failed,
+                remaining=crud.count_stale_submissions(session, job.target_version),
+                error=job.error,
+                started_at=job.started_at,
+                finished_at=job.finished_at,
+            )
+
+    def claim(self, target_version: str, restart: bool = False) -> RescoreJob | None:
+        """Take the pass for ``target_version``, creating it on first use.
+
+        A failed pass, or one whose worker let its lease lapse, is resumed; a completed
+        pass is only started over with ``restart``. Returns None when there is nothing to
+        do or another worker holds the pass.
+        """
+        now = datetime.utcnow()
+        with Session(self.engine, expire_on_commit=False) as session:
+            job = session.exec(select(RescoreJob).where(RescoreJob.target_version == target_version)).first()
+            if job is None:
+                job = RescoreJob(
+                    target_version=target_version,
+                    total=crud.count_stale_submissions(session, target_version),
+                    started_at=now,
+                    heartbeat_at=now,
+                )
+                session.add(job)
+                try:
+                    session.commit()
+                except IntegrityError:
+                    return None  # another worker created the pass first
+                return job
+            if job.status == COMPLETED and not restart:
+                return None
+            if job.status == RUNNING and job.heartbeat_at > now - timedelta(seconds=self.lease_seconds):
+                return None
+            fields = {"status": RUNNING, "heartbeat_at": now, "error": None, "finished_at": None}
+            if restart:
+                total = crud.count_stale_submissions(session, target_version)
+                fields.update(last_id=0, total=total, processed=0, updated=0, failed=0, started_at=now)
+            if not self._checkpoint(session, job, **fields):
+                return None
+            return job
+
+    def _checkpoint(self, session: Session, job: RescoreJob, **fields) -> bool:
+        """Write ``fields`` if ``job`` is still ours, i.e. nobody checkpointed it since we last did."""
+        result = session.execute(
+            update(RescoreJob)
+            .where(RescoreJob.id == job.id, RescoreJob.heartbeat_at == job.heartbeat_at)
+            .values(**fields)
+        )
+        session.commit()
+        if result.rowcount != 1:
+            return False
+        for name, value in fields.items():
+            setattr(job, name, value)
+        return True
+
+    def _score(self, text: str, target_version: str) -> tuple[float, str | None]:
+        if not text.strip():
+            # Blank answers get the same fixed score under every model, so the detector is not asked.
+            return BLANK_PROBABILITY, target_version
+        result = self.detector.predict(text)
+        return float(result["prob_ai"]), result.get("model_version")
+
+    @timed("rescore.pass")
+    async def run(self, job: RescoreJob) -> RescoreJob:
+        """Re-score batches until no stale submission is left after ``job.last_id``.
+
+        The session is only used from one threadpool call at a time.
+        """
+        loop = asyncio.get_running_loop()
+        target = job.target_version
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix="rescore") as pool, Session(
+            self.engine, expire_on_commit=False
+        ) as session:
+            while True:
+                batch = await run_in_threadpool(crud.stale_submissions, session, target, job.last_id, self.batch_size)
+                if not batch:
+                    await run_in_threadpool(
+                        self._checkpoint,
+                        session,
+                        job,
+                        status=COMPLETED,
+                        heartbeat_at=datetime.utcnow(),
+                        finished_at=datetime.utcnow(),
+                    )
+                    RESCORE_REMAINING.set(0)
+                    return job
+                texts = {blob_hash: text for _, blob_hash, text in batch}
+                results = await asyncio.gather(
+                    *(loop.run_in_executor(pool, self._score, text, target) for text in texts.values())
+                )
+                scored = dict(zip(texts, results))
+                scores = [
+                    (row_id, scored[blob_hash][0], target)
+                    for row_id, blob_hash, _ in batch
+                    if scored[blob_hash][1] == target
+                ]
+                if not scores:
+                    versions = sorted({str(version) for _, version in results})
+                    await run_in_threadpool(
+                        self._checkpoint,
+                        session,
+                        job,
+                        status=FAILED,
+                        heartbeat_at=datetime.utcnow(),
+                        error=f"No answer in the batch was scored by {target} (got {', '.join(versions)})",
+                    )
+                    RESCORED_SUBMISSIONS.labels(outcome="failed").inc(len(batch))
+                    return job
+                await run_in_threadpool(crud.update_submission_scores, session, scores)
+                RESCORED_SUBMISSIONS.labels(outcome="updated").inc(len(scores))
+                RESCORED_SUBMISSIONS.labels(outcome="failed").inc(len(batch) - len(scores))
+                still_ours = await run_in_threadpool(
+                    self._checkpoint,
+                    session,
+                    job,
+                    last_id=batch[-1][0],
+                    processed=job.processed + len(batch),
+                    updated=job.updated + len(scores),
+                    failed=job.failed + len(batch) - len(scores),
+                    heartbeat_at=datetime.utcnow(),
+                )
+                RESCORE_REMAINING.set(max(job.total - job.processed, 0))
+                await cache_delete(*ANALYTICS_CACHE_KEYS)
+                if not still_ours:
+                    logger.warning("Re-scoring pass for %s was taken over by another worker", target)
+                    return job
+
+    async def run_pending(self) -> RescoreJob | None:
+        """Run (or resume) the pass for the detector's current model, if one is due."""
+        target = await asyncio.get_running_loop().run_in_executor(None, self.detector.current_model_version)
+        if target is None:
+            return None
+        job = await run_in_threadpool(self.claim, target)
+        return await self.run(job) if job is not None else None
+
+    def spawn(self, job: RescoreJob) -> None:
+        """Run ``job`` in the background of the current event loop."""
+        self._task = asyncio.create_task(self.run(job))
+
+    async def watch(self, interval_seconds: float) -> None:
+        while True:
+            try:
+                await self.run_pending()
+            except Exception:
+                logger.exception("Re-scoring pass failed")
+            await asyncio.sleep(interval_seconds)
+
+
+rescorer = Rescorer.from_settings(engine, detector)
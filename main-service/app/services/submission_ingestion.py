@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from collections.abc import Awaitable, Callable, Sequence
+from dataclasses import dataclass, field
+
+from sqlmodel import Session
+
+from .. import crud
+from ..hashing import answer_hash
+from ..metrics import stage_timer, timed
+from ..models import QuizSubmission
+from ..schemas import SubmissionCreate
+
+
+@dataclass(frozen=True)
+class Score:
+    probability: float
+    # Detector model behind the probability; None when scoring failed and a placeholder was used.
+    model_version: str | None = None
+
+
+# Scores a chunk of records at once, so the detector can share LLM calls between them.
+Scorer = Callable[[Sequence[SubmissionCreate]], Awaitable[list[Score]]]
+
+
+@dataclass
+class IngestResult:
+    # Aligned with the input records; ``None`` marks a record rejected through ``on_error``.
+    submissions: list[QuizSubmission | None] = field(default_factory=list)
+    deduplicated: list[bool] = field(default_factory=list)
+
+    @property
+    def deduplicated_count(self) -> int:
+        return sum(self.deduplicated)
+
+    def stored(self) -> list[QuizSubmission]:
+        return [submission for submission in self.submissions if submission is not None]
+
+
+@timed("ingest.submissions")
+async def ingest_submissions(
+    session: Session,
+    records: Sequence[SubmissionCreate],
+    score: Scorer,
+    refs: Sequence[crud.SubmissionRefs | None] | None = None,
+    on_error: Callable[[int, ValueError], None] | None = None,
+) -> IngestResult:
+    """Score and store a chunk of submissions, skipping ones that were already imported.
+
+    A record is a duplicate when a stored submission for the same student, course and
+    topic has the same normalized answer or came from the same source file. Duplicates
+    are not re-scored; only their grade fields are refreshed. Records whose student or
+    course cannot be resolved raise ``ValueError`` unless ``on_error`` is given.
+    """
+    resolved: list[crud.SubmissionRefs | None] = list(refs) if refs is not None else []
+    if refs is None:
+        for index, record in enumerate(records):
+            try:
+                resolved.append(crud.resolve_submission_refs(session, record))
+            except ValueError as exc:
+                if on_error is None:
+                    raise
+                on_error(index, exc)
+                resolved.append(None)
+
+    valid = [index for index, row_refs in enumerate(resolved) if row_refs is not None]
+    keys = {
+        index: (resolved[index], answer_hash(records[index].answer_text), records[index].source_hash)
+        for index in valid
+    }
+    existing = dict(zip(valid, crud.find_duplicate_submissions(session, [keys[index] for index in valid])))
+
+    # Duplicates inside the same chunk collapse onto the first occurrence.
+    first_by_key: dict[tuple, int] = {}
+    to_create: list[int] = []
+    aliases: dict[int, int] = {}
+    for index in valid:
+        if existing[index] is not None:
+            crud.apply_duplicate_update(existing[index], records[index])
+            continue
+        row_refs, answer, _ = keys[index]
+        key = (row_refs.student_id, row_refs.course_id, row_refs.topic_id, answer)
+        if key in first_by_key:
+            aliases[index] = first_by_key[key]
+            continue
+        first_by_key[key] = index
+        to_create.append(index)
+
+    with stage_timer("ingest.score"):
+        scores = await score([records[index] for index in to_create]) if to_create else []
+    updated = list({id(sub): sub for sub in existing.values() if sub is not None}.values())
+    created = crud.create_submissions(
+        session,
+        [(records[index], result.probability) for index, result in zip(to_create, scores)],
+        refs=[resolved[index] for index in to_create],
+        updated=updated,
+        model_versions=[result.model_version for result in scores],
+    )
+    by_index = dict(zip(to_create, created))
+
+    result = IngestResult()
+    for index in range(len(records)):
+        if resolved[index] is None:
+            result.submissions.append(None)
+            result.deduplicated.append(False)
+        elif existing[index] is not None:
+            result.submissions.append(existing[index])
+            result.deduplicated.append(True)
+        elif index in aliases:
+            result.submissions.append(by_index[aliases[index]])
+            result.deduplicated.append(True)
+        else:
+            result.submissions.append(by_index[index])
+            result.deduplicated.append(False)
+    return result
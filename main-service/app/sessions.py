@@ -1,28 +1,173 @@
 from __future__ import annotations
 
 import secrets
-from datetime import datetime, timedelta
-from typing import Dict
+import threading
+import time
+from collections import OrderedDict
+from typing import Protocol
+
+from .config import Settings, get_settings
+from .metrics import CACHE_LOOKUPS
+
+_CACHE_HITS = CACHE_LOOKUPS.labels(cache="session", result="hit")
+_CACHE_MISSES = CACHE_LOOKUPS.labels(cache="session", result="miss")
+
+
+class SessionBackend(Protocol):
+    def set(self, token: str, user_id: int, ttl_seconds: int) -> None: ...
+
+    def get(self, token: str) -> tuple[int, float] | None:
+        """Return ``(user_id, seconds_until_expiry)`` for a live token."""
+        ...
+
+    def delete(self, token: str) -> None: ...
+
+
+class InMemorySessionBackend:
+    """Process-local sessions with periodic expiry sweeps and a hard size cap."""
+
+    def __init__(self, max_entries: int = 10_000, sweep_interval_seconds: float = 60.0) -> None:
+        self.max_entries = max_entries
+        self.sweep_interval_seconds = sweep_interval_seconds
+        self._sessions: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval_seconds
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def _maybe_sweep(self, now: float) -> None:
+        if now >= self._next_sweep:
+            self._sweep(now)
+
+    def _sweep(self, now: float) -> int:
+        expired = [token for token, (_, expires_at) in self._sessions.items() if expires_at <= now]
+        for token in expired:
+            del self._sessions[token]
+        self._next_sweep = now + self.sweep_interval_seconds
+        return len(expired)
+
+    def sweep(self) -> int:
+        with self._lock:
+            return self._sweep(time.monotonic())
+
+    def set(self, token: str, user_id: int, ttl_seconds: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            self._sessions[token] = (user_id, now + ttl_seconds)
+            self._sessions.move_to_end(token)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def get(self, token: str) -> tuple[int, float] | None:
+        now = time.monotonic()
+        with self._lock:
+            self._maybe_sweep(now)
+            entry = self._sessions.get(token)
+            if not entry:
+                return None
+            user_id, expires_at = entry
+            if expires_at <= now:
+                del self._sessions[token]
+                return None
+            return user_id, expires_at - now
+
+    def delete(self, token: str) -> None:
+        with self._lock:
+            self._sessions.pop(token, None)
+
+
+class RedisSessionBackend:
+    """Sessions shared by every worker, expired natively by Redis TTLs."""
+
+    def __init__(self, redis_url: str | None = None, client=None, prefix: str = "session:") -> None:
+        if client is None:
+            from redis import Redis
+
+            client = Redis.from_url(redis_url or get_settings().redis_url, decode_responses=True)
+        self._client = client
+        self._prefix = prefix
+
+    def set(self, token: str, user_id: int, ttl_seconds: int) -> None:
+        self._client.set(f"{self._prefix}{token}", user_id, ex=ttl_seconds)
+
+    def get(self, token: str) -> tuple[int, float] | None:
+        pipe = self._client.pipeline()
+        pipe.get(f"{self._prefix}{token}")
+        pipe.pttl(f"{self._prefix}{token}")
+        value, ttl_ms = pipe.execute()
+        if value is None or ttl_ms is None or ttl_ms <= 0:
+            return None
+        return int(value), ttl_ms / 1000.0
+
+    def delete(self, token: str) -> None:
+        self._client.delete(f"{self._prefix}{token}")
 
 
 class SessionStore:
-    def __init__(self) -> None:
-        self._sessions: Dict[str, tuple[int, datetime]] = {}
+    """Issues and validates tokens, answering repeat checks from a short-lived local cache."""
+
+    def __init__(
+        self,
+        backend: SessionBackend | None = None,
+        cache_seconds: float = 5.0,
+        cache_max_entries: int = 4096,
+    ) -> None:
+        self.backend = backend or InMemorySessionBackend()
+        self.cache_seconds = cache_seconds
+        self.cache_max_entries = cache_max_entries
+        self._cache: OrderedDict[str, tuple[int, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, token: str, user_id: int, remaining_seconds: float) -> None:
+        if self.cache_seconds <= 0:
+            return
+        valid_until = time.monotonic() + min(self.cache_seconds, remaining_seconds)
+        with self._lock:
+            self._cache[token] = (user_id, valid_until)
+            self._cache.move_to_end(token)
+            while len(self._cache) > self.cache_max_entries:
+                self._cache.popitem(last=False)
 
     def create(self, user_id: int, ttl_minutes: int = 60) -> str:
         token = secrets.token_urlsafe(24)
-        self._sessions[token] = (user_id, datetime.utcnow() + timedelta(minutes=ttl_minutes))
+        self.backend.set(token, user_id, ttl_minutes * 60)
+        self._remember(token, user_id, ttl_minutes * 60)
         return token
 
     def validate(self, token: str) -> int | None:
-        entry = self._sessions.get(token)
+        cached = self._cache.get(token)
+        if cached and cached[1] > time.monotonic():
+            _CACHE_HITS.inc()
+            return cached[0]
+        _CACHE_MISSES.inc()
+        entry = self.backend.get(token)
         if not entry:
+            with self._lock:
+                self._cache.pop(token, None)
             return None
-        user_id, expires_at = entry
-        if datetime.utcnow() > expires_at:
-            self._sessions.pop(token, None)
-            return None
+        user_id, remaining = entry
+        self._remember(token, user_id, remaining)
         return user_id
 
+    def revoke(self, token: str) -> None:
+        # Other workers may keep accepting the token for up to ``cache_seconds``.
+        with self._lock:
+            self._cache.pop(token, None)
+        self.backend.delete(token)
+
+
+def build_session_store(settings: Settings | None = None) -> SessionStore:
+    settings = settings or get_settings()
+    if settings.session_backend == "redis":
+        backend: SessionBackend = RedisSessionBackend(settings.redis_url)
+    else:
+        backend = InMemorySessionBackend(
+            max_entries=settings.session_max_entries,
+            sweep_interval_seconds=settings.session_sweep_seconds,
+        )
+    return SessionStore(backend, cache_seconds=settings.session_cache_seconds)
+
 
-session_store = SessionStore()
+session_store = build_session_store()
@@ -0,0 +1,39 @@
+"""Startup warm-up for dependencies that are otherwise imported on first use.
+
+torch, the ai-pipeline modules, pdfplumber and openpyxl are imported lazily so that
+tests and short-lived tools start quickly. A serving worker can pay that cost once at
+startup (``WARMUP_ON_STARTUP=1``), before it accepts traffic, instead of on its first
+detection fallback or upload.
+"""
+
+from __future__ import annotations
+
+import importlib
+import logging
+import time
+from collections.abc import Callable
+
+from .services.detector_service import detector
+
+logger = logging.getLogger(__name__)
+
+WARMUP_STEPS: dict[str, Callable[[], object]] = {
+    "detector": detector.warm_up,
+    "pdfplumber": lambda: importlib.import_module("pdfplumber"),
+    "openpyxl": lambda: importlib.import_module("openpyxl"),
+}
+
+
+def warm_up() -> dict[str, float]:
+    """Run every warm-up step and return the seconds each one took."""
+    timings: dict[str, float] = {}
+    for name, step in WARMUP_STEPS.items():
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:  # a missing optional dependency must not stop the worker from starting
+            logger.warning("warm-up step %s failed", name, exc_info=True)
+        timings[name] = time.perf_counter() - started
+    summary = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in timings.items())
+    logger.info("warm-up finished: %s", summary)
+    return timings
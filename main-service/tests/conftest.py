@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 import sys
+from contextlib import contextmanager
 from pathlib import Path
 
 import pytest
@@ -15,8 +16,13 @@ if str(ROOT_DIR) not in sys.path:
 TEST_DB_PATH = ROOT_DIR / "test_app.db"
 os.environ.setdefault("DATABASE_URL", f"sqlite:///{TEST_DB_PATH.as_posix()}")
 os.environ.setdefault("AI_PIPELINE_URL", "")
+os.environ.setdefault("WARMUP_ON_STARTUP", "0")
+os.environ.setdefault("RESCORE_INTERVAL_SECONDS", "0")
 
 from app.database import engine  # noqa: E402
+from app.query_stats import track_queries  # noqa: E402
+from app.services.detector_service import detector  # noqa: E402
+from tests.pdfs import build_pdf  # noqa: E402
 
 
 @pytest.fixture(autouse=True)
@@ -24,3 +30,35 @@ def reset_database():
     SQLModel.metadata.drop_all(engine)
     SQLModel.metadata.create_all(engine)
     yield
+
+
+@pytest.fixture(autouse=True)
+def reset_breakers():
+    # Ollama is unreachable under test, so scoring trips the shared detector's breakers.
+    detector.pipeline_breaker.reset()
+    detector.ollama_breaker.reset()
+    yield
+
+
+@pytest.fixture
+def make_pdf():
+    return build_pdf
+
+
+@pytest.fixture
+def query_budget():
+    """``with query_budget(n):`` fails the test when the block runs more than ``n`` SQL statements.
+
+    Counting follows the current context, so call crud functions directly rather than
+    through ``TestClient``, whose requests run on another thread.
+    """
+
+    @contextmanager
+    def budget(max_queries: int):
+        with track_queries(capture=True) as stats:
+            yield stats
+        assert stats.count <= max_queries, f"{stats.count} queries (budget {max_queries}):\n" + "\n".join(
+            stats.statements
+        )
+
+    return budget
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import io
+import tarfile
+import zipfile
+
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import create_app
+from app.services.archive_ingestion import compile_filename_pattern
+
+
+def _zip(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in files.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar_gz(files: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def _seed(client: TestClient) -> int:
+    course_id = client.post("/courses/import", json=[{"name": "Operating Systems"}]).json()[0]["id"]
+    client.post(
+        "/students/import",
+        json=[{"name": "Ada", "email": "ada@example.edu"}, {"name": "Bob", "email": "bob@example.edu"}],
+    )
+    return course_id
+
+
+def test_zip_archive_maps_filenames_to_students(make_pdf, monkeypatch):
+    monkeypatch.setattr(get_settings(), "archive_batch_size", 2)
+    archive = _zip(
+        {
+            "scripts/ada@example.edu.pdf": make_pdf(["Scheduling answer", "Page two"]),
+            "scripts/bob@example.edu.txt": b"Paging answer in plain text",
+            "scripts/carol@example.edu.pdf": make_pdf(["Unknown student"]),
+            "scripts/readme.md": b"ignored",
+            "scripts/anonymous.pdf": make_pdf(["No mapping"]),
+        }
+    )
+    with TestClient(create_app()) as client:
+        course_id = _seed(client)
+        response = client.post(
+            "/import-file/submissions/archive",
+            params={"course_id": course_id},
+            files={"file": ("scripts.zip", archive, "application/zip")},
+        )
+        assert response.status_code == 200
+        result = response.json()
+        assert (result["created"], result["skipped"]) == (2, 2)
+        errors = {entry["entry"]: entry["error"] for entry in result["entries"] if entry["error"]}
+        assert "Student not found" in errors["scripts/carol@example.edu.pdf"]
+        assert "No student mapping" in errors["scripts/anonymous.pdf"]
+
+        stored = {row["source_filename"]: row for row in client.get("/submissions").json()}
+        assert stored["ada@example.edu.pdf"]["answer_text"] == "Scheduling answer\nPage two"
+        assert stored["bob@example.edu.txt"]["answer_text"] == "Paging answer in plain text"
+
+
+def test_tar_archive_uses_manifest(make_pdf):
+    manifest = b"filename,student_email,topic_title,final_score\nscript-001.pdf,bob@example.edu,Deadlocks,71\n"
+    # A tar is read in one pass, so its manifest has to come before the scripts.
+    archive = _tar_gz({"manifest.csv": manifest, "script-001.pdf": make_pdf(["Deadlock avoidance"])})
+    late = _tar_gz({"script-002.pdf": make_pdf(["Livelock"]), "manifest.csv": manifest})
+    with TestClient(create_app()) as client:
+        course_id = _seed(client)
+        response = client.post(
+            "/import-file/submissions/archive",
+            params={"course_id": course_id},
+            files={"file": ("scripts.tar.gz", archive, "application/gzip")},
+        )
+        assert response.status_code == 200
+        assert response.json()["created"] == 1
+        row = client.get("/submissions").json()[0]
+        assert (row["student_email"], row["topic_title"], row["final_score"]) == ("bob@example.edu", "Deadlocks", 71)
+
+        late_response = client.post(
+            "/import-file/submissions/archive",
+            params={"course_id": course_id},
+            files={"file": ("late.tar.gz", late, "application/gzip")},
+        )
+        errors = {entry["entry"]: entry["error"] for entry in late_response.json()["entries"]}
+        assert "must come before" in errors["manifest.csv"]
+        assert "No student mapping" in errors["script-002.pdf"]
+
+        not_archive = client.post(
+            "/import-file/submissions/archive",
+            files={"file": ("scripts.zip", b"not a zip", "application/zip")},
+        )
+        assert not_archive.status_code == 400
+
+
+def test_filename_pattern_is_validated():
+    archive = _zip({"s-ada@example.edu.txt": b"Answer"})
+    with TestClient(create_app()) as client:
+        course_id = _seed(client)
+
+        def upload(pattern: str):
+            return client.post(
+                "/import-file/submissions/archive",
+                params={"course_id": course_id, "filename_pattern": pattern},
+                files={"file": ("scripts.zip", archive, "application/zip")},
+            )
+
+        assert upload("s-{student_email}.txt").json()["created"] == 1
+        for pattern, reason in [
+            ("{student_email}{student_id}.txt", "separated"),
+            ("{student_email}-{student_email}.txt", "only once"),
+            ("{name}.txt", "only placeholders"),
+            ("*.txt", "must contain"),
+            ("x" * 201, "longer than"),
+        ]:
+            response = upload(pattern)
+            assert response.status_code == 400 and reason in response.json()["detail"], pattern
+
+
+def test_filename_pattern_templates():
+    assert compile_filename_pattern(None).fullmatch("Ada@Example.edu.pdf").group("email") == "Ada@Example.edu"
+    by_id = compile_filename_pattern("{student_id}_*.pdf")
+    assert by_id.fullmatch("42_quiz_1.pdf").group("student_id") == "42"
+    assert by_id.fullmatch("42_quiz_1.txt") is None
+    # Placeholders never backtrack into each other, so a hostile name fails in linear time.
+    assert compile_filename_pattern("{student_id}-*-*-*-*.txt").fullmatch("1" + "-" * 254) is None
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+from service_common.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+from app.main import create_app
+from app.metrics import BREAKER_METRICS
+from app.services import detector_service
+from app.services.detector_service import DetectorService
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_breaker_opens_fails_fast_and_probes_once_when_half_open():
+    clock = _Clock()
+    breaker = CircuitBreaker(
+        "test", BREAKER_METRICS, failure_rate=0.5, minimum_calls=4, window=10, reset_seconds=30, clock=clock
+    )
+
+    for outcome in (True, False, False):
+        assert breaker.allow()
+        breaker.record_success() if outcome else breaker.record_failure()
+    assert breaker.state == CLOSED  # below minimum_calls
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+
+    clock.now = 31
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+    assert not breaker.allow()  # only one probe in flight
+    breaker.record_failure()
+    assert breaker.state == OPEN
+
+    clock.now = 62
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.snapshot() == {"state": CLOSED, "recent_calls": 0, "recent_failures": 0}
+
+
+def test_open_pipeline_breaker_skips_remote_call(monkeypatch):
+    service = DetectorService(pipeline_url="http://pipeline.invalid")
+    service._local_enabled = False
+    calls = []
+    monkeypatch.setattr(detector_service.httpx, "Client", lambda **kwargs: calls.append(kwargs))
+    for _ in range(service.pipeline_breaker.minimum_calls):
+        service.pipeline_breaker.record_failure()
+
+    result = service.predict("An answer that would normally be sent to the pipeline.")
+
+    assert calls == []
+    assert result["label"] in {"ai", "human"}
+
+
+def test_spent_budget_falls_through_to_heuristic(monkeypatch):
+    service = DetectorService(pipeline_url="http://pipeline.invalid")
+    service.answer_budget = 0
+    monkeypatch.setattr(
+        service, "_heuristic_predict", lambda text: {"prob_ai": 0.1, "label": "human", "metrics": {}}
+    )
+
+    assert service.predict("Some answer text.")["prob_ai"] == 0.1
+    assert service.pipeline_breaker.snapshot()["recent_calls"] == 0
+
+
+def test_health_reports_breaker_state():
+    client = TestClient(create_app())
+    body = client.get("/healthz").json()
+    assert body["status"] == "ok"
+    assert set(body["breakers"]) == {"ai_pipeline", "ollama"}
+
+    for _ in range(detector_service.detector.ollama_breaker.minimum_calls):
+        detector_service.detector.ollama_breaker.record_failure()
+    body = client.get("/healthz").json()
+    assert body["status"] == "degraded"
+    assert body["breakers"]["ollama"]["state"] == OPEN
+    assert 'circuit_breaker_state{breaker="ollama"} 2.0' in client.get("/metrics").text
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+
+import httpx
+
+from app.services import detector_service
+from app.services.detector_service import DetectorService
+from coherence import parse_score
+
+
+def _ndjson(chunks: list[str], sent: list[str]):
+    for chunk in chunks:
+        sent.append(chunk)
+        yield (json.dumps({"response": chunk, "done": False}) + "\n").encode()
+    yield (json.dumps({"response": "", "done": True}) + "\n").encode()
+
+
+def _client_factory(handler):
+    client_cls = httpx.Client  # patched below on the shared httpx module
+    return lambda **kwargs: client_cls(transport=httpx.MockTransport(handler), **kwargs)
+
+
+def test_streamed_coherence_stops_at_the_first_complete_score(monkeypatch):
+    requests, sent = [], []
+    chunks = ["Coherence", " score:", " 0.", "73", ".", *([" The", " answer", " is", " clear."] * 25)]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(json.loads(request.content))
+        return httpx.Response(200, content=_ndjson(chunks, sent))
+
+    monkeypatch.setattr(detector_service.httpx, "Client", _client_factory(handler))
+    service = DetectorService(pipeline_url="")
+
+    assert service._coherence_score("A short answer.", time.monotonic() + 10) == 0.73
+    assert requests[0]["stream"] is True
+    assert requests[0]["options"]["num_predict"] > 0
+    # "0." and "0.73." could still grow; the stream is read one chunk past the score, not to the end.
+    assert sent == chunks[:6]
+
+
+
+def test_ratio_replies_are_read_as_ratios():
+    assert parse_score("8/10") == 0.8
+    assert parse_score("Score: 0.8/1") == 0.8
+    assert parse_score("7 out of 10") == 0.7
+    assert parse_score("Coherence: 3 / 4.") == 0.75
+    assert parse_score("12/10, so 0.4") == 0.4
+    assert parse_score("8/0") is None
+    # Until the reply says otherwise, "7 " may still become "7 out of 10".
+    assert parse_score("7 ", final=False) is None
+    assert parse_score("7 out of", final=False) is None
+    assert parse_score("8/1", final=False) is None
+    assert parse_score("7 out of 10 because", final=False) == 0.7
+
+def test_unparsable_or_failed_coherence_is_neutral(monkeypatch):
+    monkeypatch.setattr(
+        detector_service.httpx,
+        "Client",
+        _client_factory(lambda request: httpx.Response(200, content=_ndjson(["I", " cannot", " say."], []))),
+    )
+    service = DetectorService(pipeline_url="")
+    assert service._coherence_score("A short answer.", time.monotonic() + 10) == 0.5
+
+    monkeypatch.setattr(
+        detector_service.httpx, "Client", _client_factory(lambda request: httpx.Response(503, json={}))
+    )
+    assert service._coherence_score("A short answer.", time.monotonic() + 10) == 0.5
+    assert service.ollama_breaker.snapshot()["recent_failures"] == 1
+
+
+def test_predict_many_scores_imports_through_the_batch_endpoint(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        answers = json.loads(request.content)["answers"]
+        calls.append((request.url.path, len(answers)))
+        results = [{"ai_probability": 0.8, "model_version": "v9"} for _ in answers]
+        return httpx.Response(200, json={"results": results})
+
+    monkeypatch.setattr(detector_service.httpx, "Client", _client_factory(handler))
+    service = DetectorService(pipeline_url="http://pipeline.test")
+    service.pipeline_batch_size = 2
+
+    results = service.predict_many(["first answer", "", "second answer", "third answer"])
+
+    assert calls == [("/analyze/batch", 2), ("/analyze/batch", 1)]
+    assert [result["model_version"] for result in results] == ["v9", "heuristic", "v9", "v9"]
+
+
+def test_batched_coherence_rescores_items_the_batch_reply_missed():
+    from coherence import request_scores
+
+    prompts = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        prompts.append(payload)
+        if "format" in payload and "scores" in payload["format"]["properties"]:
+            return httpx.Response(200, json={"response": '{"scores": [0.2, "n/a", 0.9]}'})
+        return httpx.Response(200, content=_ndjson(["Score:", " 0.4", " overall"], []))
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    assert request_scores(client, "http://ollama.test", "llama3", ["one", "two", "three"]) == [0.2, 0.4, 0.9]
+    assert len(prompts) == 2 and "Answer 3: three" in prompts[0]["prompt"]
+
+
+def test_failed_batch_falls_back_to_single_answer_requests():
+    from coherence import arequest_scores, request_scores
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if "Answer 1:" in json.loads(request.content)["prompt"]:
+            return httpx.Response(500)
+        return httpx.Response(200, content=b"".join(_ndjson(["Score:", " 0.4"], [])))
+
+    client = httpx.Client(transport=httpx.MockTransport(handler))
+    assert request_scores(client, "http://ollama.test", "llama3", ["one", "two"]) == [0.4, 0.4]
+
+    async def timeout_handler(request: httpx.Request) -> httpx.Response:
+        if "Answer 1:" in json.loads(request.content)["prompt"]:
+            raise httpx.ReadTimeout("batch timed out", request=request)
+        return handler(request)
+
+    async def score() -> list[float | None]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(timeout_handler)) as client:
+            return await arequest_scores(client, "http://ollama.test", "llama3", ["one", "two"])
+
+    assert asyncio.run(score()) == [0.4, 0.4]
+
+
+def test_async_batches_are_sent_at_most_concurrency_at_a_time():
+    from coherence import arequest_scores
+
+    in_flight, peak = 0, 0
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        count = json.loads(request.content)["prompt"].count("Answer ")
+        return httpx.Response(200, json={"response": json.dumps({"scores": [0.5] * count})})
+
+    async def score() -> list[float | None]:
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            return await arequest_scores(client, "http://ollama.test", "llama3", [f"text {i}" for i in range(40)], 3)
+
+    assert asyncio.run(score()) == [0.5] * 40
+    assert peak == 3
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.hashing import answer_hash
+from app.main import create_app
+from app.routers import imports
+
+
+def _seed(client: TestClient) -> int:
+    course_id = client.post("/courses/import", json=[{"name": "Compilers"}]).json()[0]["id"]
+    client.post("/students/import", json=[{"name": "Ada", "email": "ada@example.edu"}])
+    return course_id
+
+
+def test_answer_hash_ignores_case_and_whitespace():
+    assert answer_hash("  Lexers  split\ninput ") == answer_hash("lexers split input")
+    assert answer_hash("lexers") != answer_hash("parsers")
+
+
+def test_reimported_csv_is_deduplicated():
+    answers = (
+        "student_email,topic,answer_text\n"
+        "ada@example.edu,Parsing,LL parsers read left to right\n"
+        "ada@example.edu,Parsing,ll parsers  read left to right\n"
+    )
+    with TestClient(create_app()) as client:
+        course_id = _seed(client)
+        upload = {"file": ("answers.csv", answers, "text/csv")}
+        first = client.post("/import-file/submissions", params={"course_id": course_id}, files=upload)
+        assert first.status_code == 200
+        assert first.headers["X-Deduplicated-Count"] == "1"
+        assert first.headers["X-Upload-Previously-Imported"] == "false"
+        assert first.json()[0]["id"] == first.json()[1]["id"]
+
+        second = client.post("/import-file/submissions", params={"course_id": course_id}, files=upload)
+        assert second.headers["X-Deduplicated-Count"] == "2"
+        assert second.headers["X-Upload-Previously-Imported"] == "true"
+        assert len(client.get("/submissions").json()) == 1
+
+
+def test_rejected_upload_is_not_remembered():
+    answers = "student_email,topic,answer_text\ngrace@example.edu,Parsing,Shift-reduce parsers\n"
+    with TestClient(create_app()) as client:
+        course_id = _seed(client)
+        upload = {"file": ("answers.csv", answers, "text/csv")}
+        rejected = client.post("/import-file/submissions", params={"course_id": course_id}, files=upload)
+        assert rejected.status_code == 400
+
+        client.post("/students/import", json=[{"name": "Grace", "email": "grace@example.edu"}])
+        accepted = client.post("/import-file/submissions", params={"course_id": course_id}, files=upload)
+        assert accepted.status_code == 200
+        assert accepted.headers["X-Upload-Previously-Imported"] == "false"
+
+
+def test_json_reimport_updates_grades_without_rescoring():
+    with TestClient(create_app()) as client:
+        course_id = _seed(client)
+        payload = {"student_email": "ada@example.edu", "course_id": course_id, "answer_text": "Register allocation"}
+        first = client.post("/submissions/import", json=[payload]).json()[0]
+        response = client.post("/submissions/import", json=[{**payload, "final_score": 88}])
+        assert response.headers["X-Deduplicated-Count"] == "1"
+        row = response.json()[0]
+        assert (row["id"], row["final_score"], row["ai_probability"]) == (first["id"], 88, first["ai_probability"])
+        assert row["student_email"] == "ada@example.edu"
+
+
+def test_repeated_pdf_skips_extraction(make_pdf, monkeypatch):
+    pdf = make_pdf(["Code generation answer"])
+    with TestClient(create_app()) as client:
+        course_id = _seed(client)
+        params = {"course_id": course_id, "student_email": "ada@example.edu"}
+        first = client.post("/import-file/submissions", params=params, files={"file": ("a.pdf", pdf)})
+        assert first.status_code == 200
+
+        async def fail(*_args, **_kwargs):
+            raise AssertionError("duplicate PDF should not be extracted")
+
+        monkeypatch.setattr(imports, "extract_pdf_text_async", fail)
+        second = client.post("/import-file/submissions", params=params, files={"file": ("a-copy.pdf", pdf)})
+        assert second.status_code == 200
+        assert second.headers["X-Deduplicated-Count"] == "1"
+        assert second.json()[0]["id"] == first.json()[0]["id"]
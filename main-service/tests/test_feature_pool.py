@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+import time
+
+import pytest
+
+from app import pipeline_path  # noqa: F401 - the feature pool is one of ai-pipeline's modules
+import feature_pool
+from detectors.ngram_lm import load_model
+from preprocess import clean_text
+from runtime import load_backend
+
+TEXTS = [
+    "word",
+    "The mitochondria is the powerhouse of the cell and produces ATP through respiration.",
+    " ".join(f"token{i % 37} filler words repeat" for i in range(300)),
+]
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Spawned workers inherit the environment; the plain-Python backend starts in a fraction of torch's time.
+    monkeypatch.setenv("INFERENCE_BACKEND", "python")
+    monkeypatch.setattr(feature_pool, "FEATURE_WORKERS", 2)
+    feature_pool.shutdown_executor()
+    feature_pool.warm_up()
+    yield feature_pool.get_executor()
+    feature_pool.shutdown_executor()
+
+
+def _features(texts: list[str], backend, language_model) -> list[dict[str, float]]:
+    async def run() -> list[dict[str, float]]:
+        built = await asyncio.gather(
+            *(feature_pool.features(clean_text(text), backend, language_model) for text in texts)
+        )
+        return [details for details, _ in built]
+
+    return asyncio.run(run())
+
+
+def test_pool_and_inline_features_are_identical(pool, monkeypatch):
+    backend, language_model = load_backend(), load_model()
+    pooled = _features(TEXTS, backend, language_model)
+
+    monkeypatch.setattr(feature_pool, "FEATURE_WORKERS", 0)
+    feature_pool.shutdown_executor()
+    assert _features(TEXTS, backend, language_model) == pooled
+
+
+def test_a_killed_worker_falls_back_inline_and_restarts_the_pool(pool):
+    backend, language_model = load_backend(), load_model()
+    expected = []
+    for text in TEXTS:
+        processed = clean_text(text)
+        expected.append(feature_pool.text_features(processed.cleaned, processed.token_count, backend, language_model)[0])
+
+    victim = next(iter(pool._processes.values()))
+    os.kill(victim.pid, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while not pool._broken and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert _features(TEXTS, backend, language_model) == expected
+    replacement = feature_pool.get_executor()
+    assert replacement is not pool
+    assert _features(TEXTS[:1], backend, language_model) == expected[:1]
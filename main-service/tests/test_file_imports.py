@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import io
+
+from fastapi.testclient import TestClient
+from openpyxl import Workbook
+
+from app.main import create_app
+from app.routers import imports
+from app.services import file_ingestion
+
+
+def _xlsx(rows: list[list]) -> bytes:
+    workbook = Workbook()
+    sheet = workbook.active
+    for row in rows:
+        sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def test_iter_rows_streams_csv_without_closing_source():
+    source = io.BytesIO(b"name,email\nAda,ada@example.edu\nBob,bob@example.edu\n")
+    rows = file_ingestion.iter_rows(source, "roster.csv")
+    assert next(rows) == {"name": "Ada", "email": "ada@example.edu"}
+    assert [row["name"] for row in rows] == ["Bob"]
+    assert not source.closed
+
+
+def test_tabular_uploads_are_written_in_chunks(monkeypatch):
+    monkeypatch.setattr(imports, "chunked", lambda items: file_ingestion.chunked(items, 2))
+    roster = "name,email\n" + "".join(f"Student {i},s{i}@example.edu\n" for i in range(5))
+    courses = _xlsx([["name", "section_number", "description"], ["Networks", 1, "Sockets"], ["Databases", 2, None]])
+
+    with TestClient(create_app()) as client:
+        students_resp = client.post("/import-file/students", files={"file": ("roster.csv", roster, "text/csv")})
+        assert students_resp.status_code == 200
+        assert [row["email"] for row in students_resp.json()] == [f"s{i}@example.edu" for i in range(5)]
+
+        courses_resp = client.post("/import-file/courses", files={"file": ("courses.xlsx", courses)})
+        assert courses_resp.status_code == 200
+        assert [row["name"] for row in courses_resp.json()] == ["Networks", "Databases"]
+        course_id = courses_resp.json()[0]["id"]
+
+        answers = "student_email,topic,answer_text\n" + "".join(
+            f"s{i}@example.edu,Routing,Answer number {i} about routing tables\n" for i in range(5)
+        )
+        submissions_resp = client.post(
+            "/import-file/submissions",
+            params={"course_id": course_id},
+            files={"file": ("answers.csv", answers, "text/csv")},
+        )
+        assert submissions_resp.status_code == 200
+        assert len(submissions_resp.json()) == 5
+        assert len(client.get("/submissions").json()) == 5
+
+        unknown = client.post(
+            "/import-file/submissions",
+            params={"course_id": course_id},
+            files={"file": ("answers.csv", "student_email,answer_text\nghost@example.edu,hi\n", "text/csv")},
+        )
+        assert unknown.status_code == 400
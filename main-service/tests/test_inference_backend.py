@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import os
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from app.services.detector_service import DetectorService, load_local_pipeline
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+TEXTS = [
+    "word",
+    "The mitochondria is the powerhouse of the cell and produces ATP through respiration.",
+    " ".join(f"token{i % 37} filler words repeat" for i in range(300)),
+]
+
+
+def test_python_backend_matches_torch_backend():
+    pytest.importorskip("torch")
+    torch_backend = load_local_pipeline("torch").backend
+    python_backend = load_local_pipeline("python").backend
+
+    for text in TEXTS:
+        tokens = text.lower().split(" ")
+        expected = torch_backend.cross_perplexity(tokens)
+        assert python_backend.cross_perplexity(tokens) == pytest.approx(expected, abs=1e-6)
+        random.seed(5)
+        expected = torch_backend.tocsin_score(tokens)
+        random.seed(5)
+        assert python_backend.tocsin_score(tokens) == pytest.approx(expected, abs=1e-6)
+
+    torch_blender = torch_backend.blender_cls.load(Path("/nonexistent.json"))
+    python_blender = python_backend.blender_cls.load(Path("/nonexistent.json"))
+    for values in ([0.5, 0.2, 0.1, 0.05, 0.4], [0.0, 1.0, 1.0, 0.9, 0.5], [-3.0, 2.5, 0.0, 4.0, 1.0]):
+        assert python_blender.predict(python_backend.as_features(values)) == pytest.approx(
+            torch_blender.predict(torch_backend.as_features(values)), abs=1e-6
+        )
+
+
+def test_detector_scores_the_same_with_either_backend(monkeypatch):
+    pytest.importorskip("torch")
+    scores = {}
+    for backend in ("torch", "python"):
+        service = DetectorService(pipeline_url="", backend=backend)
+        monkeypatch.setattr(service, "_coherence_score", lambda text, deadline: 0.7)
+        random.seed(9)
+        scores[backend] = service._local_predict(TEXTS[1], deadline=float("inf"))["prob_ai"]
+    assert scores["python"] == pytest.approx(scores["torch"], abs=1e-6)
+
+
+def test_python_backend_scores_without_importing_torch():
+    code = (
+        "import sys; from app.services.detector_service import DetectorService; "
+        "service = DetectorService(pipeline_url=''); "
+        "result = service._local_predict('a short answer', deadline=float('inf')); "
+        "print(result is not None, 'torch' in sys.modules)"
+    )
+    env = {**os.environ, "INFERENCE_BACKEND": "python", "OLLAMA_HOST": "http://127.0.0.1:1"}
+    result = subprocess.run([sys.executable, "-c", code], cwd=SERVICE_DIR, env=env, capture_output=True, text=True)
+    assert result.stdout.split() == ["True", "False"], result.stderr
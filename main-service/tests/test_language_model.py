@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+from sqlmodel import Session
+
+from app import crud, language_model
+from app.database import engine
+from app.models import Course, QuizSubmission, Student, TextBlob
+
+
+def test_ngram_model_prefers_text_like_its_corpus(tmp_path):
+    from detectors.ngram_lm import NEUTRAL, NgramModel, build, perplexity_feature
+
+    corpus = ["normalization removes redundancy from the relational schema"] * 20
+    build(corpus, tmp_path / "lm.bin", bucket_bits=12)
+    model = NgramModel.load(tmp_path / "lm.bin")
+    assert (model.answers, model.tokens) == (20, 140)
+
+    seen = "normalization removes redundancy from the relational schema".split()
+    unseen = "quantum zebras juggle purple saxophones".split()
+    assert model.perplexity(seen) < model.perplexity(unseen)
+    assert 0.0 <= model.perplexity_feature(seen) < model.perplexity_feature(unseen) <= 1.0
+    assert perplexity_feature(None, seen) == NEUTRAL
+
+
+def test_build_command_counts_only_unflagged_answers(tmp_path, monkeypatch):
+    from detectors.ngram_lm import NgramModel
+
+    with Session(engine) as session:
+        student, course = Student(name="Ada", email="ada@example.com"), Course(name="Databases")
+        human, generated = (TextBlob(content_hash=text, size=len(text), content=text) for text in ["a b", "c d"])
+        session.add_all([student, course, human, generated])
+        session.flush()
+        for blob, flagged in [(human, False), (human, False), (generated, True)]:
+            session.add(
+                QuizSubmission(
+                    student_id=student.id, course_id=course.id, answer_blob_hash=blob.content_hash, flagged=flagged
+                )
+            )
+        session.commit()
+        assert list(crud.human_answer_texts(session, batch_size=1)) == ["a b"]
+
+    monkeypatch.delenv("NGRAM_MODEL_PATH", raising=False)
+    monkeypatch.setattr(language_model, "MODEL_DIR", tmp_path)
+    assert language_model.main([]) == 0
+    model = NgramModel.load(tmp_path / "ngram-lm.bin")
+    assert (model.answers, model.tokens) == (1, 2)
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+
+
+def test_metrics_endpoint_reports_routes_stages_and_detector_sources():
+    with TestClient(create_app()) as client:
+        course_id = client.post("/courses/import", json=[{"name": "Distributed Systems"}]).json()[0]["id"]
+        client.post("/students/import", json=[{"name": "Ada", "email": "ada@example.edu"}])
+        client.post(
+            "/submissions/import",
+            json=[{"student_email": "ada@example.edu", "course_id": course_id, "answer_text": "Raft elects a leader"}],
+        )
+        client.get("/no-such-route")
+
+        response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_count{method="POST",route="/submissions/import",status="200"}' in body
+    assert 'route="unmatched",status="404"' in body
+    assert 'stage_duration_seconds_count{stage="crud.create_submissions"}' in body
+    assert 'stage_duration_seconds_count{stage="db.commit"}' in body
+    assert "detector_predictions_total{source=" in body
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from app.hashing import answer_hash
+from app.migrations import MIGRATIONS, MigrationError, explain_analytics_queries, pending_migrations, run_migrations
+from app.models import QuizSubmission, TextBlob
+
+DECLARED_INDEXES = {
+    "ux_user_email",
+    "ux_student_email",
+    "ux_course_name_section",
+    "ux_coursetopic_title_category_course",
+    "ix_quizsubmission_student_submitted",
+    "ix_quizsubmission_course_id",
+    "ix_quizsubmission_topic_id",
+    "ix_quizsubmission_submitted_at",
+    "ix_quizsubmission_flagged",
+    "ix_quizsubmission_student_answer_hash",
+    "ix_quizsubmission_source_hash",
+}
+
+
+def _legacy_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{(tmp_path / 'legacy.db').as_posix()}")
+    SQLModel.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for name in DECLARED_INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("DROP TABLE schemamigration"))
+    return engine
+
+
+def _index_names(engine) -> set[str]:
+    inspector = inspect(engine)
+    return {index["name"] for table in inspector.get_table_names() for index in inspector.get_indexes(table)}
+
+
+def test_migrations_upgrade_legacy_database_in_place(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO student (name, email) VALUES ('Ada', 'ada@example.edu')"))
+    assert not DECLARED_INDEXES & _index_names(engine)
+
+    applied = run_migrations(engine)
+
+    assert [item.version for item in applied] == [item.version for item in MIGRATIONS]
+    assert DECLARED_INDEXES <= _index_names(engine)
+    assert pending_migrations(engine) == []
+    assert run_migrations(engine) == []
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT COUNT(*) FROM student")).scalar_one() == 1
+
+
+def test_unique_migration_refuses_duplicate_rows(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO student (name, email) VALUES ('A', 'dup@example.edu'), ('B', 'dup@example.edu')"))
+
+    with pytest.raises(MigrationError, match="student"):
+        run_migrations(engine)
+    assert [item.version for item in pending_migrations(engine)][0] == 2
+
+
+def test_explain_reports_index_usage_for_analytics_queries(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    run_migrations(engine)
+
+    plans = {plan.name: plan for plan in explain_analytics_queries(engine)}
+
+    assert {"analytics_by_topic", "student_risks", "latest_final_score"} <= set(plans)
+    assert plans["latest_final_score"].uses_index
+    assert plans["course_summary_total"].uses_index
+    assert all(plan.plan for plan in plans.values())
+
+
+def test_text_migrations_backfill_hashes_and_move_text_to_blobs(tmp_path):
+    engine = _legacy_engine(tmp_path)
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE quizsubmission ADD COLUMN answer_text TEXT NOT NULL DEFAULT ''"))
+        conn.execute(text("ALTER TABLE quizsubmission ADD COLUMN ocr_text TEXT"))
+        conn.execute(text("INSERT INTO student (id, name, email) VALUES (1, 'Ada', 'ada@example.edu')"))
+        conn.execute(text("INSERT INTO course (id, name) VALUES (1, 'Compilers')"))
+        conn.execute(
+            text(
+                "INSERT INTO quizsubmission "
+                "(student_id, course_id, answer_text, ocr_text, ai_probability, flagged, submitted_at) "
+                "VALUES (1, 1, 'Lexing  First', 'Lexing  First', 0.1, 0, '2025-01-01'), "
+                "(1, 1, 'Parsing second', NULL, 0.1, 0, '2025-01-02')"
+            )
+        )
+
+    run_migrations(engine)
+
+    assert "answer_text" not in {column["name"] for column in inspect(engine).get_columns("quizsubmission")}
+    with Session(engine) as session:
+        first, second = session.exec(select(QuizSubmission).order_by(QuizSubmission.id)).all()
+        assert first.answer_hash == answer_hash("lexing first")
+        assert (first.answer_text, first.ocr_text) == ("Lexing  First", "Lexing  First")
+        assert (second.answer_text, second.ocr_text) == ("Parsing second", None)
+        assert len(session.exec(select(TextBlob)).all()) == 2
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import create_app
+from app.services.detector_service import DetectorService, load_local_pipeline
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return load_local_pipeline("python").ModelRegistry(tmp_path)
+
+
+def test_publish_writes_immutable_versions_and_switches_current(registry):
+    assert registry.current_version() == "default"
+    first = registry.publish({"weights": [1.0, 0.0, 0.0, 0.0], "bias": 0.0})
+    second = registry.publish({"weights": [0.0, 1.0, 0.0, 0.0], "bias": 0.0})
+
+    assert registry.versions() == sorted([first, second])
+    assert registry.current_version() == second
+    registry.activate(first)
+    assert registry.current_version() == first
+    assert registry.load(second)["weights"] == [0.0, 1.0, 0.0, 0.0]
+    with pytest.raises(ValueError):
+        registry.activate("does-not-exist")
+
+
+def test_detector_hot_swaps_to_the_current_version(registry, monkeypatch):
+    service = DetectorService(model_dir=registry.root, pipeline_url="", backend="python")
+    service.model_reload_seconds = 0
+    monkeypatch.setattr(service, "_coherence_score", lambda text, deadline: 0.5)
+
+    before = service._local_predict("an answer to score", deadline=float("inf"))
+    version = registry.publish({"weights": [4.0, 4.0, 4.0, 4.0], "bias": 2.0})
+    after = service._local_predict("an answer to score", deadline=float("inf"))
+
+    assert before["model_version"] == "default"
+    assert after["model_version"] == version
+    assert after["prob_ai"] > before["prob_ai"]
+
+
+def test_detect_endpoint_reports_model_version():
+    client = TestClient(create_app())
+    body = client.post("/api/detect", json={"text": "A short answer about photosynthesis."}).json()
+    assert body["model_version"]
+
+
+def test_versions_are_served_with_the_language_model_they_were_trained_with(registry, monkeypatch):
+    from detectors.ngram_lm import NEUTRAL, build, default_path, load_model
+    from model_registry import LANGUAGE_MODEL_KEY, ModelHandle
+
+    monkeypatch.delenv("NGRAM_MODEL_PATH", raising=False)
+    built = default_path(registry.root)
+    build(["normalization removes redundancy from the relational schema"] * 20, built, bucket_bits=12)
+    digest = registry.add_language_model(built)
+    assert registry.add_language_model(built) == digest
+    pinned = registry.publish({"weights": [1.0] * 5, "bias": 0.0, LANGUAGE_MODEL_KEY: digest})
+
+    def handle() -> ModelHandle:
+        return ModelHandle(registry, dict, check_seconds=0, load_language_model=lambda path: load_model(path or built))
+
+    served = handle()
+    assert served.get().language_model.path == registry.language_model_path(digest)
+    # Rebuilding the LM beside the registry does not change what the published version scores with.
+    build(["quantum zebras juggle purple saxophones"] * 20, built, bucket_bits=12)
+    assert served.refresh().language_model.path == registry.language_model_path(digest)
+
+    unpinned = registry.publish({"weights": [1.0] * 5, "bias": 0.0, LANGUAGE_MODEL_KEY: None})
+    assert served.get().version == unpinned and served.get().language_model is None
+    registry.activate("default")  # published before LMs were pinned: the one beside the registry
+    assert served.get().language_model.path == built
+
+    # A version whose LM is missing is refused: a running handle keeps its model, a new one fails.
+    registry.activate(pinned)
+    registry.language_model_path(digest).unlink()
+    assert served.get().version == "default"
+    with pytest.raises(FileNotFoundError):
+        handle().get()
+
+    service = DetectorService(model_dir=registry.root, pipeline_url="", backend="python")
+    monkeypatch.setattr(service, "_coherence_score", lambda text, deadline: 0.5)
+    registry.activate(unpinned)
+    assert service._local_predict("an answer to score", deadline=float("inf"))["metrics"]["lm_perplexity"] == NEUTRAL
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import create_app
+from app.metrics import PDF_EXTRACTION_SECONDS
+from app.services import pdf_extraction
+from app.services.pdf_extraction import (
+    PdfExtractionError,
+    extract_pdf_file_async,
+    extract_pdf_text_async,
+    page_ranges,
+    shutdown_executor,
+    spool_to_disk,
+)
+
+
+# Page-range stand-ins; module level so the (forked) worker processes can unpickle them.
+def _failing_range(path, start, stop):
+    raise RuntimeError("pdfplumber could not parse page")
+
+
+def _slow_range(path, start, stop):
+    time.sleep(2)
+    return [f"slow {start}"]
+
+
+def _crashing_range(path, start, stop):
+    os._exit(1)
+
+
+@pytest.fixture
+def pdf_settings(monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "pdf_pages_per_task", 2)
+    monkeypatch.setattr(settings, "pdf_workers", 2)
+    yield settings
+    shutdown_executor()
+
+
+def test_page_ranges_cover_document_in_order():
+    assert page_ranges(5, 2) == [(0, 2), (2, 4), (4, 5)]
+    assert page_ranges(0, 16) == []
+
+
+def test_large_pdf_is_extracted_in_parallel_ranges_and_reassembled(make_pdf, pdf_settings):
+    pdf = make_pdf([f"Answer page {index}" for index in range(7)])
+    before = PDF_EXTRACTION_SECONDS.labels(outcome="ok")._sum.get()
+
+    text = asyncio.run(extract_pdf_text_async(pdf))
+
+    assert text.splitlines() == [f"Answer page {index}" for index in range(7)]
+    assert PDF_EXTRACTION_SECONDS.labels(outcome="ok")._sum.get() > before
+
+
+def test_page_budget_and_unreadable_input(make_pdf, pdf_settings, monkeypatch):
+    monkeypatch.setattr(pdf_settings, "pdf_max_pages", 3)
+    text = asyncio.run(extract_pdf_text_async(make_pdf([f"page {index}" for index in range(6)])))
+    assert text.splitlines() == ["page 0", "page 1", "page 2"]
+
+    with pytest.raises(PdfExtractionError):
+        asyncio.run(extract_pdf_text_async(b"not a pdf"))
+
+
+def test_page_failures_and_broken_pools_become_extraction_errors(make_pdf, pdf_settings, monkeypatch):
+    pdf = make_pdf(["one", "two", "three"])
+    monkeypatch.setattr(pdf_extraction, "_extract_page_range", _failing_range)
+    with pytest.raises(PdfExtractionError, match="Could not extract"):
+        asyncio.run(extract_pdf_text_async(pdf))
+
+    monkeypatch.setattr(pdf_extraction, "_extract_page_range", _crashing_range)
+    with pytest.raises(PdfExtractionError, match="failed"):
+        asyncio.run(extract_pdf_text_async(pdf))
+
+
+def test_timeout_moves_to_a_new_pool_without_breaking_other_extractions(make_pdf, pdf_settings, monkeypatch):
+    monkeypatch.setattr(pdf_settings, "pdf_time_budget_seconds", 0.5)
+    monkeypatch.setattr(pdf_extraction, "_extract_page_range", _slow_range)
+    executor = pdf_extraction.get_executor()
+
+    async def run() -> list[str]:
+        path = await asyncio.to_thread(spool_to_disk, make_pdf(["one", "two", "three"]))
+        # Another request's range, already running on the shared pool.
+        other = asyncio.get_running_loop().run_in_executor(executor, _slow_range, path, 0, 1)
+        try:
+            with pytest.raises(PdfExtractionError, match="time budget"):
+                await extract_pdf_file_async(path)
+            return await other
+        finally:
+            os.unlink(path)
+
+    assert asyncio.run(run()) == ["slow 0"]
+    assert pdf_extraction.get_executor() is not executor
+
+
+def test_pdf_upload_creates_submission(make_pdf):
+    with TestClient(create_app()) as client:
+        course_id = client.post("/courses/import", json=[{"name": "Ethics"}]).json()[0]["id"]
+        client.post("/students/import", json=[{"name": "Ada", "email": "ada@example.edu"}])
+        response = client.post(
+            "/import-file/submissions",
+            params={"course_id": course_id, "student_email": "ada@example.edu"},
+            files={"file": ("script.pdf", make_pdf(["Page one", "Page two"]), "application/pdf")},
+        )
+        assert response.status_code == 200
+        assert response.json()[0]["answer_text"] == "Page one\nPage two"
+
+        bad = client.post(
+            "/import-file/submissions",
+            params={"course_id": course_id, "student_email": "ada@example.edu"},
+            files={"file": ("script.pdf", b"garbage", "application/pdf")},
+        )
+        assert bad.status_code == 400
@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import re
+
+import pytest
+
+from app.services.detector_service import DetectorService
+
+
+def test_clean_text_normalizes_only_the_kept_prefix():
+    from preprocess import clean_text
+
+    text = "  The  Normal\tForms\n" + "reduce REDUNDANCY " * 50
+    expected = re.sub(r"\s+", " ", text.lower()).strip().split(" ")[:20]
+    result = clean_text(text, max_tokens=20)
+    assert (result.cleaned, result.token_count) == (" ".join(expected), 20)
+    assert (result.total_tokens, result.total_exact) == (103, True)
+
+    estimated = clean_text(text, max_tokens=20, exact_count_chars=10)
+    assert not estimated.total_exact and 80 <= estimated.total_tokens <= 130
+    assert clean_text("short answer").total_tokens == 2
+
+
+def test_heuristic_ignores_text_past_the_token_limit():
+    detector = DetectorService(pipeline_url="")
+    prefix = " ".join(f"word{i % 50}" for i in range(900))
+    assert detector._heuristic_predict(prefix) == detector._heuristic_predict(prefix + " tail" * 100_000)
+
+
+def test_chunk_text_covers_long_answers_with_overlapping_windows():
+    from ensemble import aggregate
+    from preprocess import chunk_text, clean_text
+
+    text = " ".join(f"Word{i}" for i in range(2000))
+    chunks = chunk_text(text, window=900, overlap=150, max_chunks=8)
+    assert [(chunk.start, chunk.end) for chunk in chunks] == [(0, 900), (750, 1650), (1500, 2000)]
+    assert chunks[1].text.cleaned.split(" ")[0] == "word750"
+    assert [(chunk.start, chunk.end) for chunk in chunk_text(text, 900, 150, max_chunks=2)] == [(0, 900), (750, 1650)]
+    (short,) = chunk_text("Short  Answer.", 900, 150)
+    assert (short.text.cleaned, short.text.token_count) == ("short answer.", clean_text("Short  Answer.").token_count)
+
+    assert aggregate([0.2, 0.8], [900, 100], "max") == 0.8
+    assert aggregate([0.2, 0.8], [900, 100], "weighted") == pytest.approx(0.26)
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import json
+import pstats
+
+from fastapi.testclient import TestClient
+
+from app.config import get_settings
+from app.main import create_app
+
+
+def test_profiling_is_off_unless_enabled():
+    with TestClient(create_app()) as client:
+        response = client.get("/healthz", headers={"X-Profile": "1"})
+        assert "X-Profile-Id" not in response.headers
+        assert client.get("/debug/profiles").status_code == 404
+
+
+def test_token_protected_profile_is_saved_and_listed(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_token", "s3cret")
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profiling_interval_ms", 1)
+
+    with TestClient(create_app()) as client:
+        assert "X-Profile-Id" not in client.get("/analytics/topics", headers={"X-Profile": "guess"}).headers
+        response = client.get("/analytics/topics", headers={"X-Profile": "s3cret"})
+        profile_id = response.headers["X-Profile-Id"]
+
+        assert client.get("/debug/profiles").status_code == 404
+        listed = client.get("/debug/profiles", headers={"X-Profile": "s3cret"}).json()
+        assert [(item["id"], item["path"], item["status"]) for item in listed] == [(profile_id, "/analytics/topics", 200)]
+
+        collapsed = client.get(f"/debug/profiles/{profile_id}/collapsed", headers={"X-Profile": "s3cret"})
+        assert collapsed.status_code == 200
+        for line in collapsed.text.splitlines():
+            stack, count = line.rsplit(" ", 1)
+            assert stack and int(count) > 0
+
+    stats = pstats.Stats(str(tmp_path / f"{profile_id}.pstats"))
+    assert stats.total_calls > 0
+
+
+def test_without_a_token_only_sampling_profiles(tmp_path, monkeypatch):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_token", None)
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+
+    with TestClient(create_app()) as client:
+        assert "X-Profile-Id" not in client.get("/healthz", headers={"X-Profile": "1"}).headers
+        assert client.get("/debug/profiles", headers={"X-Profile": "1"}).status_code == 404
+
+    monkeypatch.setattr(settings, "profiling_sample_rate", 1.0)
+    with TestClient(create_app()) as client:
+        profile_id = client.get("/healthz").headers["X-Profile-Id"]
+
+    record = json.loads((tmp_path / f"{profile_id}.json").read_text())
+    assert record["overlapping_requests"] == 0
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+import logging
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlmodel import Session
+
+from app import crud
+from app.config import get_settings
+from app.database import engine
+from app.main import create_app
+from app.query_stats import track_queries
+from app.routers.submissions import _serialize
+from app.schemas import CourseCreate, StudentCreate, SubmissionCreate
+
+
+def _seed(students: int) -> None:
+    with Session(engine) as session:
+        course = crud.upsert_courses(session, [CourseCreate(name="Databases")])[0]
+        crud.upsert_students(session, [StudentCreate(name=f"S{i}", email=f"s{i}@example.edu") for i in range(students)])
+        rows = [
+            (SubmissionCreate(student_email=f"s{i}@example.edu", course_id=course.id, answer_text=f"Answer {i}"), 0.1)
+            for i in range(students)
+        ]
+        crud.create_submissions(session, rows)
+
+
+@pytest.mark.parametrize("students", [1, 25])
+def test_listing_submissions_uses_a_constant_number_of_queries(students, query_budget):
+    _seed(students)
+    with Session(engine) as session, query_budget(5) as stats:
+        serialized = [_serialize(submission) for submission in crud.list_submissions(session)]
+    assert len(serialized) == students
+    assert all(row.student_email and row.answer_text for row in serialized)
+    assert stats.count >= 1
+
+
+def test_debug_headers_and_slow_request_log(monkeypatch, caplog):
+    settings = get_settings()
+    monkeypatch.setattr(settings, "query_debug_headers", True)
+    monkeypatch.setattr(settings, "slow_request_query_count", 0)
+    with TestClient(create_app()) as client, caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        response = client.get("/students/")
+    assert int(response.headers["X-DB-Query-Count"]) >= 1
+    assert float(response.headers["X-DB-Query-Time-Ms"]) >= 0
+    assert any("GET /students" in record.getMessage() for record in caplog.records)
+
+
+def test_failed_statements_do_not_leak_timings_on_the_connection():
+    with engine.connect() as conn, track_queries() as stats:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM no_such_table"))
+        conn.execute(text("SELECT 1"))
+        assert conn.info["query_started"] == []
+    assert stats.count == 2
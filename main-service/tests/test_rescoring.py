@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+
+from sqlmodel import Session, select
+
+from app import crud
+from app.database import engine
+from app.models import QuizSubmission
+from app.schemas import CourseCreate, StudentCreate, SubmissionCreate
+from app.services.detector_service import BLANK_PROBABILITY
+from app.services.rescoring import COMPLETED, FAILED, Rescorer
+
+
+class FakeDetector:
+    def __init__(self, version: str, probability: float = 0.9) -> None:
+        self.version = version
+        self.probability = probability
+        self.scored: list[str] = []
+
+    def current_model_version(self) -> str:
+        return self.version
+
+    def predict(self, text: str) -> dict:
+        self.scored.append(text)
+        return {"prob_ai": self.probability, "label": "ai", "model_version": self.version}
+
+
+def _seed(versions: list[str | None]) -> None:
+    with Session(engine) as session:
+        course = crud.upsert_courses(session, [CourseCreate(name="Databases")])[0]
+        crud.upsert_students(session, [StudentCreate(name="Ada", email="ada@example.edu")])
+        rows = [
+            (SubmissionCreate(student_email="ada@example.edu", course_id=course.id, answer_text=f"Answer {i}"), 0.1)
+            for i in range(len(versions))
+        ]
+        crud.create_submissions(session, rows, model_versions=versions)
+
+
+def _stored() -> list[tuple[float, bool, str | None]]:
+    with Session(engine) as session:
+        rows = session.exec(select(QuizSubmission).order_by(QuizSubmission.id)).all()
+        return [(row.ai_probability, row.flagged, row.model_version) for row in rows]
+
+
+def test_rescoring_updates_only_stale_submissions():
+    _seed(["v1", None, "v2", "v1", "heuristic"])
+    detector = FakeDetector("v2")
+    rescorer = Rescorer(engine, detector, batch_size=2, concurrency=2)
+
+    job = asyncio.run(rescorer.run_pending())
+
+    assert job.status == COMPLETED
+    assert (job.total, job.processed, job.updated, job.failed) == (4, 4, 4, 0)
+    assert sorted(detector.scored) == ["Answer 0", "Answer 1", "Answer 3", "Answer 4"]
+    assert _stored() == [(0.9, True, "v2"), (0.9, True, "v2"), (0.1, False, "v2"), (0.9, True, "v2"), (0.9, True, "v2")]
+    assert rescorer.status().remaining == 0
+    # The pass is done; nothing runs again until the model changes.
+    assert asyncio.run(rescorer.run_pending()) is None
+
+
+def test_interrupted_pass_resumes_after_the_last_checkpoint():
+    _seed([None] * 4)
+    rescorer = Rescorer(engine, FakeDetector("v2"), batch_size=2)
+    job = rescorer.claim("v2")
+    # The model changes under the worker after the first batch: nothing in the second batch matches.
+    original = rescorer._score
+    calls = iter(range(100))
+    rescorer._score = lambda text, target: original(text, target) if next(calls) < 2 else (0.5, "v3")
+    asyncio.run(rescorer.run(job))
+    assert (job.status, job.processed, job.updated) == (FAILED, 2, 2)
+    assert "v3" in job.error
+
+    detector = FakeDetector("v2")
+    rescorer = Rescorer(engine, detector, batch_size=2)
+    job = asyncio.run(rescorer.run_pending())
+    assert (job.status, job.processed, job.updated) == (COMPLETED, 4, 4)
+    assert detector.scored == ["Answer 2", "Answer 3"]
+    assert [version for *_, version in _stored()] == ["v2"] * 4
+
+
+def test_blank_answers_are_restamped_without_asking_the_detector():
+    detector = FakeDetector("v2")
+    rescorer = Rescorer(engine, detector)
+    assert rescorer._score("  \n", "v2") == (BLANK_PROBABILITY, "v2")
+    assert detector.scored == []
+
+
+def test_a_running_pass_is_only_taken_over_once_its_lease_lapses():
+    _seed([None])
+    assert Rescorer(engine, FakeDetector("v2")).claim("v2") is not None
+    assert Rescorer(engine, FakeDetector("v2")).claim("v2") is None
+    assert Rescorer(engine, FakeDetector("v2"), lease_seconds=0).claim("v2") is not None
+
+
+def test_a_pass_keeps_database_work_off_the_event_loop(monkeypatch):
+    _seed([None] * 3)
+    rescorer = Rescorer(engine, FakeDetector("v2"), batch_size=2)
+    threads: list[int] = []
+
+    def on_thread(function):
+        def wrapper(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return function(*args, **kwargs)
+
+        return wrapper
+
+    monkeypatch.setattr(crud, "stale_submissions", on_thread(crud.stale_submissions))
+    monkeypatch.setattr(crud, "update_submission_scores", on_thread(crud.update_submission_scores))
+    monkeypatch.setattr(rescorer, "_checkpoint", on_thread(rescorer._checkpoint))
+    monkeypatch.setattr(rescorer, "claim", on_thread(rescorer.claim))
+
+    job = asyncio.run(rescorer.run_pending())
+
+    assert job.status == COMPLETED
+    assert len(threads) == 1 + 3 + 2 + 3  # claim; three batch reads, two updates, three checkpoints
+    assert threading.get_ident() not in threads
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import time
+
+from app.sessions import InMemorySessionBackend, RedisSessionBackend, SessionStore
+
+
+class _FakePipeline:
+    def __init__(self, client: "_FakeRedis") -> None:
+        self._client = client
+        self._ops: list[tuple[str, str]] = []
+
+    def get(self, key: str) -> None:
+        self._ops.append(("get", key))
+
+    def pttl(self, key: str) -> None:
+        self._ops.append(("pttl", key))
+
+    def execute(self) -> list:
+        return [getattr(self._client, op)(key) for op, key in self._ops]
+
+
+class _FakeRedis:
+    def __init__(self) -> None:
+        self.data: dict[str, tuple[str, float]] = {}
+        self.gets = 0
+
+    def set(self, key: str, value, ex: int) -> None:
+        self.data[key] = (str(value), time.monotonic() + ex)
+
+    def get(self, key: str):
+        self.gets += 1
+        entry = self.data.get(key)
+        return entry[0] if entry and entry[1] > time.monotonic() else None
+
+    def pttl(self, key: str) -> int:
+        entry = self.data.get(key)
+        return int((entry[1] - time.monotonic()) * 1000) if entry else -2
+
+    def delete(self, key: str) -> None:
+        self.data.pop(key, None)
+
+    def pipeline(self) -> _FakePipeline:
+        return _FakePipeline(self)
+
+
+def test_memory_backend_sweeps_expired_tokens_and_caps_size():
+    backend = InMemorySessionBackend(max_entries=3, sweep_interval_seconds=0)
+    backend.set("expired", 1, ttl_seconds=0)
+    assert len(backend) == 1
+    backend.set("a", 2, ttl_seconds=60)
+    backend.set("b", 3, ttl_seconds=60)
+    assert len(backend) == 2
+
+    backend.set("c", 4, ttl_seconds=60)
+    backend.set("d", 5, ttl_seconds=60)
+    assert len(backend) == 3
+    assert backend.get("a") is None
+    assert backend.get("d")[0] == 5
+
+
+def test_store_validates_and_revokes_tokens():
+    store = SessionStore(InMemorySessionBackend(), cache_seconds=0)
+    token = store.create(7)
+    assert store.validate(token) == 7
+    assert store.validate("unknown") is None
+    store.revoke(token)
+    assert store.validate(token) is None
+
+
+def test_redis_backend_is_shared_and_fronted_by_local_cache():
+    client = _FakeRedis()
+    worker_a = SessionStore(RedisSessionBackend(client=client), cache_seconds=30)
+    worker_b = SessionStore(RedisSessionBackend(client=client), cache_seconds=30)
+
+    token = worker_a.create(42, ttl_minutes=1)
+    assert worker_b.validate(token) == 42
+    assert worker_b.validate(token) == 42
+    assert client.gets == 1
+
+    worker_a.revoke(token)
+    assert worker_a.validate(token) is None
+    assert client.data == {}
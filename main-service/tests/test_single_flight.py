@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from prometheus_client import REGISTRY, Counter
+from service_common.single_flight import AsyncSingleFlight
+
+from app.services.detector_service import DetectorService
+
+
+def _coalesced() -> float:
+    labels = {"flight": "detector.predict", "outcome": "coalesced"}
+    return REGISTRY.get_sample_value("coalesced_calls_total", labels) or 0.0
+
+
+def test_concurrent_duplicate_answers_share_one_prediction(monkeypatch):
+    service = DetectorService(pipeline_url="")
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_predict(text: str) -> dict:
+        calls.append(text)
+        started.set()
+        release.wait(5)
+        return {"prob_ai": 0.7, "label": "ai", "metrics": {}, "model_version": "v1"}
+
+    monkeypatch.setattr(service, "_predict", slow_predict)
+    answers = ["Normal forms  reduce redundancy.", "normal forms reduce\nredundancy.", "NORMAL FORMS REDUCE REDUNDANCY."]
+    before = _coalesced()
+    with ThreadPoolExecutor(len(answers)) as pool:
+        leader = pool.submit(service.predict, answers[0])
+        assert started.wait(5)
+        followers = [pool.submit(service.predict, answer) for answer in answers[1:]]
+        deadline = time.monotonic() + 5
+        while _coalesced() < before + 2 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        release.set()
+        results = [future.result(5) for future in [leader, *followers]]
+
+    assert calls == [answers[0]]
+    assert all(result is results[0] for result in results)
+    # The flight is over: the next call computes again.
+    assert service.predict(answers[1])["prob_ai"] == 0.7 and len(calls) == 2
+
+
+def test_async_flight_outlives_a_cancelled_caller():
+    calls = Counter("test_flight_calls", "", ["flight", "outcome"], registry=None)
+    flights: AsyncSingleFlight[str] = AsyncSingleFlight("features", calls)
+    runs = []
+
+    async def compute() -> str:
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "features"
+
+    async def scenario() -> list[str]:
+        impatient = asyncio.ensure_future(flights.do("answer", compute))
+        patient = asyncio.ensure_future(flights.do("answer", compute))
+        await asyncio.sleep(0)
+        impatient.cancel()
+        return [await patient, await flights.do("answer", compute)]
+
+    assert asyncio.run(scenario()) == ["features", "features"]
+    assert len(runs) == 2
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from app.services.detector_service import DetectorService
+from app.warmup import WARMUP_STEPS, warm_up
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+
+
+def test_importing_the_app_does_not_load_heavy_dependencies():
+    code = (
+        "import sys, app.main; "
+        "print(','.join(sorted(m for m in ('torch', 'pdfplumber', 'openpyxl', 'ensemble') if m in sys.modules)))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=SERVICE_DIR, env=os.environ, capture_output=True, text=True, check=True
+    )
+    assert result.stdout.strip() == ""
+
+
+def test_warm_up_loads_the_detector_and_reports_each_step():
+    service = DetectorService(pipeline_url="")
+    assert service._model is None
+
+    assert service.warm_up()
+    assert service._model is not None
+    assert set(warm_up()) == set(WARMUP_STEPS)
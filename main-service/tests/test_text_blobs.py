@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlmodel import Session, select
+
+from app import crud
+from app.database import engine
+from app.main import create_app
+from app.models import QuizSubmission, TextBlob
+
+
+def test_answer_text_is_stored_once_compressed_and_loaded_lazily():
+    answer = "Garbage collectors trace reachable objects. " * 200
+    with TestClient(create_app()) as client:
+        course_id = client.post("/courses/import", json=[{"name": "Runtimes"}]).json()[0]["id"]
+        client.post("/students/import", json=[{"name": "Ada", "email": "ada@example.edu"}])
+        payload = {"student_email": "ada@example.edu", "course_id": course_id, "answer_text": answer, "ocr_text": answer}
+        client.post("/submissions/import", json=[payload])
+
+    with Session(engine) as session:
+        blob = session.exec(select(TextBlob)).one()
+        stored_bytes = session.exec(text("SELECT length(content) FROM textblob")).one()[0]
+        assert blob.size == len(answer) and stored_bytes < len(answer) // 10
+
+        submission = session.exec(select(QuizSubmission)).one()
+        assert "answer_blob" not in submission.__dict__
+        assert submission.answer_text == submission.ocr_text == answer
+        assert submission.answer_blob_hash == submission.ocr_blob_hash == blob.content_hash
+
+
+def test_concurrent_imports_of_the_same_text_share_one_blob():
+    text_value = "The same PDF uploaded twice."
+    errors: list[BaseException] = []
+
+    def second_import() -> None:
+        try:
+            with Session(engine) as session:
+                blobs = crud.store_text_blobs(session, [text_value])
+                session.commit()
+                assert [blob.content for blob in blobs.values()] == [text_value]
+        except BaseException as exc:  # surfaced by the assertion below
+            errors.append(exc)
+
+    with Session(engine) as first:
+        crud.store_text_blobs(first, [text_value])
+        first.flush()
+        # The second import does not see the uncommitted row and has to insert it too.
+        thread = threading.Thread(target=second_import)
+        thread.start()
+        time.sleep(0.3)
+        first.commit()
+    thread.join(timeout=10)
+
+    assert errors == []
+    with Session(engine) as session:
+        assert len(session.exec(select(TextBlob)).all()) == 1
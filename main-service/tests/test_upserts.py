@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from sqlmodel import Session, select
+
+from app import crud
+from app.database import engine
+from app.models import Course, Student
+from app.schemas import CourseCreate, CourseTopicCreate, StudentCreate
+
+
+def test_upsert_students_normalizes_and_updates_existing_rows():
+    with Session(engine) as session:
+        first = crud.upsert_students(session, [StudentCreate(name="Alice", email="Alice@Example.edu ")])
+        stored = crud.upsert_students(
+            session,
+            [
+                StudentCreate(name="Alice Updated", email="alice@example.edu"),
+                StudentCreate(name="Bob", email="bob@example.edu"),
+                StudentCreate(name="Bob Again", email="BOB@example.edu"),
+            ],
+        )
+
+        assert [s.email for s in stored] == ["alice@example.edu", "bob@example.edu", "bob@example.edu"]
+        assert stored[0].id == first[0].id
+        assert stored[1].id == stored[2].id
+        assert [s.name for s in stored] == ["Alice Updated", "Bob Again", "Bob Again"]
+        assert len(session.exec(select(Student)).all()) == 2
+
+
+def test_upsert_courses_and_topics_match_on_natural_keys():
+    with Session(engine) as session:
+        created = crud.upsert_courses(
+            session,
+            [
+                CourseCreate(name="Compilers", section_number=1, description="v1"),
+                CourseCreate(name="Compilers", section_number=2, description="other section"),
+            ],
+        )
+        updated = crud.upsert_courses(
+            session, [CourseCreate(name="Compilers", section_number=1, description="v2", content_manifest="[]")]
+        )
+        assert updated[0].id == created[0].id
+        assert (updated[0].description, updated[0].content_manifest) == ("v2", "[]")
+        assert session.get(Course, created[0].id).description == "v2"
+
+        course_id = created[0].id
+        topics = crud.upsert_topics(
+            session,
+            [
+                CourseTopicCreate(title="Parsing", category="Core", course_id=course_id),
+                CourseTopicCreate(title="Parsing", category="Core", course_id=course_id),
+                CourseTopicCreate(title="Parsing", category="Core", course_id=created[1].id),
+            ],
+        )
+        assert topics[0].id == topics[1].id != topics[2].id
+        again = crud.upsert_topics(session, [CourseTopicCreate(title="Parsing", category="Core", course_id=course_id)])
+        assert again[0].id == topics[0].id
+
+
+def test_upsert_large_roster_spans_multiple_chunks():
+    roster = [StudentCreate(name=f"Student {i}", email=f"s{i}@example.edu") for i in range(crud.UPSERT_CHUNK_SIZE + 25)]
+    with Session(engine) as session:
+        stored = crud.upsert_students(session, roster)
+        assert len({s.id for s in stored}) == len(roster)
+        assert [s.email for s in stored] == [entry.email for entry in roster]
+        assert crud.upsert_students(session, roster[-3:])[0].id == stored[-3].id
@@ -0,0 +1 @@
+"""Helpers both services install; nothing here registers Prometheus metrics."""
@@ -0,0 +1,137 @@
+"""Circuit breaker for remote calls, shared by ai-pipeline (Ollama) and main-service (ai-pipeline, Ollama).
+
+A breaker is *closed* while calls succeed. Once at least ``minimum_calls`` of the last
+``window`` calls have been recorded and the failure rate reaches ``failure_rate``, it
+*opens* and callers fail fast for ``reset_seconds``. After that it is *half-open*: a
+single probe call is let through, and its outcome closes or re-opens the breaker.
+
+Each service passes in its own Prometheus metrics, so neither registers the other's.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+from typing import NamedTuple
+
+from prometheus_client import Counter, Gauge
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class BreakerMetrics(NamedTuple):
+    state: Gauge  # labelled by breaker
+    transitions: Counter  # by breaker and the state entered
+    rejections: Counter  # by breaker
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        metrics: BreakerMetrics,
+        failure_rate: float = 0.5,
+        minimum_calls: int = 5,
+        window: int = 20,
+        reset_seconds: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.metrics = metrics
+        self.failure_rate = failure_rate
+        self.minimum_calls = minimum_calls
+        self.reset_seconds = reset_seconds
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+        metrics.state.labels(breaker=name).set(STATE_VALUES[CLOSED])
+
+    @classmethod
+    def from_env(cls, name: str, metrics: BreakerMetrics) -> CircuitBreaker:
+        return cls(
+            name,
+            metrics,
+            failure_rate=float(os.getenv("BREAKER_FAILURE_RATE", "0.5")),
+            minimum_calls=int(os.getenv("BREAKER_MIN_CALLS", "5")),
+            window=int(os.getenv("BREAKER_WINDOW", "20")),
+            reset_seconds=float(os.getenv("BREAKER_RESET_SECONDS", "30")),
+        )
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and self._clock() - self._opened_at >= self.reset_seconds:
+            self._transition(HALF_OPEN)
+        return self._state
+
+    def _transition(self, state: str) -> None:
+        self._state = state
+        self._probing = False
+        if state == OPEN:
+            self._opened_at = self._clock()
+        elif state == CLOSED:
+            self._outcomes.clear()
+        self.metrics.state.labels(breaker=self.name).set(STATE_VALUES[state])
+        self.metrics.transitions.labels(breaker=self.name, state=state).inc()
+
+    def allow(self) -> bool:
+        """Whether a call may go through now; half-open admits one probe at a time."""
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            # A probe that never reported back (e.g. a cancelled request) must not wedge the breaker.
+            if state == HALF_OPEN and (not self._probing or self._clock() - self._probe_started >= self.reset_seconds):
+                self._probing = True
+                self._probe_started = self._clock()
+                return True
+        self.metrics.rejections.labels(breaker=self.name).inc()
+        return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED)
+            elif self._state == CLOSED:
+                self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            if self._state != CLOSED:
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if len(self._outcomes) >= self.minimum_calls and failures / len(self._outcomes) >= self.failure_rate:
+                self._transition(OPEN)
+
+    def reset(self) -> None:
+        with self._lock:
+            if self._state == CLOSED:
+                self._outcomes.clear()
+            else:
+                self._transition(CLOSED)
+
+    def snapshot(self) -> dict[str, object]:
+        with self._lock:
+            state = self._current_state()
+            return {
+                "state": state,
+                "recent_calls": len(self._outcomes),
+                "recent_failures": self._outcomes.count(False),
+            }
@@ -0,0 +1,69 @@
+"""Prometheus helpers shared by ai-pipeline and main-service.
+
+Nothing is registered here: each service defines its own metrics in its ``metrics``
+module and passes them in, so a process that imports both services' modules (tests,
+benchmarks) does not register a series twice.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Histogram, generate_latest
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+@contextmanager
+def observe_seconds(histogram) -> Iterator[None]:
+    """Observe the wall-clock time of the block in ``histogram`` (a labelled child)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - started)
+
+
+class RequestMetricsMiddleware:
+    """Plain ASGI middleware timing each HTTP request under its route template."""
+
+    def __init__(self, app: ASGIApp, histogram: Histogram) -> None:
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            self.histogram.labels(
+                method=scope["method"],
+                route=getattr(route, "path", "unmatched"),
+                status=str(status),
+            ).observe(time.perf_counter() - started)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    # With several uvicorn workers each process keeps its own samples; point
+    # PROMETHEUS_MULTIPROC_DIR at a shared directory to aggregate them.
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,226 @@
+"""Opt-in per-request profiling, shared by ai-pipeline and main-service.
+
+A profiled request runs under ``cProfile`` (for ``pstats``) while a background thread
+samples every thread's stack (for flamegraph-ready collapsed stacks, which also cover
+sync endpoints running in the threadpool). Profiles are written to ``PROFILE_DIR``
+as ``<id>.pstats``, ``<id>.collapsed`` and ``<id>.json``; only the newest
+``PROFILING_KEEP`` are kept. Only one request is profiled at a time.
+
+Both views cover the whole process, not just the profiled request: cProfile traces the
+event-loop thread, where every other request's coroutines also run, and the sampler
+reads every thread. Each profile records how many other requests overlapped it
+(``overlapping_requests``); profile when that is 0 for a clean attribution.
+
+A request asks for a profile by sending ``PROFILING_TOKEN`` in ``X-Profile``, and the
+same header is needed to read profiles. Without a token only sampling
+(``PROFILING_SAMPLE_RATE``) takes profiles, and they are only readable on the host.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from pathlib import Path
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_KINDS = {"pstats": ".pstats", "collapsed": ".collapsed"}
+
+_IDLE_MODULES = {"threading", "selectors", "queue"}
+
+
+@dataclass
+class ProfilingConfig:
+    enabled: bool = False
+    token: str = ""
+    sample_rate: float = 0.0
+    interval_ms: float = 5.0
+    directory: str = "./profiles"
+    keep: int = 50
+
+    @classmethod
+    def from_env(cls) -> "ProfilingConfig":
+        return cls(
+            enabled=os.getenv("PROFILING_ENABLED", "0") == "1",
+            token=os.getenv("PROFILING_TOKEN", ""),
+            sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+            interval_ms=float(os.getenv("PROFILING_INTERVAL_MS", "5")),
+            directory=os.getenv("PROFILE_DIR", "./profiles"),
+            keep=int(os.getenv("PROFILING_KEEP", "50")),
+        )
+
+
+def _frame_label(frame) -> str:
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}"
+
+
+class StackSampler:
+    """Samples the Python stack of every other thread at a fixed interval."""
+
+    def __init__(self, interval_seconds: float) -> None:
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter[str] = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval_seconds):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                # Threads parked in a wait (idle workers, the selector) only add noise.
+                if frame.f_globals.get("__name__") in _IDLE_MODULES:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Counter[str]:
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+
+@dataclass
+class ProfileRecord:
+    id: str
+    method: str
+    path: str
+    status: int
+    duration_ms: float
+    samples: int
+    created_at: str
+    overlapping_requests: int = 0
+
+
+class ProfileStore:
+    def __init__(self, directory: str | Path, keep: int = 50) -> None:
+        self.directory = Path(directory)
+        self.keep = keep
+
+    def save(self, record: ProfileRecord, profile: cProfile.Profile, stacks: Counter[str]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile.dump_stats(self.directory / f"{record.id}.pstats")
+        collapsed = "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+        (self.directory / f"{record.id}.collapsed").write_text(collapsed)
+        # Metadata goes last: a profile only shows up in the index once it is complete.
+        (self.directory / f"{record.id}.json").write_text(json.dumps(asdict(record)))
+        self._prune()
+
+    def _prune(self) -> None:
+        for meta in self._metadata_files()[self.keep :]:
+            for suffix in (".json", *PROFILE_KINDS.values()):
+                meta.with_suffix(suffix).unlink(missing_ok=True)
+
+    def _metadata_files(self) -> list[Path]:
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.json"), key=lambda path: path.stat().st_mtime, reverse=True)
+
+    def list(self) -> list[ProfileRecord]:
+        return [ProfileRecord(**json.loads(path.read_text())) for path in self._metadata_files()]
+
+    def path(self, profile_id: str, kind: str) -> Path | None:
+        suffix = PROFILE_KINDS.get(kind)
+        if suffix is None or not profile_id.isalnum():
+            return None
+        path = self.directory / f"{profile_id}{suffix}"
+        return path if path.exists() else None
+
+
+def token_allowed(config: ProfilingConfig, supplied: str | None) -> bool:
+    if not config.enabled or not config.token or supplied is None:
+        return False
+    return secrets.compare_digest(supplied, config.token)
+
+
+class ProfilingMiddleware:
+    """Profiles a request when ``X-Profile`` carries the configured token or it is sampled."""
+
+    def __init__(self, app: ASGIApp, config: ProfilingConfig) -> None:
+        self.app = app
+        self.config = config
+        self._busy = threading.Lock()
+        self._in_flight = 0
+        # Other requests seen while a profile runs; None when no profile is running.
+        self._overlapping: int | None = None
+
+    def _wanted(self, scope: Scope) -> bool:
+        requested = Headers(scope=scope).get(PROFILE_HEADER)
+        if requested is not None:
+            return token_allowed(self.config, requested)
+        return random.random() < self.config.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.config.enabled:
+            await self.app(scope, receive, send)
+            return
+        self._in_flight += 1
+        try:
+            if not self._wanted(scope) or not self._busy.acquire(blocking=False):
+                if self._overlapping is not None:
+                    self._overlapping += 1
+                await self.app(scope, receive, send)
+                return
+            try:
+                await self._profile(scope, receive, send)
+            finally:
+                self._busy.release()
+        finally:
+            self._in_flight -= 1
+
+    async def _profile(self, scope: Scope, receive: Receive, send: Send) -> None:
+        profile_id = secrets.token_hex(8)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)[PROFILE_ID_HEADER] = profile_id
+            await send(message)
+
+        sampler = StackSampler(self.config.interval_ms / 1000)
+        profile = cProfile.Profile()
+        started = time.perf_counter()
+        self._overlapping = self._in_flight - 1
+        sampler.start()
+        profile.enable()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.disable()
+            stacks = sampler.stop()
+            overlapping, self._overlapping = self._overlapping, None
+            record = ProfileRecord(
+                id=profile_id,
+                method=scope["method"],
+                path=scope["path"],
+                status=status,
+                duration_ms=round((time.perf_counter() - started) * 1000, 3),
+                samples=sum(stacks.values()),
+                created_at=datetime.utcnow().isoformat(),
+                overlapping_requests=overlapping,
+            )
+            ProfileStore(self.config.directory, self.config.keep).save(record, profile, stacks)
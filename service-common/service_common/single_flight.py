@@ -0,0 +1,79 @@
+"""Request coalescing: concurrent calls with the same key share one computation.
+
+The first caller for a key (the leader) runs the call; callers that arrive while it is
+in flight wait for it and get its result, or its exception. Nothing is kept once the
+call returns, so this is not a cache: a later call with the same key runs again.
+
+``SingleFlight`` coalesces blocking calls across threads (main-service's sync routes),
+``AsyncSingleFlight`` coroutines on one event loop (ai-pipeline). Both count calls in
+the ``calls`` counter each service passes in, labelled by flight and outcome.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Awaitable, Callable
+from concurrent.futures import Future
+from typing import Generic, TypeVar
+
+from prometheus_client import Counter
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    def __init__(self, name: str, calls: Counter) -> None:
+        self.name = name
+        self.calls = calls
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future[T]] = {}
+
+    def do(self, key: str, fn: Callable[[], T]) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        self.calls.labels(flight=self.name, outcome="executed" if leader else "coalesced").inc()
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AsyncSingleFlight(Generic[T]):
+    """The leader's computation runs as its own task, so a caller that is cancelled (its
+    client went away) stops waiting without cancelling it for the others.
+    """
+
+    def __init__(self, name: str, calls: Counter) -> None:
+        self.name = name
+        self.calls = calls
+        self._calls: dict[str, asyncio.Task[T]] = {}
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.calls.labels(flight=self.name, outcome="executed").inc()
+        else:
+            self.calls.labels(flight=self.name, outcome="coalesced").inc()
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task[T]) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here so a failure nobody awaited any more is not logged as lost